@@ -1,11 +1,16 @@
 import os
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import whisperx
 
-from postprocessing.punctuation import add_punctuation
+from asr_batcher import ChunkBatcher
+from audio_utils import load_waveform, to_pyannote_input
 from diarization_pipeline import DiarizationPipeline  # import class bạn đã viết
+import inference_profile
+from pipeline import TranscriptionResult
+from speaker_assignment import assign_word_speakers
 
 load_dotenv()
 
@@ -16,6 +21,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+VAD_OPTIONS = {"vad_onset": 0.500, "vad_offset": 0.300}
+WEIGHTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), 'weights'))
+DEFAULT_MODEL_PATH = os.path.join(WEIGHTS_DIR, 'whisper-large-v2-lora-zh-ct2')
+DEFAULT_CKPT_PATH = os.path.join(WEIGHTS_DIR, 'epoch=19.ckpt')
+
 
 class ASRModel:
     def __init__(
@@ -26,19 +36,24 @@ class ASRModel:
         device_index: int = 0,
         num_workers: int = 4,
         batch_size: int = 16,
-        hf_token: str = None
+        hf_token: str = None,
+        concurrent_stages: bool = None,
+        compute_type: str = "auto"
     ):
-        logger.info("Loading WhisperX ASR model...")
+        logger.info("Loading WhisperX ASR model (%s, %d threads, batch size %d)...",
+                    compute_type, num_workers, batch_size)
         self.model = whisperx.load_model(
             model_path,
             device=device,
             device_index=device_index,
-            compute_type="auto",
+            compute_type=compute_type,
             threads=num_workers,
-            vad_options={"vad_onset": 0.500, "vad_offset": 0.300}
+            vad_options=VAD_OPTIONS
         )
 
         self.batch_size = batch_size
+        # VAD chunks of all concurrent transcriptions share decoder batches
+        self.batcher = ChunkBatcher(self.model, batch_size=batch_size)
 
         hf_token = hf_token or os.getenv("HF_TOKEN")
         if not hf_token:
@@ -51,33 +66,118 @@ class ASRModel:
             auth_token=hf_token
         )
 
-    def transcribe(self, audio_path, num_speakers, language="zh", timestamp=False, punctuation=False):
-
-        logger.info(f"Transcribing: {audio_path}")
+        # Diarization only needs the audio, so it can overlap with ASR.
+        if concurrent_stages is None:
+            concurrent_stages = os.getenv("ASR_CONCURRENT_STAGES", "true").lower() == "true"
+        self.concurrent_stages = concurrent_stages
+        self._stage_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="diarization")
+
+    @staticmethod
+    def _timed(timings, stage, fn, *args, **kwargs):
+        start = time.time()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            timings[stage] = time.time() - start
+
+    def _assign_speakers(self, timings, asr_result, turns):
+        if turns is None:
+            segments = asr_result["segments"]
+            for segment in segments:
+                segment["speaker"] = "SPEAKER_00"
+            timings["assign"] = 0.0
+            return segments
+        return self._timed(timings, "assign", assign_word_speakers, turns, asr_result)["segments"]
+
+    def transcribe(self, audio, num_speakers, language="zh", timestamp=False, punctuation=False,
+                   return_duration=False, concurrent=None, diarize=True, return_details=False):
+        """Transcribe and diarize one file.
+
+        `audio` is either a path or an already decoded 16 kHz float32 waveform.
+        The file is decoded once and the same waveform feeds ASR and diarization.
+        When `concurrent` (default: self.concurrent_stages) is true, diarization
+        runs on a background thread while ASR runs; both are joined before
+        speaker assignment. Diarization always runs on that one thread, so
+        several threads may call transcribe() at once (see inference_server):
+        their ASR chunks share decoder batches and diarization stays serial.
+
+        Punctuation is not applied here; it runs afterwards as its own stage
+        (tasks.punctuate) so it stays off the ASR critical path.
+
+        With diarize=False, diarization and speaker assignment are skipped and
+        every segment is labelled SPEAKER_00.
+
+        With return_duration=True, returns (segments, duration_seconds) where the
+        duration comes from the decoded sample count. With return_details=True,
+        returns a TranscriptionResult that also holds the per-stage and
+        wall-clock seconds and the diarization turns with their speaker
+        embeddings.
+        """
+        if concurrent is None:
+            concurrent = self.concurrent_stages
+        timings = {}
+
+        logger.info(f"Transcribing: {audio if isinstance(audio, str) else f'<waveform {len(audio)} samples>'}")
         start_total = time.time()
 
-        # Step 1: load audioz
-        audio = whisperx.load_audio(audio_path)
-
-        # Step 2: transcribe
-        start_asr = time.time()
-        asr_result = self.model.transcribe(audio, batch_size=self.batch_size, language=language)
-        end_asr = time.time()
-
-        # Step 3: diarization with fine-tuned checkpoint
-        diarization_segments = self.diarizer.run(audio_path,num_speakers)
+        # Step 1: decode once
+        audio = self._timed(timings, "decode", load_waveform, audio)
+
+        # Step 2 + 3: ASR and diarization (fine-tuned checkpoint) on the same waveform
+        start_inference = time.time()
+        run_asr = lambda: self.batcher.transcribe(audio, language)
+        run_diarization = lambda: self.diarizer.run(to_pyannote_input(audio), num_speakers, return_embeddings=True)
+        if not diarize:
+            asr_result = self._timed(timings, "asr", run_asr)
+            timings["diarization"] = 0.0
+        elif concurrent:
+            diarization_future = self._stage_executor.submit(self._timed, timings, "diarization", run_diarization)
+            asr_result = self._timed(timings, "asr", run_asr)
+            diarization_segments = diarization_future.result()
+        else:
+            asr_result = self._timed(timings, "asr", run_asr)
+            diarization_segments = self._stage_executor.submit(
+                self._timed, timings, "diarization", run_diarization).result()
+        timings["inference_wall"] = time.time() - start_inference
 
         # Step 4: combine speaker info with ASR
-    
-
-        result = whisperx.assign_word_speakers(diarization_segments , asr_result)
-        segments = result["segments"]
-
-        # if punctuation:
-        #     logger.info("Applying punctuation...")
-        #     segments = add_punctuation(segments,language)
-
-        logger.info(f"ASR time: {end_asr - start_asr:.2f}s")
-        logger.info(f"Total processing time: {time.time() - start_total:.2f}s")
+        segments = self._assign_speakers(timings, asr_result, diarization_segments if diarize else None)
+
+        timings["total"] = time.time() - start_total
+        timings["overlap_saved"] = timings["asr"] + timings["diarization"] - timings["inference_wall"]
+        logger.info(
+            "Timings (%s): decode %.2fs, ASR %.2fs, diarization %.2fs, assign %.2fs, "
+            "ASR+diarization wall %.2fs (saved %.2fs), total %.2fs",
+            "concurrent" if concurrent and diarize else "sequential",
+            timings["decode"], timings["asr"], timings["diarization"], timings["assign"],
+            timings["inference_wall"], timings["overlap_saved"], timings["total"],
+        )
 
-        return segments
+        result = TranscriptionResult(segments, len(audio) / whisperx.audio.SAMPLE_RATE, timings,
+                                     diarization_segments if diarize else None)
+        if return_details:
+            return result
+        if return_duration:
+            return result.segments, result.duration
+        return result.segments
+
+
+def load_default_model(**kwargs) -> ASRModel:
+    """The fine-tuned Whisper + diarization model from weights/ on the best device.
+
+    compute_type, threads and batch size come from the autotuned inference
+    profile when one was saved for this device (see autotune.py); explicit
+    kwargs take precedence.
+    """
+    import torch
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    logger.info("Loading ASR model on device: %s", device)
+    options = inference_profile.model_kwargs(inference_profile.load_profile(), device, DEFAULT_MODEL_PATH)
+    options.update(kwargs)
+    return ASRModel(
+        model_path=DEFAULT_MODEL_PATH,
+        finetuned_ckpt_path=DEFAULT_CKPT_PATH,
+        device=device,
+        **options,
+    )
@@ -0,0 +1,213 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SAMPLE_RATE = 16000  # whisperx.audio.SAMPLE_RATE
+# How long a partly filled decoder batch waits for chunks from other tasks
+ASR_BATCH_MAX_WAIT_MS = float(os.getenv("ASR_BATCH_MAX_WAIT_MS", "50"))
+# Whisper decodes at most 30 s at a time; VAD segments are merged up to this
+CHUNK_SECONDS = 30
+STATS_LOG_EVERY = 100
+
+
+class _Job:
+    """One transcription whose VAD chunks are spread over shared batches."""
+
+    def __init__(self, audio: np.ndarray, language: str, chunks: List[dict]):
+        self.audio = audio
+        self.language = language
+        self.chunks = chunks
+        self.texts: List[Optional[str]] = [None] * len(chunks)
+        self.next_chunk = 0
+        self.remaining = len(chunks)
+        self.submitted_at = time.monotonic()
+        self.future = Future()
+
+    def result(self) -> dict:
+        return {
+            "segments": [
+                {"text": text, "start": round(chunk["start"], 3), "end": round(chunk["end"], 3)}
+                for chunk, text in zip(self.chunks, self.texts)
+            ],
+            "language": self.language,
+        }
+
+
+class ChunkBatcher:
+    """Decodes VAD chunks of many concurrent transcriptions in shared batches.
+
+    FasterWhisperPipeline.transcribe batches only the chunks of its own file,
+    so short files run mostly empty batches. Here callers run VAD themselves
+    and queue their chunks; one decoder thread fills each batch round-robin
+    across the queued transcriptions of a language (a batch shares one
+    tokenizer prompt), waiting at most max_wait_ms after the oldest queued
+    chunk for a batch to fill up. Decoded text is routed back to each
+    caller's future. stats() reports how full the batches were.
+    """
+
+    def __init__(self, pipeline, batch_size: int = 16, max_wait_ms: float = ASR_BATCH_MAX_WAIT_MS):
+        self.pipeline = pipeline
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending: Dict[str, deque] = {}
+        self._cond = threading.Condition()
+        self._vad_lock = threading.Lock()
+        self._tokenizers = {}
+        self._thread = None
+        self._stats = {"batches": 0, "chunks": 0, "full_batches": 0, "job_slots": 0, "decode_seconds": 0.0,
+                       "chunk_wait_seconds": 0.0, "jobs": 0}
+
+    # Model-specific steps; whisperx is only imported when they run
+
+    def segment(self, audio: np.ndarray) -> List[dict]:
+        """VAD chunks ({start, end} in seconds) as FasterWhisperPipeline.transcribe makes them."""
+        import torch
+        from whisperx.vad import merge_chunks
+
+        with self._vad_lock:
+            vad_segments = self.pipeline.vad_model(
+                {"waveform": torch.from_numpy(audio).unsqueeze(0), "sample_rate": SAMPLE_RATE}
+            )
+        vad_params = self.pipeline._vad_params
+        return merge_chunks(vad_segments, CHUNK_SECONDS, onset=vad_params["vad_onset"], offset=vad_params["vad_offset"])
+
+    def detect_language(self, audio: np.ndarray) -> str:
+        return self.pipeline.detect_language(audio)
+
+    def decode(self, chunks: List[np.ndarray], language: str) -> List[str]:
+        import faster_whisper
+        import torch
+
+        tokenizer = self._tokenizers.get(language)
+        if tokenizer is None:
+            whisper = self.pipeline.model
+            tokenizer = faster_whisper.tokenizer.Tokenizer(
+                whisper.hf_tokenizer, whisper.model.is_multilingual, task="transcribe", language=language,
+            )
+            self._tokenizers[language] = tokenizer
+        features = torch.stack([self.pipeline.preprocess({"inputs": chunk})["inputs"] for chunk in chunks])
+        return self.pipeline.model.generate_segment_batched(features, tokenizer, self.pipeline.options)
+
+    # Scheduling
+
+    def submit(self, audio: np.ndarray, language: Optional[str] = None) -> Future:
+        """Queue a waveform; the future resolves to {"segments", "language"} like pipeline.transcribe."""
+        language = language or self.detect_language(audio)
+        job = _Job(audio, language, self.segment(audio))
+        if not job.chunks:
+            job.future.set_result(job.result())
+            return job.future
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="asr-batcher", daemon=True)
+                self._thread.start()
+            self._pending.setdefault(language, deque()).append(job)
+            self._stats["jobs"] += 1
+            self._cond.notify()
+        return job.future
+
+    def transcribe(self, audio: np.ndarray, language: Optional[str] = None) -> dict:
+        return self.submit(audio, language).result()
+
+    def _queued(self, jobs: deque) -> int:
+        return sum(len(job.chunks) - job.next_chunk for job in jobs)
+
+    def _take_batch(self):
+        """Wait for a batch to fill (or its oldest chunk to time out) and claim it."""
+        with self._cond:
+            while True:
+                if not self._pending:
+                    self._cond.wait()
+                    continue
+                # Serve the language whose oldest job has waited longest
+                language, jobs = min(self._pending.items(), key=lambda kv: min(j.submitted_at for j in kv[1]))
+                deadline = min(job.submitted_at for job in jobs) + self.max_wait
+                if self._queued(jobs) >= self.batch_size or time.monotonic() >= deadline:
+                    break
+                self._cond.wait(timeout=deadline - time.monotonic())
+
+            batch = []
+            while jobs and len(batch) < self.batch_size:
+                job = jobs.popleft()
+                batch.append((job, job.next_chunk))
+                job.next_chunk += 1
+                if job.next_chunk < len(job.chunks):
+                    jobs.append(job)
+            if not jobs:
+                del self._pending[language]
+            return language, batch
+
+    def _run(self):
+        while True:
+            language, batch = self._take_batch()
+            try:
+                self._decode_batch(language, batch)
+            except Exception as e:
+                # Whatever broke, the thread must survive and the callers must hear of it
+                logging.exception("ASR batch of %d chunks failed", len(batch))
+                self._fail({job for job, _ in batch}, e)
+
+    def _decode_batch(self, language: str, batch):
+        started = time.monotonic()
+        audio = []
+        for job, index in batch:
+            chunk = job.chunks[index]
+            audio.append(job.audio[int(chunk["start"] * SAMPLE_RATE):int(chunk["end"] * SAMPLE_RATE)])
+        texts = self.decode(audio, language)
+        if len(texts) != len(batch):
+            raise RuntimeError(f"Decoder returned {len(texts)} texts for {len(batch)} chunks")
+        decode_seconds = time.monotonic() - started
+
+        for (job, index), text in zip(batch, texts):
+            job.texts[index] = text
+            job.remaining -= 1
+            if job.remaining == 0 and not job.future.done():
+                job.audio = None
+                job.future.set_result(job.result())
+        self._record(batch, started, decode_seconds)
+
+    def _fail(self, jobs, error: Exception):
+        with self._cond:
+            for job in jobs:
+                # Drop the job's remaining chunks; its caller gets the error
+                queued = self._pending.get(job.language)
+                if queued is not None and job in queued:
+                    queued.remove(job)
+                    if not queued:
+                        del self._pending[job.language]
+                if not job.future.done():
+                    job.future.set_exception(error)
+
+    def _record(self, batch, started: float, decode_seconds: float):
+        stats = self._stats
+        stats["batches"] += 1
+        stats["chunks"] += len(batch)
+        stats["full_batches"] += len(batch) == self.batch_size
+        stats["job_slots"] += len({id(job) for job, _ in batch})
+        stats["decode_seconds"] += decode_seconds
+        stats["chunk_wait_seconds"] += sum(started - job.submitted_at for job, _ in batch)
+        if stats["batches"] % STATS_LOG_EVERY == 0:
+            logging.info("ASR batcher: %s", self.stats())
+
+    def stats(self) -> dict:
+        """Batch utilization since start.
+
+        fill is the mean share of batch slots used, and tasks_per_batch how
+        many transcriptions a batch served on average.
+        """
+        stats = dict(self._stats)
+        batches = stats["batches"] or 1
+        stats["fill"] = stats["chunks"] / (batches * self.batch_size)
+        stats["mean_batch"] = stats["chunks"] / batches
+        stats["tasks_per_batch"] = stats["job_slots"] / batches
+        stats["mean_chunk_wait_ms"] = 1000 * stats["chunk_wait_seconds"] / (stats["chunks"] or 1)
+        return stats
@@ -0,0 +1,114 @@
+import io
+import logging
+import shutil
+import subprocess
+import threading
+from typing import List, Union
+
+import numpy as np
+import torch
+import whisperx
+from whisperx.audio import SAMPLE_RATE
+
+
+def load_waveform(audio: Union[str, np.ndarray]) -> np.ndarray:
+    """Decode a file to a mono float32 16 kHz waveform (no-op for arrays)."""
+    if isinstance(audio, np.ndarray):
+        return audio
+    return whisperx.load_audio(audio)
+
+
+def to_pyannote_input(audio: np.ndarray, sample_rate: int = SAMPLE_RATE) -> dict:
+    """Wrap a decoded waveform in the in-memory format pyannote accepts.
+
+    The tensor shares memory with the array, and since the rate already
+    matches the segmentation model pyannote does not resample it.
+    """
+    return {"waveform": torch.from_numpy(audio).unsqueeze(0), "sample_rate": sample_rate}
+
+
+class SegmentStream(io.RawIOBase):
+    """Ordered segment files read back as one continuous byte stream."""
+
+    def __init__(self, paths: List[str]):
+        self._paths = list(paths)
+        self._index = 0
+        self._file = None
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while self._index < len(self._paths):
+            if self._file is None:
+                self._file = open(self._paths[self._index], "rb")
+            n = self._file.readinto(buffer)
+            if n:
+                return n
+            self._file.close()
+            self._file = None
+            self._index += 1
+        return 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        super().close()
+
+
+def _ffmpeg_decode(input_args: List[str], sample_rate: int, feed=None) -> np.ndarray:
+    """Run ffmpeg like whisperx.load_audio, optionally feeding stdin from a thread.
+
+    stderr is drained on its own thread while stdout is read, so a file that
+    makes ffmpeg print more than a pipe buffer of warnings cannot deadlock it.
+    """
+    cmd = ["ffmpeg", "-loglevel", "error", "-threads", "0", *input_args,
+           "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-"]
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE if feed else subprocess.DEVNULL,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    writer = None
+    if feed:
+        writer = threading.Thread(target=feed, args=(proc.stdin,), daemon=True)
+        writer.start()
+    err_chunks = []
+    reader = threading.Thread(target=lambda: err_chunks.append(proc.stderr.read()), daemon=True)
+    reader.start()
+    out = proc.stdout.read()
+    proc.wait()
+    reader.join()
+    if writer:
+        writer.join()
+    err = b"".join(err_chunks)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Failed to load audio: {err.decode(errors='replace')}")
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+
+def decode_segments(segment_paths: List[str], sample_rate: int = SAMPLE_RATE,
+                    chunk_size: int = 1024 * 1024) -> np.ndarray:
+    """Decode byte segments of one file as a single stream, without rejoining them on disk.
+
+    Clients split files at arbitrary byte offsets, which for compressed
+    formats falls mid-frame, so segments only decode correctly as one stream.
+    The segments are piped to one ffmpeg process through SegmentStream.
+    Containers that need seeking (MP4/M4A with the index at the end) cannot
+    be read from a pipe; those are retried with ffmpeg's concat: protocol,
+    which also reads the files in place.
+    """
+    def feed(stdin):
+        try:
+            with SegmentStream(segment_paths) as stream:
+                shutil.copyfileobj(stream, stdin, chunk_size)
+            stdin.close()
+        except BrokenPipeError:
+            pass  # ffmpeg stopped reading; its exit status says why
+
+    try:
+        return _ffmpeg_decode(["-i", "pipe:0"], sample_rate, feed)
+    except RuntimeError:
+        if any("|" in path for path in segment_paths):
+            raise
+        logging.warning("Streaming decode failed, retrying %d segments with the concat protocol",
+                        len(segment_paths))
+        return _ffmpeg_decode(["-i", "concat:" + "|".join(segment_paths)], sample_rate)
@@ -0,0 +1,160 @@
+"""
+Benchmark Whisper inference settings on this machine and save the fastest
+as the inference profile that load_default_model (and so get_asr_model and
+the inference server) applies at startup.
+
+Every compute type / CPU thread count is loaded once and timed on a sample
+of real audio at each batch size. Candidates whose transcript drifts from
+the most precise compute type (e.g. an int8 quantization that hurts this
+fine-tuned model) are not eligible.
+
+    python app/autotune.py --audio audio.wav --seconds 120
+    python app/autotune.py --device cpu --compute-types int8,float32 --threads 2,4,8 --dry-run
+"""
+import argparse
+import difflib
+import gc
+import logging
+import os
+import platform
+import time
+
+import torch
+import whisperx
+
+import inference_profile
+from asr import DEFAULT_MODEL_PATH, VAD_OPTIONS
+
+# Reference order: the first compute type that loads defines the expected transcript
+PRECISION_ORDER = ["float32", "float16", "bfloat16", "int8_float32", "int8_float16", "int8_bfloat16", "int8"]
+DEFAULTS = {
+    "cpu": {"compute_types": ["float32", "int8"], "batch_sizes": [1, 4, 8, 16]},
+    "cuda": {"compute_types": ["float16", "int8_float16", "float32"], "batch_sizes": [8, 16, 24, 32]},
+}
+
+
+def parse_list(text, cast=str):
+    return [cast(item) for item in text.split(",") if item.strip()] if text else None
+
+
+def default_threads(device):
+    if device == "cuda":
+        return [4]
+    cpus = os.cpu_count() or 1
+    threads = [n for n in (1, 2, 4, 8, 16, 32) if n < cpus]
+    return threads + [cpus]
+
+
+def transcript_text(result) -> str:
+    return "".join(segment["text"].strip() for segment in result["segments"])
+
+
+def agreement(reference: str, text: str) -> float:
+    if not reference and not text:
+        return 1.0
+    return difflib.SequenceMatcher(None, reference, text, autojunk=False).ratio()
+
+
+def measure(pipeline, audio, batch_size, language, repeat):
+    """Best of `repeat` timed runs after one warm-up; returns (seconds, transcript)."""
+    text = transcript_text(pipeline.transcribe(audio, batch_size=batch_size, language=language))
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        pipeline.transcribe(audio, batch_size=batch_size, language=language)
+        best = min(best, time.perf_counter() - started)
+    return best, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio", default="audio.wav", help="sample recording to tune on")
+    parser.add_argument("--seconds", type=float, default=120, help="use the first N seconds of it")
+    parser.add_argument("--language", default="zh")
+    parser.add_argument("--device", choices=["auto", "cpu", "cuda"], default="auto")
+    parser.add_argument("--model-path", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--compute-types", help="comma-separated, e.g. int8,float32")
+    parser.add_argument("--threads", help="comma-separated CPU thread counts")
+    parser.add_argument("--batch-sizes", help="comma-separated")
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--min-agreement", type=float, default=0.9,
+                        help="minimum transcript similarity to the reference compute type")
+    parser.add_argument("--output", default=inference_profile.INFERENCE_PROFILE)
+    parser.add_argument("--dry-run", action="store_true", help="print the best profile without saving it")
+    args = parser.parse_args()
+
+    device = args.device if args.device != "auto" else ("cuda" if torch.cuda.is_available() else "cpu")
+    compute_types = parse_list(args.compute_types) or DEFAULTS[device]["compute_types"]
+    compute_types.sort(key=lambda c: PRECISION_ORDER.index(c) if c in PRECISION_ORDER else len(PRECISION_ORDER))
+    threads = parse_list(args.threads, int) or default_threads(device)
+    batch_sizes = parse_list(args.batch_sizes, int) or DEFAULTS[device]["batch_sizes"]
+
+    audio = whisperx.load_audio(args.audio)[:int(args.seconds * whisperx.audio.SAMPLE_RATE)]
+    audio_seconds = len(audio) / whisperx.audio.SAMPLE_RATE
+    logging.info("Tuning on %.1fs of %s (%s): %s x threads %s x batch sizes %s",
+                 audio_seconds, args.audio, device, compute_types, threads, batch_sizes)
+
+    reference = None
+    results = []
+    for compute_type in compute_types:
+        for num_workers in threads:
+            try:
+                pipeline = whisperx.load_model(args.model_path, device=device, compute_type=compute_type,
+                                               threads=num_workers, vad_options=VAD_OPTIONS, language=args.language)
+            except (ValueError, RuntimeError) as e:
+                logging.warning("Skipping %s: %s", compute_type, e)
+                break  # unsupported on this device, whatever the thread count
+            for batch_size in batch_sizes:
+                try:
+                    seconds, text = measure(pipeline, audio, batch_size, args.language, args.repeat)
+                except RuntimeError as e:
+                    # Most likely out of memory; larger batches will not fit either
+                    logging.warning("%s, %d threads, batch size %d failed: %s", compute_type, num_workers, batch_size, e)
+                    break
+                if reference is None:
+                    reference = text
+                result = {
+                    "compute_type": compute_type,
+                    "num_workers": num_workers,
+                    "batch_size": batch_size,
+                    "seconds": round(seconds, 3),
+                    "rtf": round(seconds / audio_seconds, 4),
+                    "agreement": round(agreement(reference, text), 4),
+                }
+                results.append(result)
+                print(f"{compute_type:13s} threads {num_workers:3d}  batch {batch_size:3d}  "
+                      f"RTF {result['rtf']:.4f}  agreement {result['agreement']:.1%}", flush=True)
+            del pipeline
+            gc.collect()
+            if device == "cuda":
+                torch.cuda.empty_cache()
+
+    eligible = [r for r in results if r["agreement"] >= args.min_agreement]
+    if not eligible:
+        raise SystemExit("No configuration ran with acceptable output; profile not saved")
+    best = min(eligible, key=lambda r: r["rtf"])
+    profile = {
+        "device": device,
+        "model_path": args.model_path,
+        "compute_type": best["compute_type"],
+        "num_workers": best["num_workers"],
+        "batch_size": best["batch_size"],
+        "rtf": best["rtf"],
+        "agreement": best["agreement"],
+        "audio_seconds": round(audio_seconds, 1),
+        "host": platform.node(),
+        "cpu_count": os.cpu_count(),
+        "gpu": torch.cuda.get_device_name() if device == "cuda" else None,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "results": results,
+    }
+    print(f"Best: {best['compute_type']}, {best['num_workers']} threads, batch size {best['batch_size']} "
+          f"(RTF {best['rtf']:.4f}, agreement {best['agreement']:.1%})")
+    if args.dry_run:
+        return
+    inference_profile.save_profile(profile, args.output)
+    print(f"Saved inference profile to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
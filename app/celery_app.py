@@ -18,4 +18,10 @@ celery = Celery(
 )
 
 # If your tasks live in tasks.py in the same folder:
-celery.conf.imports = ("tasks.process_audio",)
+celery.conf.imports = ("tasks.process_audio", "tasks.punctuate")
+
+# Punctuation is CPU-bound; keep it off the GPU/ASR worker's queue
+PUNCTUATION_QUEUE = os.getenv("PUNCTUATION_QUEUE", "postprocess")
+celery.conf.task_routes = {
+    "atasks.punctuate_result": {"queue": PUNCTUATION_QUEUE},
+}
@@ -0,0 +1,103 @@
+import logging
+import os
+from typing import List, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SAMPLE_RATE = 16000  # whisperx.audio.SAMPLE_RATE
+# Chunk length aimed for when splitting long audio across workers
+CHUNK_TARGET_SECONDS = float(os.getenv("CHUNK_TARGET_SECONDS", "120"))
+CHUNK_MIN_SECONDS = float(os.getenv("CHUNK_MIN_SECONDS", "30"))
+CHUNK_MAX_SECONDS = float(os.getenv("CHUNK_MAX_SECONDS", "180"))
+# Pauses shorter than this are not used as cut points
+CHUNK_MIN_SILENCE_SECONDS = float(os.getenv("CHUNK_MIN_SILENCE_SECONDS", "0.3"))
+FRAME_SECONDS = 0.03
+# A frame is silent below the noise floor (5th percentile) plus a margin, and
+# always well below the speech level (90th percentile), which matters when
+# pauses are too rare to show up in the noise floor percentile
+SILENCE_MARGIN_DB = 10.0
+SPEECH_HEADROOM_DB = 20.0
+SILENCE_FLOOR_DB = -60.0
+
+
+def frame_energy_db(audio: np.ndarray, frame: int) -> np.ndarray:
+    """RMS level of each full frame in dBFS."""
+    n_frames = len(audio) // frame
+    frames = audio[:n_frames * frame].reshape(n_frames, frame)
+    # einsum sums squares per frame without a full-size temporary
+    rms = np.sqrt(np.einsum("ij,ij->i", frames, frames) / frame)
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def find_silences(audio: np.ndarray, sample_rate: int = SAMPLE_RATE,
+                  min_silence: float = CHUNK_MIN_SILENCE_SECONDS) -> List[Tuple[int, int]]:
+    """(start, end) sample ranges of pauses at least min_silence long."""
+    frame = int(FRAME_SECONDS * sample_rate)
+    db = frame_energy_db(audio, frame)
+    if len(db) == 0:
+        return []
+    noise_floor, speech_level = np.percentile(db, [5, 90])
+    threshold = max(SILENCE_FLOOR_DB, min(noise_floor + SILENCE_MARGIN_DB, speech_level - SPEECH_HEADROOM_DB))
+    silent = np.concatenate(([False], db < threshold, [False]))
+    edges = np.flatnonzero(np.diff(silent.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+    keep = (ends - starts) * frame >= min_silence * sample_rate
+    return [(int(s) * frame, int(e) * frame) for s, e in zip(starts[keep], ends[keep])]
+
+
+def plan_chunks(audio: np.ndarray, sample_rate: int = SAMPLE_RATE,
+                target: float = CHUNK_TARGET_SECONDS, min_len: float = CHUNK_MIN_SECONDS,
+                max_len: float = CHUNK_MAX_SECONDS) -> List[Tuple[int, int]]:
+    """Split a waveform into (start, end) sample ranges that cut at pauses.
+
+    Each cut is the middle of the pause closest to `target` seconds into the
+    chunk, among pauses between `min_len` and `max_len`; without one the chunk
+    is cut hard at `max_len`. Ranges are contiguous and cover every sample.
+    """
+    total = len(audio)
+    if total <= max_len * sample_rate:
+        return [(0, total)]
+
+    cuts = np.array([(s + e) // 2 for s, e in find_silences(audio, sample_rate)], dtype=np.int64)
+    chunks = []
+    start = 0
+    hard_cuts = 0
+    while total - start > max_len * sample_rate:
+        lo, hi = start + int(min_len * sample_rate), start + int(max_len * sample_rate)
+        candidates = cuts[(cuts >= lo) & (cuts <= hi)]
+        if len(candidates):
+            end = int(candidates[np.argmin(np.abs(candidates - (start + target * sample_rate)))])
+        else:
+            end = hi
+            hard_cuts += 1
+        chunks.append((start, end))
+        start = end
+    chunks.append((start, total))
+    logging.info("Split %.1fs of audio into %d chunks (%d without a pause to cut at)",
+                 total / sample_rate, len(chunks), hard_cuts)
+    return chunks
+
+
+def chunks_by_segment(segment_sizes: List[int], chunks: List[Tuple[int, int]]) -> List[List[int]]:
+    """For each uploaded segment, the indices of the chunks holding its audio.
+
+    Segments are byte ranges of one encoded stream, so their sample ranges
+    are estimated in proportion to their byte sizes (exact for PCM and
+    constant-bitrate audio, close for the rest). A segment without samples
+    of its own belongs to the chunk at its position.
+    """
+    total_samples = chunks[-1][1] if chunks else 0
+    bounds = np.concatenate(([0], np.cumsum(segment_sizes, dtype=np.float64)))
+    bounds = np.round(bounds / max(bounds[-1], 1) * total_samples).astype(np.int64)
+    starts = np.array([start for start, _ in chunks], dtype=np.int64)
+    ends = np.array([end for _, end in chunks], dtype=np.int64)
+    result = []
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        overlapping = np.flatnonzero((starts < hi) & (ends > lo))
+        if not len(overlapping) and len(chunks):
+            overlapping = [min(int(np.searchsorted(starts, lo, side="right")) - 1, len(chunks) - 1)]
+        result.append([int(i) for i in overlapping])
+    return result
@@ -1,5 +1,6 @@
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.ext.declarative import declarative_base
 from dotenv import load_dotenv
@@ -10,15 +11,53 @@ load_dotenv()
 # Load DATABASE_URL from environment variables
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-# Create the engine
+
+def pool_options(url: str) -> dict:
+    """Pool sizing from DB_POOL_*; SQLite does not use a sized pool."""
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "20")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),  # below MySQL wait_timeout
+    }
+
+
+# Create the engine (used by the Celery workers)
 engine = create_engine(
     DATABASE_URL,
     pool_pre_ping=True,  # helps with dropped connections
+    **pool_options(DATABASE_URL),
 )
 
 # Create a sessionmaker
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for the FastAPI routers (the Celery worker keeps the sync one)
+_ASYNC_DRIVERS = (
+    ("mysql+pymysql://", "mysql+aiomysql://"),
+    ("mysql://", "mysql+aiomysql://"),
+    ("postgresql+psycopg2://", "postgresql+asyncpg://"),
+    ("postgresql://", "postgresql+asyncpg://"),
+    ("sqlite://", "sqlite+aiosqlite://"),
+)
+
+
+def to_async_url(url: str) -> str:
+    for sync_prefix, async_prefix in _ASYNC_DRIVERS:
+        if url.startswith(sync_prefix):
+            return async_prefix + url[len(sync_prefix):]
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+# Pool sizing: one connection per concurrently awaiting request, so size the
+# pool for the expected in-flight requests per API process.
+async_engine = create_async_engine(ASYNC_DATABASE_URL, pool_pre_ping=True, **pool_options(ASYNC_DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
 # Base class for declarative models
 Base = declarative_base()
 Base.metadata.create_all(engine)
@@ -29,3 +68,9 @@ def get_db() -> Session:
         yield db
     finally:
         db.close()
+
+
+# Dependency to get an async database session
+async def get_async_db() -> AsyncSession:
+    async with AsyncSessionLocal() as db:
+        yield db
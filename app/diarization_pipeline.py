@@ -1,10 +1,11 @@
 import os
 import torch
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Union
 from pyannote.audio import Pipeline
 from pyannote.audio.pipelines import SpeakerDiarization
 from pyannote.core import Segment
-import pandas as pd
+
+from speaker_assignment import SpeakerTurns
 
 class DiarizationPipeline:
     def __init__(
@@ -46,22 +47,27 @@ class DiarizationPipeline:
             },
         })
 
-    def run(self, audio_path: str,num_speakers:int) -> List[Tuple[float, float, str]]:
-        """Run diarization and return list of (start, end, speaker)"""
-        if not os.path.isfile(audio_path):
-            raise FileNotFoundError(f"Audio file not found: {audio_path}")
-        
-        diarization_result = self.pipeline(audio_path,num_speakers=num_speakers)
-
+    def run(self, audio: Union[str, dict], num_speakers: Optional[int] = None,
+            return_embeddings: bool = False) -> SpeakerTurns:
+        """Run diarization and return the turns as compact (start, end, speaker) arrays.
 
-        diarize_df = pd.DataFrame(diarization_result.itertracks(yield_label=True), columns=['segment', 'label', 'speaker'])
-        diarize_df['start'] = diarize_df['segment'].apply(lambda x: float(x.start))
-        diarize_df['end'] = diarize_df['segment'].apply(lambda x: float(x.end))
-    
-        # ✅ Return list of dicts
-        return diarize_df
-       
+        `audio` is a file path or an in-memory waveform dict
+        {"waveform": (channel, time) tensor, "sample_rate": int}, which skips
+        decoding the file a second time.
 
+        With return_embeddings, the turns also carry the pipeline's centroid
+        embedding of each speaker. They are computed during clustering anyway,
+        so this costs nothing extra and lets chunks be matched up later
+        (see speaker_embeddings).
+        """
+        if isinstance(audio, str) and not os.path.isfile(audio):
+            raise FileNotFoundError(f"Audio file not found: {audio}")
+        
+        if return_embeddings:
+            diarization_result, embeddings = self.pipeline(audio, num_speakers=num_speakers, return_embeddings=True)
+            return SpeakerTurns.from_annotation(diarization_result, embeddings)
+        diarization_result = self.pipeline(audio, num_speakers=num_speakers)
+        return SpeakerTurns.from_annotation(diarization_result)
 
     def print_result(self, audio_path: str):
         """Run diarization and print formatted output"""
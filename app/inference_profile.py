@@ -0,0 +1,56 @@
+import json
+import logging
+import os
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Written by autotune.py, read when the ASR model is loaded
+INFERENCE_PROFILE = os.getenv(
+    "INFERENCE_PROFILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "weights", "inference_profile.json"),
+)
+
+
+def load_profile(path: str = INFERENCE_PROFILE) -> Optional[dict]:
+    """The saved profile, or None if there is none (or it cannot be read)."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        logging.warning("Ignoring unreadable inference profile %s", path, exc_info=True)
+        return None
+
+
+def save_profile(profile: dict, path: str = INFERENCE_PROFILE):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def model_kwargs(profile: Optional[dict], device: str, model_path: str) -> dict:
+    """ASRModel arguments from a profile tuned for this device and model.
+
+    A profile from another device or model is ignored rather than applied,
+    since e.g. float16 does not run on CPU and the best batch size depends on
+    the model size.
+    """
+    if not profile:
+        return {}
+    if profile.get("device") != device or os.path.basename(profile.get("model_path", "")) != os.path.basename(model_path):
+        logging.warning("Inference profile is for %s on %s, not %s on %s; using defaults",
+                        profile.get("model_path"), profile.get("device"), model_path, device)
+        return {}
+    logging.info("Using inference profile: %s, %d threads, batch size %d (RTF %.3f)",
+                 profile["compute_type"], profile["num_workers"], profile["batch_size"], profile.get("rtf", 0))
+    return {
+        "compute_type": profile["compute_type"],
+        "num_workers": profile["num_workers"],
+        "batch_size": profile["batch_size"],
+    }
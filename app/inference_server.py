@@ -0,0 +1,215 @@
+"""
+Local inference server: one copy of the ASR and diarization models shared by
+every worker process on the machine.
+
+Celery workers (and the API, for /api/stream) send transcribe requests over
+a multiprocessing connection. Each connection is served on its own thread,
+which hands its request to ASRModel.transcribe as soon as it arrives; the
+model's ChunkBatcher packs the VAD chunks of all in-flight requests into
+shared decoder batches, and each client is answered as soon as its own
+chunks are decoded. Worker processes stay light and do decoding, chunking
+and database work in parallel, while the models are loaded only once.
+
+    INFERENCE_SERVER_ADDRESS=/tmp/asr-inference.sock python app/inference_server.py
+"""
+import logging
+import os
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Unix socket path, or host:port. Unset: each process loads its own model.
+INFERENCE_SERVER_ADDRESS = os.getenv("INFERENCE_SERVER_ADDRESS") or None
+# Requests are unpickled, so a TCP address requires an explicit key; the
+# default only guards Unix sockets, which filesystem permissions protect
+INFERENCE_SERVER_AUTHKEY = os.getenv("INFERENCE_SERVER_AUTHKEY") or None
+DEFAULT_SOCKET_AUTHKEY = "asr-inference"
+# How long a client keeps retrying to connect while the server starts
+INFERENCE_CONNECT_TIMEOUT = float(os.getenv("INFERENCE_CONNECT_TIMEOUT", "60"))
+# How long a client waits for the answer to one request; 0 waits forever
+INFERENCE_REQUEST_TIMEOUT = float(os.getenv("INFERENCE_REQUEST_TIMEOUT", "1800"))
+
+
+def parse_address(address: str):
+    """host:port becomes a TCP address; anything else is a Unix socket path."""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and "/" not in address:
+        return host, int(port)
+    return address
+
+
+def resolve_authkey(address: str, authkey: Optional[str]) -> bytes:
+    """The connection key for address; TCP addresses need one from INFERENCE_SERVER_AUTHKEY."""
+    if authkey:
+        return authkey.encode() if isinstance(authkey, str) else authkey
+    if isinstance(parse_address(address), tuple):
+        raise ValueError(
+            f"Set INFERENCE_SERVER_AUTHKEY to use the TCP address {address}: inference requests are "
+            "unpickled, so anyone who can reach the port with the key can run code in the server"
+        )
+    return DEFAULT_SOCKET_AUTHKEY.encode()
+
+
+class InferenceServer:
+    def __init__(self, model_factory, address: str = INFERENCE_SERVER_ADDRESS,
+                 authkey: Optional[str] = INFERENCE_SERVER_AUTHKEY):
+        self.model_factory = model_factory
+        self.model = None
+        self.load_error = None
+        self.loaded = threading.Event()
+        self.address = address
+        self.authkey = resolve_authkey(address, authkey)
+
+    def serve_forever(self, ready: Optional[threading.Event] = None):
+        address = parse_address(self.address)
+        if isinstance(address, str) and os.path.exists(address):
+            os.remove(address)  # stale socket from a previous run
+        with Listener(address, authkey=self.authkey) as listener:
+            # Accept connections while the models load; requests wait for them
+            threading.Thread(target=self._load_model, name="model-loader", daemon=True).start()
+            logging.info("Inference server listening on %s", self.address)
+            if ready:
+                ready.set()
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception:
+                    logging.warning("Rejected inference client", exc_info=True)
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _load_model(self):
+        try:
+            self.model = self.model_factory()
+            logging.info("Inference server model loaded")
+        except Exception as e:
+            # Waiting and later requests are answered with this instead of hanging
+            logging.exception("Inference server could not load the model")
+            self.load_error = f"Model failed to load: {type(e).__name__}: {e}"
+        finally:
+            self.loaded.set()
+
+    def _transcribe(self, kwargs: dict):
+        self.loaded.wait()
+        if self.load_error:
+            return "error", self.load_error
+        try:
+            # Runs on this connection's thread; the model's ChunkBatcher puts the
+            # VAD chunks of all in-flight requests into shared decoder batches
+            return "ok", self.model.transcribe(**kwargs, return_details=True)
+        except Exception as e:
+            logging.exception("Inference request failed")
+            return "error", f"{type(e).__name__}: {e}"
+
+    def _handle(self, conn):
+        with conn:
+            while True:
+                try:
+                    method, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    return
+                if method == "ping":
+                    response = ("ok", None)
+                elif method == "transcribe":
+                    response = self._transcribe(kwargs)
+                else:
+                    response = ("error", f"Unknown method {method!r}")
+                try:
+                    conn.send(response)
+                except (EOFError, OSError):
+                    return
+
+
+class RemoteASRModel:
+    """ASRModel stand-in that forwards transcribe() to the inference server.
+
+    Audio may be a path (the server shares the filesystem) or a decoded
+    waveform, which is pickled over the connection. The connection is opened
+    on first use, so it is created after Celery forks its workers.
+    """
+
+    def __init__(self, address: str = INFERENCE_SERVER_ADDRESS, authkey: Optional[str] = INFERENCE_SERVER_AUTHKEY,
+                 connect_timeout: float = INFERENCE_CONNECT_TIMEOUT,
+                 request_timeout: float = INFERENCE_REQUEST_TIMEOUT):
+        self.address = address
+        self.authkey = resolve_authkey(address, authkey)
+        self.connect_timeout = connect_timeout
+        self.request_timeout = request_timeout or None
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                return Client(parse_address(self.address), authkey=self.authkey)
+            except (ConnectionRefusedError, FileNotFoundError):
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.5)
+
+    def _call(self, method: str, kwargs: Optional[dict] = None):
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._conn is None:
+                        self._conn = self._connect()
+                    self._conn.send((method, kwargs))
+                    if not self._conn.poll(self.request_timeout):
+                        raise TimeoutError(f"Inference server did not answer within {self.request_timeout:.0f}s")
+                    status, payload = self._conn.recv()
+                    break
+                except TimeoutError:
+                    # A late answer would be read as the next request's; start over
+                    self.close()
+                    raise
+                except (EOFError, OSError):
+                    # Server restarted; requests are idempotent, so retry once
+                    self.close()
+                    if attempt:
+                        raise
+        if status != "ok":
+            raise RuntimeError(f"Inference server error: {payload}")
+        return payload
+
+    def close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except OSError:
+                pass
+            self._conn = None
+
+    def ping(self):
+        self._call("ping")
+
+    def transcribe(self, audio, num_speakers, language="zh", timestamp=False, punctuation=False,
+                   return_duration=False, concurrent=None, diarize=True, return_details=False):
+        result = self._call("transcribe", {
+            "audio": audio,
+            "num_speakers": num_speakers,
+            "language": language,
+            "diarize": diarize,
+        })
+        if return_details:
+            return result
+        if return_duration:
+            return result.segments, result.duration
+        return result.segments
+
+
+if __name__ == "__main__":
+    from asr import load_default_model
+
+    if not INFERENCE_SERVER_ADDRESS:
+        raise SystemExit("Set INFERENCE_SERVER_ADDRESS to a socket path or host:port")
+    try:
+        server = InferenceServer(load_default_model)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    server.serve_forever()
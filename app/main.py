@@ -6,6 +6,7 @@ BASE_DIR = Path(__file__).resolve().parent
 sys.path.append(str(BASE_DIR))
 from database import Base,engine
 from models import Task
+import migrations
 # Add the parent directory of this file to PYTHONPATH
 import uvicorn
 from routers import router
@@ -15,7 +16,8 @@ app.include_router(router)
 @app.on_event("startup")
 def startup():
     # Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
+    # Creates missing tables and adds columns/constraints added since the database was created
+    migrations.upgrade(engine)
 if __name__=="__main__":
     uvicorn.run(app=app,host="0.0.0.0",port=8000)
 
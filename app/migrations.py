@@ -0,0 +1,76 @@
+"""
+Bring an existing database up to the current models.
+
+Base.metadata.create_all only creates missing tables, so columns and unique
+constraints added to existing tables (tasks, task_segments, result_cache) are
+added here. Every step checks the live schema first, so it is safe to run on
+each API start and on a fresh database.
+
+    python app/migrations.py
+"""
+import logging
+import sys
+from pathlib import Path
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+
+sys.path.append(str(Path(__file__).resolve().parent))
+
+from database import Base, engine  # noqa: E402
+import models  # noqa: E402,F401  (registers the tables)
+
+
+def _add_missing_columns(conn, table, existing):
+    preparer = conn.dialect.identifier_preparer
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        ddl = f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} " \
+              f"{column.type.compile(dialect=conn.dialect)}"
+        logging.info("Migrating: %s", ddl)
+        conn.execute(text(ddl))
+        default = column.default
+        if default is not None and default.is_scalar:
+            # Python-side defaults only apply to new rows; give existing rows the same value
+            conn.execute(table.update().where(column.is_(None)).values({column.name: default.arg}))
+        if column.index:
+            conn.execute(text(f"CREATE INDEX {preparer.quote(f'ix_{table.name}_{column.name}')} "
+                              f"ON {preparer.format_table(table)} ({preparer.format_column(column)})"))
+
+
+def _add_missing_unique_constraints(conn, table, inspector):
+    preparer = conn.dialect.identifier_preparer
+    # MySQL reports unique constraints as unique indexes; check both
+    existing = {c["name"] for c in inspector.get_unique_constraints(table.name)}
+    existing |= {i["name"] for i in inspector.get_indexes(table.name) if i.get("unique")}
+    for constraint in table.constraints:
+        if constraint.__visit_name__ != "unique_constraint" or not constraint.name or constraint.name in existing:
+            continue
+        columns = ", ".join(preparer.format_column(c) for c in constraint.columns)
+        ddl = f"CREATE UNIQUE INDEX {preparer.quote(constraint.name)} ON {preparer.format_table(table)} ({columns})"
+        logging.info("Migrating: %s", ddl)
+        try:
+            with conn.begin_nested():
+                conn.execute(text(ddl))
+        except SQLAlchemyError:
+            # Usually rows that already violate it; the app still runs, without the guarantee
+            logging.exception("Could not add %s to %s; remove the duplicate rows and run "
+                              "app/migrations.py again", constraint.name, table.name)
+
+
+def upgrade(bind=engine):
+    """Create missing tables, then add missing columns and unique constraints."""
+    Base.metadata.create_all(bind=bind)
+    with bind.begin() as conn:
+        inspector = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            _add_missing_columns(conn, table, existing)
+            _add_missing_unique_constraints(conn, table, inspector)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    upgrade()
+    print("Database schema is up to date")
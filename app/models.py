@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Boolean, JSON as SQLAlchemyJSON, Text, ForeignKey
+from sqlalchemy import Column, String, Integer, BigInteger, Boolean, Float, JSON as SQLAlchemyJSON, Text, ForeignKey, Index, LargeBinary, UniqueConstraint
 from database import Base
 
 class Task(Base):
@@ -7,21 +7,67 @@ class Task(Base):
     status = Column(Integer, default=0)
     file_len = Column(String(50))
     file_name = Column(String(255))
+    total_segments = Column(Integer, default=1)
     speaker_number = Column(String(10))
     has_separate = Column(Boolean, default=False)
     language = Column(String(50))
     pd = Column(String(50), nullable=True)
     hotWord = Column(String(50), nullable=True)
     file_path = Column(String(255), nullable=True)
+    audio_hash = Column(String(64), nullable=True, index=True)  # see result_cache.audio_hash
     result = Column(SQLAlchemyJSON, nullable=True)
+    punctuated_result = Column(SQLAlchemyJSON, nullable=True)
+    punctuation_status = Column(Integer, nullable=True)  # None: not requested, 0: queued, 2: processing, 9: completed, -1: failed
     error = Column(Text, nullable=True)
 
 class TaskSegment(Base):
     __tablename__ = "task_segments"
+    __table_args__ = (UniqueConstraint("task_id", "segment_id", name="uq_task_segments_task_segment"),)
     id = Column(Integer, primary_key=True, autoincrement=True)
     task_id = Column(String(32), ForeignKey("tasks.id"))
     segment_id = Column(Integer)
     segment_len = Column(String(50))
     file_path = Column(String(255))
+    checksum = Column(String(64), nullable=True)  # sha256 of the segment bytes
     status = Column(Integer, default=0)  # 0: uploaded, 2: processing, 9: completed
 
+
+class ResultCache(Base):
+    __tablename__ = "result_cache"
+    key = Column(String(64), primary_key=True)  # sha256 of (audio hash, language, speakers, separate, model)
+    model_version = Column(String(100))
+    result = Column(SQLAlchemyJSON)
+    punctuated_result = Column(SQLAlchemyJSON, nullable=True)
+    size_bytes = Column(BigInteger, default=0)
+    hits = Column(Integer, default=0)
+    created_at = Column(Float)
+    last_used_at = Column(Float, index=True)
+
+
+class ResultLine(Base):
+    """One line of a task's transcript, so results can be paged and filtered in SQL."""
+    __tablename__ = "result_lines"
+    __table_args__ = (
+        UniqueConstraint("task_id", "line_no", name="uq_result_lines_task_line"),
+        Index("ix_result_lines_task_bg", "task_id", "bg"),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    task_id = Column(String(32), ForeignKey("tasks.id"), nullable=False)
+    line_no = Column(Integer, nullable=False)  # position in Task.result, used as the page cursor
+    bg = Column(Integer, nullable=False)  # ms
+    ed = Column(Integer, nullable=False)  # ms
+    speaker = Column(String(10))
+    onebest = Column(Text)
+    punctuated = Column(Text, nullable=True)
+
+
+class SpeakerEmbedding(Base):
+    """Embedding of one chunk-local speaker, kept so chunks can be re-clustered without audio."""
+    __tablename__ = "speaker_embeddings"
+    __table_args__ = (UniqueConstraint("task_id", "chunk", "speaker", name="uq_speaker_embeddings_task_chunk_speaker"),)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    task_id = Column(String(32), ForeignKey("tasks.id"), nullable=False, index=True)
+    chunk = Column(Integer, nullable=False)
+    speaker = Column(String(20), nullable=False)  # diarization label within the chunk, e.g. SPEAKER_01
+    duration = Column(Float, nullable=False)  # seconds of speech, weights the speaker in clustering
+    embedding = Column(LargeBinary, nullable=False)  # float32 vector
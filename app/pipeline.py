@@ -0,0 +1,65 @@
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+PUNCTUATION_ENABLED = os.getenv("PUNCTUATION_ENABLED", "true").lower() == "true"
+
+
+@dataclass(frozen=True)
+class PipelinePlan:
+    """Which processing stages a task actually needs."""
+    diarize: bool
+    num_speakers: Optional[int]
+    punctuate: bool = PUNCTUATION_ENABLED
+
+    @property
+    def stages(self) -> Tuple[str, ...]:
+        stages = ("decode", "asr")
+        if self.diarize:
+            stages += ("diarization", "assign")
+        if self.punctuate:
+            stages += ("punctuation",)
+        return stages
+
+
+@dataclass
+class TranscriptionResult:
+    """One transcribe() call's output with its per-stage seconds and diarization turns.
+
+    Returned rather than kept on the model, which is shared by concurrent
+    callers (API threads, batched chunks, inference server clients).
+    """
+    segments: List[dict]
+    duration: float
+    timings: Dict[str, float] = field(default_factory=dict)
+    speaker_turns: Optional[Any] = None  # speaker_assignment.SpeakerTurns, None without diarization
+
+
+def resolve_language(task) -> str:
+    if not task.language or task.language == "default":
+        return "zh"
+    return task.language
+
+
+def parse_speaker_number(value) -> Optional[int]:
+    try:
+        num = int(value)
+    except (TypeError, ValueError):
+        return None
+    return num if num > 0 else None
+
+
+def plan_pipeline(task) -> PipelinePlan:
+    """Work out the stages for a Task.
+
+    Speaker labels are only returned when has_separate is set, and a single
+    speaker needs no diarization, so both cases skip pyannote and speaker
+    assignment entirely. Punctuation, when enabled, runs afterwards as a
+    separate stage on the post-processing queue.
+    """
+    num_speakers = parse_speaker_number(task.speaker_number)
+    diarize = bool(task.has_separate) and num_speakers != 1
+    plan = PipelinePlan(diarize=diarize, num_speakers=num_speakers)
+    logging.info("Pipeline plan for task %s: %s", task.id, " -> ".join(plan.stages))
+    return plan
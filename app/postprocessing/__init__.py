@@ -1,2 +1,2 @@
-from .punctuation import  add_punctuation
-from .tokenizer import repair_en_sticky_word
+from .punctuation import  add_punctuation, add_punctuation_batch, punctuation_registry, warm_up_punctuation
+from .tokenizer import repair_en_sticky_word, repair_en_sticky_words
@@ -4,108 +4,221 @@
 
 ChinesePunctuation is a tool for restore the punctuation in chinese which maybe conatins some . 
 """
+import logging
+import os
 import re
+import threading
+from collections import OrderedDict
 
-from punctuators.models import PunctCapSegModelONNX
-from transformers import AutoModelForTokenClassification,AutoTokenizer
-import torch
-from torch.utils.data import DataLoader
-from zhpr.predict import DocumentDataset,merge_stride, decode_pred
+logger = logging.getLogger(__name__)
+
+# pcs_47lang's ONNX graph is ~ 0.5 GB once loaded; ORT does not expose a size
+PUNCTUATION_ONNX_MODEL_BYTES = int(os.getenv("PUNCTUATION_ONNX_MODEL_BYTES", str(512 * 1024 * 1024)))
+PUNCTUATION_MEMORY_BUDGET = int(os.getenv("PUNCTUATION_MEMORY_BUDGET", str(2 * 1024 * 1024 * 1024)))
+PUNCTUATION_WARMUP = os.getenv("PUNCTUATION_WARMUP", "")
+PUNCTUATION_BATCH_SIZE = int(os.getenv("PUNCTUATION_BATCH_SIZE", "32"))
 
 
 class ChinesePunctuation(object):
 
     def __init__(self):
+        from transformers import AutoModelForTokenClassification, AutoTokenizer
+
         model_name = 'p208p2002/zh-wiki-punctuation-restore'
         self.model = AutoModelForTokenClassification.from_pretrained(model_name)
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
         self.punc_list = ["，", "、", "。", "？", "！", "；"]
 
-    def predict_step(self, batch):
-        batch_out = []
-        batch_input_ids = batch
-    
-        encodings = {'input_ids': batch_input_ids}
-        output = self.model(**encodings)
-    
-        predicted_token_class_id_batch = output['logits'].argmax(-1)
-        for predicted_token_class_ids, input_ids in zip(predicted_token_class_id_batch, batch_input_ids):
-            out=[]
-            tokens = self.tokenizer.convert_ids_to_tokens(input_ids)
-            
-            input_ids = input_ids.tolist()
-            try:
-                input_id_pad_start = input_ids.index(self.tokenizer.pad_token_id)
-            except:
-                input_id_pad_start = len(input_ids)
-            input_ids = input_ids[:input_id_pad_start]
-            tokens = tokens[:input_id_pad_start]
-    
-            predicted_tokens_classes = [self.model.config.id2label[t.item()] for t in predicted_token_class_ids]
-            predicted_tokens_classes = predicted_tokens_classes[:input_id_pad_start]
-    
-            for token,ner in zip(tokens,predicted_tokens_classes):
-                out.append((token,ner))
-            batch_out.append(out)
-            
-        return batch_out
-    
+    def _token_tables(self):
+        # id -> token / id -> label lookups, built once instead of per window
+        if not hasattr(self, "_id2token"):
+            self._id2token = self.tokenizer.convert_ids_to_tokens(list(range(len(self.tokenizer))))
+            self._id2label = [self.model.config.id2label[i] for i in range(self.model.config.num_labels)]
+        return self._id2token, self._id2label
+
+    def predict_windows(self, windows, batch_size=PUNCTUATION_BATCH_SIZE):
+        """Tag a list of token-id windows, returning [(token, label), ...] per window.
+
+        Windows are sorted by length and packed into batches regardless of
+        which document they came from, padded only to the longest window in
+        the batch, and run without autograd.
+        """
+        import torch
+
+        id2token, id2label = self._token_tables()
+        order = sorted(range(len(windows)), key=lambda i: len(windows[i]))
+        out = [None] * len(windows)
+
+        with torch.inference_mode():
+            for batch_start in range(0, len(order), batch_size):
+                batch_idx = order[batch_start:batch_start + batch_size]
+                max_len = max(len(windows[i]) for i in batch_idx)
+                input_ids = torch.full((len(batch_idx), max_len), self.tokenizer.pad_token_id, dtype=torch.long)
+                attention_mask = torch.zeros((len(batch_idx), max_len), dtype=torch.long)
+                for row, i in enumerate(batch_idx):
+                    input_ids[row, :len(windows[i])] = torch.tensor(windows[i], dtype=torch.long)
+                    attention_mask[row, :len(windows[i])] = 1
+
+                logits = self.model(input_ids=input_ids, attention_mask=attention_mask)['logits']
+                for row, labels in zip(batch_idx, logits.argmax(-1).tolist()):
+                    ids = windows[row]
+                    out[row] = [(id2token[t], id2label[l]) for t, l in zip(ids, labels[:len(ids)])]
+        return out
+
+    def restore_batch(self, texts, window_size=256, step=200, batch_size=PUNCTUATION_BATCH_SIZE):
+        """Restore punctuation for many texts in one pass over the model."""
+        from zhpr.predict import merge_stride, decode_pred
+
+        windows, owners = [], []
+        for doc_idx, text in enumerate(texts):
+            # zhpr tags one character per token; spaces are kept as "<s>"
+            chars = list(text.replace(" ", "<s>").lower())
+            ids = self.tokenizer.convert_tokens_to_ids(chars)
+            for window_start in range(0, len(ids), step):
+                windows.append(ids[window_start:window_start + window_size])
+                owners.append(doc_idx)
+
+        doc_windows = [[] for _ in texts]
+        for doc_idx, tagged in zip(owners, self.predict_windows(windows, batch_size=batch_size)):
+            doc_windows[doc_idx].append(tagged)
+
+        restored = []
+        for text, model_pred_out in zip(texts, doc_windows):
+            merge_pred_result = merge_stride(model_pred_out, step)
+            merge_pred_result_deocde = ''.join(decode_pred(merge_pred_result))
+            merge_pred_result_deocde = merge_pred_result_deocde.replace("[UNK]", "")
+            merge_pred_result_deocde = merge_pred_result_deocde.replace("<s>", " ")
+            for word in set(re.findall("[a-zA-Z]+", text)):
+                if word.lower() in merge_pred_result_deocde:
+                    merge_pred_result_deocde = merge_pred_result_deocde.replace(word.lower(), word)
+            restored.append(merge_pred_result_deocde)
+        return restored
+
     def restore(self, text, window_size=256, step=200):
-        en_words = set(re.findall("[a-zA-Z]+", text))
-        text = text.replace(" ", "<s>")
-        dataset = DocumentDataset(text.lower(), window_size=window_size, step=step)
-        dataloader = DataLoader(dataset=dataset,shuffle=False,batch_size=5)
-
-        model_pred_out = []
-        for batch in dataloader:
-            batch_out = self.predict_step(batch)
-            for out in batch_out:
-                model_pred_out.append(out)
-            
-        merge_pred_result = merge_stride(model_pred_out,step)
-        merge_pred_result_deocde = decode_pred(merge_pred_result)
-        merge_pred_result_deocde = ''.join(merge_pred_result_deocde)
-        merge_pred_result_deocde = merge_pred_result_deocde.replace("[UNK]", "")
-        merge_pred_result_deocde = merge_pred_result_deocde.replace("<s>", " ")
-        for word in en_words:
-            if word.lower() in merge_pred_result_deocde:
-                merge_pred_result_deocde = merge_pred_result_deocde.replace(word.lower(), word)
-        
-        return merge_pred_result_deocde
+        return self.restore_batch([text], window_size=window_size, step=step)[0]
 
-    def __call__(self, text, end_punc="。"):
-        restored = self.restore(text)
+    def _end(self, restored, end_punc):
         if restored and restored[-1] not in self.punc_list:
-            restored += end_punc   
+            restored += end_punc
         return restored
 
+    def __call__(self, text, end_punc="。"):
+        return self._end(self.restore(text), end_punc)
+
+    def batch(self, texts, end_punc="。"):
+        return [self._end(restored, end_punc) for restored in self.restore_batch(texts)]
+
 
 class EnglishPunctuation(object):
     
     def __call__(self, text, end_punc="。"):
         return text # by pass, using whisper prompt do it
+
+    def batch(self, texts, end_punc="。"):
+        return list(texts)
        
 
 class OthersPunctuation(object):
     
     def __init__(self):
+        from punctuators.models import PunctCapSegModelONNX
+
         self.model = PunctCapSegModelONNX.from_pretrained("pcs_47lang")
 
     def __call__(self, text, end_punc="。"):
-        results = self.model.infer(texts=[text], apply_sbd=True)
-        return re.sub("(?i)<unk>", "", " ".join(results[0]))
+        return self.batch([text], end_punc)[0]
 
-    
-punc_model_table = {
-    "zh": ChinesePunctuation(),
-    "en": EnglishPunctuation(),
+    def batch(self, texts, end_punc="。"):
+        results = self.model.infer(texts=list(texts), apply_sbd=True)
+        return [re.sub("(?i)<unk>", "", " ".join(result)) for result in results]
+
+
+def _torch_model_bytes(model):
+    return sum(p.numel() * p.element_size() for p in model.parameters())
+
+
+def _estimate_bytes(punc_model):
+    """Rough resident size of a loaded punctuation model."""
+    model = getattr(punc_model, "model", None)
+    if model is None:
+        return 0
+    if hasattr(model, "parameters"):
+        return _torch_model_bytes(model)
+    return PUNCTUATION_ONNX_MODEL_BYTES
+
+
+punc_model_factories = {
+    "zh": ChinesePunctuation,
+    "en": EnglishPunctuation,
 }
-other_punctuation = OthersPunctuation() # japanese is work well!
+other_punctuation_factory = OthersPunctuation  # japanese is work well!
+
+
+class PunctuationRegistry(object):
+    """Loads punctuation models on first use and keeps them in an LRU.
+
+    Every language outside punc_model_factories shares the multilingual
+    model under the "others" key. When the estimated size of the loaded
+    models exceeds memory_budget, the least recently used ones are dropped
+    (the one just requested is always kept).
+    """
+
+    def __init__(self, memory_budget=PUNCTUATION_MEMORY_BUDGET):
+        self.memory_budget = memory_budget
+        self._models = OrderedDict()  # key -> (model, estimated bytes)
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def model_key(language):
+        return language if language in punc_model_factories else "others"
+
+    def get(self, language):
+        key = self.model_key(language)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key][0]
+
+            logger.info("Loading punctuation model for %s", key)
+            factory = punc_model_factories.get(key, other_punctuation_factory)
+            model = factory()
+            self._models[key] = (model, _estimate_bytes(model))
+            self._evict(keep=key)
+            return model
+
+    def _evict(self, keep):
+        while self.loaded_bytes() > self.memory_budget and len(self._models) > 1:
+            oldest = next(k for k in self._models if k != keep)
+            _, size = self._models.pop(oldest)
+            logger.info("Evicted punctuation model %s (%d MB)", oldest, size // (1024 * 1024))
+
+    def loaded_bytes(self):
+        return sum(size for _, size in self._models.values())
+
+    def loaded(self):
+        return list(self._models)
+
+    def warm_up(self, languages):
+        for language in languages:
+            self.get(language)
+
+
+punctuation_registry = PunctuationRegistry()
+
+
+def warm_up_punctuation(languages=None):
+    """Preload models for `languages` (default: comma-separated PUNCTUATION_WARMUP)."""
+    if languages is None:
+        languages = [lang.strip() for lang in PUNCTUATION_WARMUP.split(",") if lang.strip()]
+    punctuation_registry.warm_up(languages)
 
 
 def add_punctuation(text, language):
-    if language in punc_model_table:
-        return punc_model_table[language](text)
-    else:
-        return other_punctuation(text)
+    return punctuation_registry.get(language)(text)
+
 
+def add_punctuation_batch(texts, language):
+    """Punctuate many lines of one language in a single batched call."""
+    if not texts:
+        return []
+    return punctuation_registry.get(language).batch(texts)
@@ -1,21 +1,23 @@
 import re
+from functools import lru_cache
 
 import wordninja
 
+_LATIN_RUN = re.compile("[a-zA-Z]+")
+
+
+@lru_cache(maxsize=8192)
+def split_sticky_word(segment):
+    """wordninja split of one Latin run, joined with spaces (memoized)."""
+    return " ".join(wordninja.split(segment))
+
 
 def repair_en_sticky_word(sent):
-    records = []
-    for match in re.finditer("[a-zA-Z]+", sent):
-        start = match.start()
-        end = match.end()
-
-        segment = match.group()
-        fixed_seg = wordninja.split(segment)
-
-        records.append((segment, " ".join(fixed_seg)))
-    
-    new_sent = sent
-    for record in records:
-        new_sent = new_sent.replace(*record)
-        
-    return new_sent
\ No newline at end of file
+    # One regex pass rewriting each Latin run in place, so runs never
+    # interfere with each other and long transcripts stay linear.
+    return _LATIN_RUN.sub(lambda match: split_sticky_word(match.group()), sent)
+
+
+def repair_en_sticky_words(sents):
+    """Batch entry point for a whole transcript (an iterable of lines)."""
+    return [repair_en_sticky_word(sent) for sent in sents]
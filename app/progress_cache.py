@@ -0,0 +1,186 @@
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def default_redis_url() -> Optional[str]:
+    broker = os.getenv("BROKER_URL") or ""
+    return broker if broker.startswith(("redis://", "rediss://")) else None
+
+
+# Redis holding progress snapshots. Without one, reads go to the database,
+# unless PROGRESS_CACHE_LOCAL keeps snapshots in this process, which is only
+# correct when the worker runs in the same process (eager Celery, tests).
+PROGRESS_CACHE_URL = os.getenv("PROGRESS_CACHE_URL") or os.getenv("PROGRESS_PUBSUB_URL") or default_redis_url()
+PROGRESS_CACHE_LOCAL = os.getenv("PROGRESS_CACHE_LOCAL", "false").lower() == "true"
+PROGRESS_CACHE_TTL = int(os.getenv("PROGRESS_CACHE_TTL", str(7 * 24 * 3600)))
+LOCAL_CACHE_MAX_TASKS = 10000
+SNAPSHOT_PREFIX = "asr:snapshot:"
+SEGMENT_PREFIX = "segment:"
+
+
+def snapshot_key(task_id: str) -> str:
+    return SNAPSHOT_PREFIX + task_id
+
+
+class InProcessSnapshots:
+    """Snapshot hashes for this process, least recently written evicted first."""
+
+    def __init__(self, max_tasks: int = LOCAL_CACHE_MAX_TASKS):
+        self.max_tasks = max_tasks
+        self._hashes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def update(self, task_id: str, fields: dict, only_missing: bool = False):
+        with self._lock:
+            fields_ = self._hashes.setdefault(task_id, {})
+            for name, value in fields.items():
+                if not only_missing or name not in fields_:
+                    fields_[name] = value
+            self._hashes.move_to_end(task_id)
+            while len(self._hashes) > self.max_tasks:
+                self._hashes.popitem(last=False)
+
+    def discard(self, task_id: str):
+        with self._lock:
+            self._hashes.pop(task_id, None)
+
+    def get(self, task_id: str) -> dict:
+        with self._lock:
+            return dict(self._hashes.get(task_id, {}))
+
+
+local_snapshots = InProcessSnapshots()
+_redis_client = None
+_async_redis_client = None
+
+
+def _redis():
+    global _redis_client
+    if _redis_client is None:
+        import redis
+        _redis_client = redis.Redis.from_url(PROGRESS_CACHE_URL)
+    return _redis_client
+
+
+def _async_redis():
+    global _async_redis_client
+    if _async_redis_client is None:
+        import redis.asyncio as aioredis
+        _async_redis_client = aioredis.Redis.from_url(PROGRESS_CACHE_URL)
+    return _async_redis_client
+
+
+def encode(snapshot: dict) -> dict:
+    fields = {}
+    for name in ("task_status", "total_segments", "punctuation_status"):
+        if name in snapshot:
+            fields[name] = json.dumps(snapshot[name])
+    for segment_id, status in snapshot.get("segments", {}).items():
+        fields[f"{SEGMENT_PREFIX}{segment_id}"] = json.dumps(status)
+    return fields
+
+
+def decode(fields: dict) -> Optional[dict]:
+    """Snapshot from hash fields, or None unless task status and total are known.
+
+    A hash can be partial when it expired and a worker wrote one field since,
+    so callers fall back to the database for those.
+    """
+    fields = {(k.decode() if isinstance(k, bytes) else k): v for k, v in fields.items()}
+    if "task_status" not in fields or "total_segments" not in fields:
+        return None
+    segments = {
+        int(name[len(SEGMENT_PREFIX):]): json.loads(value)
+        for name, value in fields.items() if name.startswith(SEGMENT_PREFIX)
+    }
+    punctuation = fields.get("punctuation_status")
+    return {
+        "task_status": json.loads(fields["task_status"]),
+        "total_segments": json.loads(fields["total_segments"]),
+        "punctuation_status": json.loads(punctuation) if punctuation is not None else None,
+        "segments": dict(sorted(segments.items())),
+    }
+
+
+def write(task_id: str, snapshot: dict):
+    """Write-through update of a task's snapshot; never raises into the caller.
+
+    If the update fails the snapshot is deleted, so readers fall back to the
+    database instead of serving the previous status until the TTL runs out.
+    """
+    fields = encode(snapshot)
+    try:
+        if not PROGRESS_CACHE_URL:
+            if PROGRESS_CACHE_LOCAL:
+                local_snapshots.update(task_id, fields)
+            return
+        pipe = _redis().pipeline(transaction=False)
+        pipe.hset(snapshot_key(task_id), mapping=fields)
+        pipe.expire(snapshot_key(task_id), PROGRESS_CACHE_TTL)
+        pipe.execute()
+    except Exception:
+        logging.warning("Failed to update progress snapshot for task %s", task_id, exc_info=True)
+        invalidate(task_id)
+
+
+def invalidate(task_id: str):
+    """Drop a task's snapshot (best effort); the next read refills it from the database."""
+    try:
+        if not PROGRESS_CACHE_URL:
+            local_snapshots.discard(task_id)
+            return
+        _redis().delete(snapshot_key(task_id))
+    except Exception:
+        logging.error("Failed to drop the stale progress snapshot of task %s", task_id, exc_info=True)
+
+
+def record_task(task_id: str, status: int, total_segments: Optional[int] = None):
+    snapshot = {"task_status": status}
+    if total_segments is not None:
+        snapshot["total_segments"] = total_segments
+        snapshot["punctuation_status"] = None
+    write(task_id, snapshot)
+
+
+def record_segment(task_id: str, segment_id: int, status: int):
+    write(task_id, {"segments": {segment_id: status}})
+
+
+def record_punctuation(task_id: str, status: Optional[int]):
+    write(task_id, {"punctuation_status": status})
+
+
+async def get(task_id: str) -> Optional[dict]:
+    """Cached snapshot of a task, or None on a miss (or if Redis is down)."""
+    try:
+        if not PROGRESS_CACHE_URL:
+            return decode(local_snapshots.get(task_id)) if PROGRESS_CACHE_LOCAL else None
+        return decode(await _async_redis().hgetall(snapshot_key(task_id)))
+    except Exception:
+        logging.warning("Failed to read progress snapshot for task %s", task_id, exc_info=True)
+        return None
+
+
+async def fill(task_id: str, snapshot: dict):
+    """Populate the cache from a database read without overwriting newer worker writes."""
+    fields = encode(snapshot)
+    try:
+        if not PROGRESS_CACHE_URL:
+            if PROGRESS_CACHE_LOCAL:
+                local_snapshots.update(task_id, fields, only_missing=True)
+            return
+        pipe = _async_redis().pipeline(transaction=False)
+        for name, value in fields.items():
+            pipe.hsetnx(snapshot_key(task_id), name, value)
+        pipe.expire(snapshot_key(task_id), PROGRESS_CACHE_TTL)
+        await pipe.execute()
+    except Exception:
+        logging.warning("Failed to fill progress snapshot for task %s", task_id, exc_info=True)
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from typing import Optional
+
+from dotenv import load_dotenv
+
+import progress_cache
+
+load_dotenv()
+
+# Redis URL for progress events; without one, an in-process broker is used
+# (enough when the API and the worker share a process, e.g. in tests).
+PROGRESS_PUBSUB_URL = os.getenv("PROGRESS_PUBSUB_URL") or progress_cache.default_redis_url()
+CHANNEL_PREFIX = "asr:progress:"
+
+
+def channel(task_id: str) -> str:
+    return CHANNEL_PREFIX + task_id
+
+
+class InProcessBroker:
+    """Thread-safe pub/sub fan-out to asyncio subscribers in this process."""
+
+    def __init__(self):
+        self._subscribers = {}  # task_id -> set of (loop, asyncio.Queue)
+        self._lock = threading.Lock()
+
+    def publish(self, task_id: str, event: dict):
+        with self._lock:
+            subscribers = list(self._subscribers.get(task_id, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    def add(self, task_id: str):
+        entry = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers.setdefault(task_id, set()).add(entry)
+        return entry
+
+    def remove(self, task_id: str, entry):
+        with self._lock:
+            self._subscribers[task_id].discard(entry)
+            if not self._subscribers[task_id]:
+                del self._subscribers[task_id]
+
+
+local_broker = InProcessBroker()
+_redis_client = None
+_async_redis_client = None  # (event loop, client); its pool is shared by all subscriptions
+
+
+def _redis():
+    global _redis_client
+    if _redis_client is None:
+        import redis
+        _redis_client = redis.Redis.from_url(PROGRESS_PUBSUB_URL)
+    return _redis_client
+
+
+def _async_redis():
+    global _async_redis_client
+    loop = asyncio.get_running_loop()
+    if _async_redis_client is None or _async_redis_client[0] is not loop:
+        import redis.asyncio as aioredis
+        _async_redis_client = (loop, aioredis.Redis.from_url(PROGRESS_PUBSUB_URL))
+    return _async_redis_client[1]
+
+
+def publish(task_id: str, event: dict):
+    """Publish a progress event; never raises into the caller."""
+    event = {"task_id": task_id, **event}
+    try:
+        if PROGRESS_PUBSUB_URL:
+            _redis().publish(channel(task_id), json.dumps(event))
+        else:
+            local_broker.publish(task_id, event)
+    except Exception:
+        logging.warning("Failed to publish progress event for task %s", task_id, exc_info=True)
+
+
+# Each status helper records the change in the progress snapshot before
+# announcing it, so snapshot reads never lag the event stream.
+def publish_task_status(task_id: str, status: int):
+    progress_cache.record_task(task_id, status)
+    publish(task_id, {"type": "task", "status": status})
+
+
+def publish_segment_status(task_id: str, segment_id: int, status: int):
+    progress_cache.record_segment(task_id, segment_id, status)
+    publish(task_id, {"type": "segment", "segment_id": segment_id, "status": status})
+
+
+def publish_punctuation_status(task_id: str, status: Optional[int]):
+    progress_cache.record_punctuation(task_id, status)
+    publish(task_id, {"type": "punctuation", "status": status})
+
+
+class Subscription:
+    """Events for one task; the subscription is live once the context is entered."""
+
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self._entry = None
+        self._pubsub = None
+
+    async def __aenter__(self):
+        if PROGRESS_PUBSUB_URL:
+            # Only the pubsub connection is per stream; it goes back to the shared pool on exit
+            self._pubsub = _async_redis().pubsub()
+            await self._pubsub.subscribe(channel(self.task_id))
+        else:
+            self._entry = local_broker.add(self.task_id)
+        return self
+
+    async def get(self, timeout: float) -> Optional[dict]:
+        """Next event, or None if nothing arrived within timeout seconds."""
+        if self._pubsub is None:
+            try:
+                return await asyncio.wait_for(self._entry[1].get(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        return json.loads(message["data"]) if message else None
+
+    async def __aexit__(self, *exc):
+        if self._pubsub is not None:
+            await self._pubsub.unsubscribe(channel(self.task_id))
+            await self._pubsub.aclose()
+        else:
+            local_broker.remove(self.task_id, self._entry)
+
+
+def subscribe(task_id: str) -> Subscription:
+    return Subscription(task_id)
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Iterable, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import func
+
+from database import Session
+from models import ResultCache
+from pipeline import parse_speaker_number, resolve_language
+
+load_dotenv()
+
+# Bump when the ASR/diarization weights change so old results are not reused
+MODEL_VERSION = os.getenv("ASR_MODEL_VERSION", "whisper-large-v2-lora-zh-ct2+epoch=19")
+# Total size of cached results (serialized JSON bytes) before LRU eviction
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+
+def audio_hash(segment_paths: Iterable[str], chunk_size: int = 1024 * 1024) -> str:
+    """Content hash of a recording: sha256 of its segment files' bytes, concatenated in order.
+
+    It does not depend on how the client split the file, so the same audio
+    uploaded as 3 or 5 segments gets the same hash.
+    """
+    digest = hashlib.sha256()
+    for path in segment_paths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(audio_hash_: str, language: str, speaker_number, has_separate: bool,
+              model_version: str = MODEL_VERSION) -> str:
+    parts = [audio_hash_, language, str(parse_speaker_number(speaker_number)),
+             str(bool(has_separate)), model_version]
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+
+def key_for_task(task) -> str:
+    return cache_key(task.audio_hash, resolve_language(task), task.speaker_number, task.has_separate)
+
+
+def lookup(db: Session, key: str) -> Optional[ResultCache]:
+    entry = db.query(ResultCache).filter(ResultCache.key == key).first()
+    if entry is None:
+        return None
+    entry.hits += 1
+    entry.last_used_at = time.time()
+    db.commit()
+    logging.info("Result cache hit %s (%d hits)", key, entry.hits)
+    return entry
+
+
+def payload_size(*payloads) -> int:
+    """Serialized JSON bytes of an entry's stored payloads, as counted against the cache size."""
+    return sum(len(json.dumps(p, ensure_ascii=False).encode()) for p in payloads if p is not None)
+
+
+def store(db: Session, key: str, result: list, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+    size = payload_size(result)
+    if size > max_bytes:
+        logging.info("Result for %s is larger than the cache (%d bytes), not caching", key, size)
+        return
+    now = time.time()
+    entry = db.merge(ResultCache(key=key, result=result, size_bytes=size, hits=0,
+                                 model_version=MODEL_VERSION, created_at=now, last_used_at=now))
+    # Replacing an entry keeps its punctuated result, which still counts
+    entry.size_bytes = payload_size(entry.result, entry.punctuated_result)
+    db.commit()
+    evict(db, max_bytes)
+
+
+def store_punctuated(db: Session, key: str, punctuated: list):
+    entry = db.query(ResultCache).filter(ResultCache.key == key).first()
+    if entry is None:
+        return
+    entry.punctuated_result = punctuated
+    # Recomputed rather than added to, so re-punctuation does not count twice
+    entry.size_bytes = payload_size(entry.result, punctuated)
+    db.commit()
+    evict(db)
+
+
+def evict(db: Session, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+    """Drop least recently used entries until the cache fits in max_bytes."""
+    total = db.query(func.coalesce(func.sum(ResultCache.size_bytes), 0)).scalar()
+    if total <= max_bytes:
+        return
+    stale = []
+    for key, size in db.query(ResultCache.key, ResultCache.size_bytes).order_by(ResultCache.last_used_at):
+        if total <= max_bytes:
+            break
+        stale.append(key)
+        total -= size
+    db.query(ResultCache).filter(ResultCache.key.in_(stale)).delete(synchronize_session=False)
+    db.commit()
+    logging.info("Result cache evicted %d entries, %d bytes remain", len(stale), total)
@@ -0,0 +1,78 @@
+import logging
+from typing import List, Optional, Sequence
+
+from sqlalchemy import delete, insert, select, update
+
+from database import Session
+from models import ResultLine, Task
+
+
+def write_lines(db: Session, task_id: str, lines: List[dict]):
+    """Replace a task's result lines; committed by the caller with the task."""
+    db.execute(delete(ResultLine).where(ResultLine.task_id == task_id))
+    if lines:
+        db.execute(insert(ResultLine), [
+            {
+                "task_id": task_id,
+                "line_no": line_no,
+                "bg": int(line["bg"]),
+                "ed": int(line["ed"]),
+                "speaker": line.get("speaker"),
+                "onebest": line["onebest"],
+            }
+            for line_no, line in enumerate(lines)
+        ])
+
+
+def write_punctuated(db: Session, task_id: str, lines: List[dict]):
+    """Store punctuated text for lines already written by write_lines."""
+    ids = db.scalars(
+        select(ResultLine.id).where(ResultLine.task_id == task_id).order_by(ResultLine.line_no)
+    ).all()
+    if len(ids) != len(lines):
+        logging.warning("Task %s has %d result lines but %d punctuated lines", task_id, len(ids), len(lines))
+    if ids:
+        db.execute(update(ResultLine), [
+            {"id": id_, "punctuated": line["onebest"]} for id_, line in zip(ids, lines)
+        ])
+
+
+def backfill(db: Session, task_id: str) -> bool:
+    """Split the result JSON of a task completed before result_lines existed."""
+    task = db.get(Task, task_id)
+    if not task or not task.result:
+        return False
+    write_lines(db, task_id, task.result)
+    if task.punctuated_result:
+        write_punctuated(db, task_id, task.punctuated_result)
+    db.commit()
+    logging.info("Backfilled %d result lines for task %s", len(task.result), task_id)
+    return True
+
+
+def page_query(task_id: str, after: Optional[int] = None, limit: Optional[int] = None,
+               bg: Optional[int] = None, ed: Optional[int] = None,
+               speakers: Sequence[str] = ()):
+    """Select a task's lines in order, after a cursor, overlapping [bg, ed) and by speaker."""
+    query = select(ResultLine).where(ResultLine.task_id == task_id)
+    if after is not None:
+        query = query.where(ResultLine.line_no > after)
+    if bg is not None:
+        query = query.where(ResultLine.ed > bg)
+    if ed is not None:
+        query = query.where(ResultLine.bg < ed)
+    if speakers:
+        query = query.where(ResultLine.speaker.in_(speakers))
+    query = query.order_by(ResultLine.line_no)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def to_api_line(line: ResultLine, punctuated: bool = False) -> dict:
+    return {
+        "bg": str(line.bg),
+        "ed": str(line.ed),
+        "onebest": line.punctuated if punctuated else line.onebest,
+        "speaker": line.speaker,
+    }
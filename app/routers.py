@@ -1,15 +1,37 @@
 
+import asyncio
 import json
 import logging
 import os
 import uuid
-from fastapi import APIRouter, BackgroundTasks, File, Form, UploadFile
+from fastapi import APIRouter, BackgroundTasks, File, Form, UploadFile, WebSocket, WebSocketDisconnect
 from fastapi import Depends
-from fastapi.responses import JSONResponse
-from tasks.process_audio import process_audio
-from database import get_db,Session
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from tasks.process_audio import get_asr_model, process_audio
+from database import get_async_db, AsyncSessionLocal
 import requests
-from models import Task, TaskSegment
+from models import ResultLine, Task, TaskSegment
+from upload_storage import (
+    UPLOAD_MAX_BYTES,
+    UploadInProgress,
+    UploadOffsetMismatch,
+    UploadTooLarge,
+    append_upload,
+    finalize_upload,
+    received_bytes,
+    save_upload,
+)
+from tasks.punctuate import punctuate_result
+from pipeline import plan_pipeline
+import result_cache
+import result_store
+import progress_cache
+import progress_events
+from streaming import SAMPLE_RATE, StreamingTranscriber, pcm16_to_float
 router = APIRouter()
 # from asr import ASRModel
 # import httpx
@@ -28,7 +50,7 @@ async def prepare(
     language: str = Form("default"),
     pd: str = Form(None),
     hotWord: str = Form(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     task_id = uuid.uuid4().hex
     task = Task(
@@ -47,7 +69,8 @@ async def prepare(
         error=None,
     )
     db.add(task)
-    db.commit()
+    await db.commit()
+    await run_in_threadpool(progress_cache.record_task, task_id, 0, total_segments)
     logging.info("Created new task %s for file %s", task_id, file_name)
     return JSONResponse(content={"ok": 0, "err_no": 0, "failed": None, "data": task_id})
 
@@ -57,9 +80,19 @@ async def upload(
     segment_id: int = Form(...),
     segment_len: str = Form(...),
     content: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    offset: int = Form(None),
+    checksum: str = Form(None),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    task = db.query(Task).filter(Task.id == task_id).first()
+    """Upload one segment, in any order and concurrently with the others.
+
+    Without `offset` the request carries the whole segment. With `offset` the
+    bytes are appended to a resumable part file (see /api/uploadStatus) and
+    the segment completes once `segment_len` bytes have arrived. Retrying an
+    uploaded segment succeeds without storing it again; `checksum` (sha256)
+    is verified when given.
+    """
+    task = await db.get(Task, task_id)
     if not task:
         logging.error("Upload failed: Task %s does not exist", task_id)
         return JSONResponse(
@@ -67,13 +100,6 @@ async def upload(
             status_code=400,
         )
 
-    if task.status != 0:
-        logging.error("Upload failed: Invalid task state %s for task %s", task.status, task_id)
-        return JSONResponse(
-            content={"ok": -1, "err_no": 26000, "failed": "Invalid task state", "data": None},
-            status_code=400,
-        )
-
     # Validate segment_id range
     if segment_id < 1 or segment_id > task.total_segments:
         logging.error("Upload failed: Invalid segment_id %d for task %s (expected 1-%d)", 
@@ -83,126 +109,509 @@ async def upload(
             status_code=400,
         )
 
-    # Check if segment already exists
-    existing_segment = db.query(TaskSegment).filter(
+    # A retry of a segment that is already stored is a no-op
+    existing_segment = await db.scalar(select(TaskSegment).where(
         TaskSegment.task_id == task_id,
         TaskSegment.segment_id == segment_id
-    ).first()
-    
+    ))
     if existing_segment:
-        logging.error("Upload failed: Segment %d already exists for task %s", segment_id, task_id)
+        return segment_already_uploaded(existing_segment, checksum, task.total_segments)
+
+    if task.status != 0:
+        logging.error("Upload failed: Invalid task state %s for task %s", task.status, task_id)
         return JSONResponse(
-            content={"ok": -1, "err_no": 26002, "failed": f"Segment {segment_id} already uploaded", "data": None},
+            content={"ok": -1, "err_no": 26000, "failed": "Invalid task state", "data": None},
             status_code=400,
         )
 
-    # Validate sequential upload - MUST upload in order (1, 2, 3, ...)
-    uploaded_segments = db.query(TaskSegment).filter(TaskSegment.task_id == task_id).count()
-    expected_segment_id = uploaded_segments + 1
-    
-    logging.info("Upload validation for task %s: uploaded_segments=%d, expected=%d, received=%d", 
-                task_id, uploaded_segments, expected_segment_id, segment_id)
-    
-    if segment_id != expected_segment_id:
-        if segment_id < expected_segment_id:
-            error_msg = f"Segment {segment_id} already uploaded. Expected segment {expected_segment_id}."
+    # Save uploaded segment. Each attempt gets its own file; the database
+    # insert below decides whose file becomes the segment, so a retry that
+    # loses never touches the stored bytes and only removes its own file.
+    attempt_id = uuid.uuid4().hex
+    segment_file_path = f"uploads/{task_id}_segment_{segment_id}_{attempt_id}_{content.filename}"
+    try:
+        if offset is None:
+            written, digest = await save_upload(content, segment_file_path)
         else:
-            error_msg = f"Must upload segment {expected_segment_id} before segment {segment_id}. Upload segments in order (1→2→3...)."
-        
-        logging.error("Upload failed: %s (task %s)", error_msg, task_id)
+            if not segment_len.isdigit():
+                return JSONResponse(
+                    content={"ok": -1, "err_no": 26001, "failed": "segment_len must be the segment size in bytes when offset is given", "data": None},
+                    status_code=400,
+                )
+            part_path = segment_part_path(task_id, segment_id)
+            received = await append_upload(content, part_path, offset,
+                                           max_bytes=min(UPLOAD_MAX_BYTES, int(segment_len)))
+            if received < int(segment_len):
+                logging.info("Segment %d of task %s: %d/%s bytes received", segment_id, task_id, received, segment_len)
+                return {"ok": 0, "err_no": 0, "failed": None, "data": f"Segment {segment_id}: {received}/{segment_len} bytes received."}
+            written, digest = await finalize_upload(part_path, segment_file_path)
+    except UploadTooLarge as e:
+        logging.error("Upload failed: segment %d of task %s is too large", segment_id, task_id)
         return JSONResponse(
-            content={"ok": -1, "err_no": 26003, "failed": error_msg, "data": None},
+            content={"ok": -1, "err_no": 26005, "failed": str(e), "data": None},
+            status_code=413,
+        )
+    except UploadOffsetMismatch as e:
+        logging.warning("Upload of segment %d of task %s at offset %s, expected %d", segment_id, task_id, offset, e.received)
+        return JSONResponse(
+            content={"ok": -1, "err_no": 26008, "failed": str(e), "data": {"received": e.received}},
+            status_code=409,
+        )
+    except UploadInProgress:
+        return JSONResponse(
+            content={"ok": -1, "err_no": 26009, "failed": f"Segment {segment_id} is already being uploaded", "data": None},
+            status_code=409,
+        )
+    if segment_len.isdigit() and int(segment_len) != written:
+        logging.warning("Segment %d of task %s: segment_len=%s but received %d bytes",
+                        segment_id, task_id, segment_len, written)
+    if checksum and checksum.lower() != digest:
+        logging.error("Upload failed: checksum mismatch for segment %d of task %s", segment_id, task_id)
+        await run_in_threadpool(remove_file, segment_file_path)
+        return JSONResponse(
+            content={"ok": -1, "err_no": 26010, "failed": f"Checksum mismatch for segment {segment_id}", "data": None},
             status_code=400,
         )
 
-    # Save uploaded segment
-    segment_file_path = f"uploads/{task_id}_segment_{segment_id}_{content.filename}"
-    os.makedirs(os.path.dirname(segment_file_path), exist_ok=True)
-    with open(segment_file_path, "wb") as f:
-        file_content = await content.read()
-        f.write(file_content)
-
-    # Save segment info to database
+    # Save segment info to database; the unique (task_id, segment_id)
+    # constraint settles concurrent retries of the same segment
     task_segment = TaskSegment(
         task_id=task_id,
         segment_id=segment_id,
         segment_len=segment_len,
         file_path=segment_file_path,
+        checksum=digest,
         status=0
     )
     db.add(task_segment)
-
-    # Check if this is the last segment to trigger processing
-    uploaded_count = uploaded_segments + 1  # +1 because we're adding current segment
-    
     if segment_id == 1:
-        # First segment - set file_path but don't start processing yet
         task.file_path = segment_file_path
-        task.status = 1  # Upload in progress
-        logging.info("✅ First segment uploaded for task %s at %s", task_id, segment_file_path)
-    elif uploaded_count == task.total_segments:
-        # Last segment - start processing
-        task.status = 1  # Upload completed
-        db.commit()
-        logging.info("✅ All %d segments uploaded for task %s. Starting processing...", task.total_segments, task_id)
-        
-        # Start processing only when all segments are uploaded
-        process_audio.delay(task_id)
-        logging.info("🚀 Enqueued Celery task for processing audio, task_id=%s", task_id)
-        return {"ok": 0, "err_no": 0, "failed": None, "data": f"All segments uploaded. Processing started."}
-    else:
-        # Middle segments
-        logging.info("✅ Segment %d/%d uploaded for task %s at %s", segment_id, task.total_segments, task_id, segment_file_path)
-    
-    db.commit()
-    return {"ok": 0, "err_no": 0, "failed": None, "data": f"Segment {segment_id}/{task.total_segments} uploaded successfully."}
+    total_segments = task.total_segments
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        await run_in_threadpool(remove_file, segment_file_path)
+        existing_segment = await db.scalar(select(TaskSegment).where(
+            TaskSegment.task_id == task_id,
+            TaskSegment.segment_id == segment_id
+        ))
+        return segment_already_uploaded(existing_segment, checksum, total_segments)
+    await run_in_threadpool(progress_events.publish_segment_status, task_id, segment_id, 0)
+    logging.info("✅ Segment %d/%d uploaded for task %s at %s", segment_id, task.total_segments, task_id, segment_file_path)
 
-@router.post("/api/getProgress")
-async def get_progress(task_id: str = Form(...), db: Session = Depends(get_db)):
-    task = db.query(Task).filter(Task.id == task_id).first()
+    # Whichever request sees the last segment arrive flips the task to
+    # uploaded; the conditional UPDATE makes exactly one of them enqueue it
+    if not await claim_upload_completion(db, task_id):
+        return {"ok": 0, "err_no": 0, "failed": None, "data": f"Segment {segment_id}/{task.total_segments} uploaded successfully."}
+
+    await db.refresh(task)
+    await run_in_threadpool(progress_events.publish_task_status, task_id, 1)
+    logging.info("✅ All %d segments uploaded for task %s. Starting processing...", task.total_segments, task_id)
+
+    if await complete_from_cache(db, task):
+        return {"ok": 0, "err_no": 0, "failed": None, "data": "All segments uploaded. Result served from cache."}
+
+    # Start processing only when all segments are uploaded
+    await run_in_threadpool(process_audio.delay, task_id)
+    logging.info("🚀 Enqueued Celery task for processing audio, task_id=%s", task_id)
+    return {"ok": 0, "err_no": 0, "failed": None, "data": f"All segments uploaded. Processing started."}
+
+
+def remove_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def segment_part_path(task_id: str, segment_id: int) -> str:
+    return f"uploads/{task_id}_segment_{segment_id}.part"
+
+
+def segment_already_uploaded(segment: TaskSegment, checksum, total_segments: int):
+    if checksum and segment.checksum and checksum.lower() != segment.checksum:
+        logging.error("Upload failed: Segment %d of task %s already uploaded with different content",
+                      segment.segment_id, segment.task_id)
+        return JSONResponse(
+            content={"ok": -1, "err_no": 26002, "failed": f"Segment {segment.segment_id} already uploaded with different content", "data": None},
+            status_code=409,
+        )
+    logging.info("Segment %d of task %s already uploaded, ignoring retry", segment.segment_id, segment.task_id)
+    return {"ok": 0, "err_no": 0, "failed": None, "data": f"Segment {segment.segment_id}/{total_segments} already uploaded."}
+
+
+async def claim_upload_completion(db: AsyncSession, task_id: str) -> bool:
+    """Move the task from created to uploaded iff every segment is stored."""
+    uploaded = select(func.count()).select_from(TaskSegment).where(TaskSegment.task_id == task_id).scalar_subquery()
+    result = await db.execute(
+        update(Task)
+        .where(Task.id == task_id, Task.status == 0, Task.total_segments == uploaded)
+        .values(status=1)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+
+@router.post("/api/uploadStatus")
+async def upload_status(task_id: str = Form(...), db: AsyncSession = Depends(get_async_db)):
+    """Which segments are stored, and how many bytes of each partial one arrived.
+
+    `received` is the contiguous prefix [0, received) held by the server; a
+    resumable upload continues with offset=received.
+    """
+    task = await db.get(Task, task_id)
     if not task:
-        logging.error("Progress check failed: Task %s does not exist", task_id)
+        logging.error("Upload status failed: Task %s does not exist", task_id)
         return JSONResponse(
             content={"ok": -1, "err_no": 26000, "failed": "Task ID does not exist", "data": None},
             status_code=404,
         )
-    
-    # Get segment statuses
-    segments_data = {}
-    task_segments = db.query(TaskSegment).filter(TaskSegment.task_id == task_id).all()
-    
-    # Helper function to get status description
-    def get_status_desc(status):
-        status_map = {
-            0: "Task created successfully",
-            1: "Audio upload completed", 
-            2: "Audio recognition in progress",
-            9: "Recognition completed"
-        }
-        return status_map.get(status, "Unknown status")
-    
-    for segment in task_segments:
-        segments_data[str(segment.segment_id)] = {
-            "status": segment.status,
-            "desc": get_status_desc(segment.status)
-        }
-    
-    progress_data = {
+
+    stored = {
+        segment_id: file_path
+        for segment_id, file_path in await db.execute(
+            select(TaskSegment.segment_id, TaskSegment.file_path).where(TaskSegment.task_id == task_id)
+        )
+    }
+    segments = {}
+    for segment_id in range(1, task.total_segments + 1):
+        if segment_id in stored:
+            received = await run_in_threadpool(received_bytes, stored[segment_id])
+        else:
+            received = await run_in_threadpool(received_bytes, segment_part_path(task_id, segment_id))
+        segments[str(segment_id)] = {"complete": segment_id in stored, "received": received}
+
+    data = {
         "task_status": task.status,
-        "desc": get_status_desc(task.status),
-        "segments": segments_data
+        "total_segments": task.total_segments,
+        "missing": [segment_id for segment_id in range(1, task.total_segments + 1) if segment_id not in stored],
+        "segments": segments,
     }
-    
-    logging.info("Progress for task %s requested: status %s", task_id, task.status)
+    return JSONResponse(content={"ok": 0, "err_no": 0, "failed": None, "data": data})
+
+
+async def complete_from_cache(db: AsyncSession, task: Task) -> bool:
+    """Hash the uploaded audio and, on a cache hit, complete the task in place."""
+    segments = (await db.scalars(
+        select(TaskSegment).where(TaskSegment.task_id == task.id).order_by(TaskSegment.segment_id)
+    )).all()
+    if len(segments) == 1 and segments[0].checksum:
+        # The upload already hashed these exact bytes
+        task.audio_hash = segments[0].checksum
+    else:
+        # Segments may arrive in any order, so the whole recording is hashed once it is complete
+        try:
+            task.audio_hash = await run_in_threadpool(
+                result_cache.audio_hash, [segment.file_path for segment in segments])
+        except OSError:
+            logging.exception("Could not hash the audio of task %s; skipping the result cache", task.id)
+            return False
+    await db.commit()
+
+    cached = await db.run_sync(result_cache.lookup, result_cache.key_for_task(task))
+    if cached is None:
+        return False
+
+    task.result = cached.result
+    await db.run_sync(result_store.write_lines, task.id, cached.result)
+    task.status = 9
+    for segment in segments:
+        segment.status = 9
+    punctuate = plan_pipeline(task).punctuate
+    if punctuate and cached.punctuated_result is not None:
+        task.punctuated_result = cached.punctuated_result
+        await db.run_sync(result_store.write_punctuated, task.id, cached.punctuated_result)
+        task.punctuation_status = 9
+    else:
+        task.punctuation_status = 0 if punctuate else None
+    await db.commit()
+    for segment in segments:
+        await run_in_threadpool(progress_events.publish_segment_status, task.id, segment.segment_id, 9)
+    await run_in_threadpool(progress_events.publish_punctuation_status, task.id, task.punctuation_status)
+    await run_in_threadpool(progress_events.publish_task_status, task.id, 9)
+    logging.info("⚡ Task %s completed from result cache", task.id)
+
+    if task.punctuation_status == 0:
+        await run_in_threadpool(punctuate_result.delay, task.id)
+    return True
+
+
+PUNCTUATION_STATUS_DESC = {
+    0: "Punctuation queued",
+    2: "Punctuation in progress",
+    9: "Punctuation completed",
+    -1: "Punctuation failed",
+}
+
+
+def punctuation_progress(status):
+    if status is None:
+        return None
+    return {"status": status, "desc": PUNCTUATION_STATUS_DESC.get(status, "Unknown status")}
+
+
+STATUS_DESC = {
+    0: "Task created successfully",
+    1: "Audio upload completed",
+    2: "Audio recognition in progress",
+    9: "Recognition completed"
+}
+SSE_HEARTBEAT_SECONDS = 15
+# How often a progress stream re-reads the snapshot when events cannot reach this process
+SSE_POLL_SECONDS = 2
+
+
+def get_status_desc(status):
+    return STATUS_DESC.get(status, "Unknown status")
+
+
+async def load_snapshot(db: AsyncSession, task_id: str):
+    """Progress snapshot from the cache, falling back to (and refilling from) the database.
+
+    Returns None if the task does not exist.
+    """
+    snapshot = await progress_cache.get(task_id)
+    if snapshot is not None:
+        return snapshot
+
+    task = (await db.execute(
+        select(Task.status, Task.total_segments, Task.punctuation_status).where(Task.id == task_id)
+    )).first()
+    if task is None:
+        return None
+    segments = (await db.execute(
+        select(TaskSegment.segment_id, TaskSegment.status).where(TaskSegment.task_id == task_id)
+    )).all()
+    snapshot = {
+        "task_status": task.status,
+        "total_segments": task.total_segments,
+        "punctuation_status": task.punctuation_status,
+        "segments": {segment_id: status for segment_id, status in sorted(segments)},
+    }
+    await progress_cache.fill(task_id, snapshot)
+    return snapshot
+
+
+def build_progress(snapshot: dict) -> dict:
+    return {
+        "task_status": snapshot["task_status"],
+        "desc": get_status_desc(snapshot["task_status"]),
+        "segments": {
+            str(segment_id): {"status": status, "desc": get_status_desc(status)}
+            for segment_id, status in snapshot["segments"].items()
+        },
+        "punctuation": punctuation_progress(snapshot["punctuation_status"]),
+    }
+
+
+@router.post("/api/getProgress")
+async def get_progress(task_id: str = Form(...), db: AsyncSession = Depends(get_async_db)):
+    snapshot = await load_snapshot(db, task_id)
+    if snapshot is None:
+        logging.error("Progress check failed: Task %s does not exist", task_id)
+        return JSONResponse(
+            content={"ok": -1, "err_no": 26000, "failed": "Task ID does not exist", "data": None},
+            status_code=404,
+        )
+
+    progress_data = build_progress(snapshot)
+    logging.info("Progress for task %s requested: status %s", task_id, snapshot["task_status"])
     return JSONResponse(content={"ok": 0, "err_no": 0, "failed": None, "data": progress_data})
 
 
+def sse_message(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def progress_finished(task_status, punctuation_status) -> bool:
+    if task_status == -1:
+        return True
+    return task_status == 9 and punctuation_status not in (0, 2)
+
+
+def snapshot_events(task_id: str, before: dict, after: dict) -> list:
+    """Events for the status changes between two progress snapshots."""
+    events = [
+        {"task_id": task_id, "type": "segment", "segment_id": segment_id, "status": status}
+        for segment_id, status in after["segments"].items() if before["segments"].get(segment_id) != status
+    ]
+    if after["task_status"] != before["task_status"]:
+        events.append({"task_id": task_id, "type": "task", "status": after["task_status"]})
+    if after["punctuation_status"] != before["punctuation_status"]:
+        events.append({"task_id": task_id, "type": "punctuation", "status": after["punctuation_status"]})
+    return events
+
+
+@router.get("/api/progress/stream")
+async def progress_stream(task_id: str):
+    """Server-sent events for a task's progress.
+
+    Sends a `snapshot` event with the same data as /api/getProgress, then a
+    `task`, `segment` or `punctuation` event for every status change the
+    worker publishes, and closes once the task (and punctuation) finished.
+
+    Whenever no event arrives for a while, the snapshot is read again and
+    any change found is sent as events. This covers events lost by Redis,
+    and deployments without a pub/sub URL, where the worker's events never
+    reach the API process; those poll every SSE_POLL_SECONDS.
+
+    No session is injected: a dependency's session stays open until the
+    response ends, so every open stream would hold a pooled connection.
+    Each read uses a short-lived session instead.
+    """
+    async with AsyncSessionLocal() as db:
+        exists = await load_snapshot(db, task_id) is not None
+    if not exists:
+        logging.error("Progress stream failed: Task %s does not exist", task_id)
+        return JSONResponse(
+            content={"ok": -1, "err_no": 26000, "failed": "Task ID does not exist", "data": None},
+            status_code=404,
+        )
+    idle_timeout = SSE_HEARTBEAT_SECONDS if progress_events.PROGRESS_PUBSUB_URL else SSE_POLL_SECONDS
+
+    async def event_stream():
+        # Subscribe before reading the snapshot so no change is missed
+        async with progress_events.subscribe(task_id) as subscription:
+            async with AsyncSessionLocal() as snapshot_db:
+                state = await load_snapshot(snapshot_db, task_id)
+            yield sse_message("snapshot", build_progress(state))
+
+            idle = 0.0
+            while not progress_finished(state["task_status"], state["punctuation_status"]):
+                event = await subscription.get(timeout=idle_timeout)
+                if event is not None:
+                    events = [event]
+                else:
+                    async with AsyncSessionLocal() as snapshot_db:
+                        latest = await load_snapshot(snapshot_db, task_id)
+                    events = snapshot_events(task_id, state, latest) if latest is not None else []
+                    if not events:
+                        idle += idle_timeout
+                        if idle >= SSE_HEARTBEAT_SECONDS:
+                            idle = 0.0
+                            yield ": keep-alive\n\n"
+                        continue
+                idle = 0.0
+                for event in events:
+                    if event["type"] == "task":
+                        state["task_status"] = event["status"]
+                        event["desc"] = get_status_desc(event["status"])
+                    elif event["type"] == "segment":
+                        state["segments"][event["segment_id"]] = event["status"]
+                        event["desc"] = get_status_desc(event["status"])
+                    elif event["type"] == "punctuation":
+                        state["punctuation_status"] = event["status"]
+                        event["punctuation"] = punctuation_progress(event["status"])
+                    yield sse_message(event["type"], event)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def get_stream_model():
+    """Model used by /api/stream; loaded on first use, overridable in tests."""
+    return get_asr_model()
+
+
+@router.websocket("/api/stream")
+async def stream(websocket: WebSocket, language: str = "zh", sample_rate: int = SAMPLE_RATE,
+                 model=Depends(get_stream_model)):
+    """Real-time transcription over a WebSocket.
+
+    The client sends binary messages of 16 kHz mono 16-bit little-endian PCM
+    (whole samples per message) and a text message {"event": "end"} when done. The server sends `partial`
+    hypotheses while an utterance is in progress, a `final` one once a pause
+    ends it (times in ms from the start of the stream), and `end` after the
+    last final. Audio that arrives while a decode runs is batched into the
+    next one, so a slow decode delays hypotheses instead of queueing them.
+    """
+    await websocket.accept()
+    if sample_rate != SAMPLE_RATE:
+        await websocket.send_json({"type": "error", "err_no": 26011,
+                                   "failed": f"Only {SAMPLE_RATE} Hz PCM is supported"})
+        await websocket.close(code=1003)
+        return
+
+    transcriber = StreamingTranscriber(model, language=language)
+    messages = asyncio.Queue()
+    disconnected = False
+
+    async def receive():
+        nonlocal disconnected
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    disconnected = True
+                    break
+                if message.get("bytes") is not None:
+                    await messages.put(message["bytes"])
+                elif message.get("text"):
+                    try:
+                        event = json.loads(message["text"]).get("event")
+                    except (ValueError, AttributeError):
+                        event = None
+                    if event == "end":
+                        break
+                    logging.warning("Ignoring stream message: %s", message["text"][:100])
+        finally:
+            await messages.put(None)
+
+    receiver = asyncio.create_task(receive())
+    try:
+        finished = False
+        while not finished:
+            batch = [await messages.get()]
+            while not messages.empty():
+                batch.append(messages.get_nowait())
+            if batch[-1] is None:
+                finished = True
+                batch.pop()
+            for data in batch:
+                transcriber.push(pcm16_to_float(data))
+            if finished and disconnected:
+                break
+            events = await run_in_threadpool(transcriber.flush if finished else transcriber.step)
+            for event in events:
+                await websocket.send_json(event)
+        if not disconnected:
+            await websocket.send_json({"type": "end", "ed": str(int(transcriber.received * 1000 / SAMPLE_RATE))})
+            await websocket.close()
+    except WebSocketDisconnect:
+        logging.info("Stream client disconnected")
+    finally:
+        receiver.cancel()
 
 
 @router.post("/api/getResult")
-async def get_result(task_id: str = Form(...), db: Session = Depends(get_db)):
-    task = db.query(Task).filter(Task.id == task_id).first()
-    if not task:
+async def get_result(
+    task_id: str = Form(...),
+    punctuated: str = Form("false"),
+    cursor: int = Form(None),
+    limit: int = Form(None),
+    bg: int = Form(None),
+    ed: int = Form(None),
+    speaker: str = Form(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Transcript lines in order, optionally one page at a time.
+
+    `cursor` is the `next_cursor` of the previous page, `bg`/`ed` (ms) keep
+    lines overlapping that window and `speaker` is a comma-separated list.
+    Without any of them the whole transcript is returned, as before.
+    """
+    if (limit is not None and limit < 1) or (bg is not None and ed is not None and bg >= ed):
+        return JSONResponse(
+            content={"ok": -1, "err_no": 26007, "failed": "limit must be positive and bg before ed", "data": None},
+            status_code=400,
+        )
+
+    # Status checks come from the progress snapshot; the database is only
+    # read for the result itself
+    snapshot = await load_snapshot(db, task_id)
+    if snapshot is None:
         logging.error("Result request failed: Task %s does not exist", task_id)
         return JSONResponse(
             content={"ok": -1, "err_no": 26000, "failed": "Task ID does not exist", "data": None},
@@ -210,32 +619,52 @@ async def get_result(task_id: str = Form(...), db: Session = Depends(get_db)):
         )
     
     # Check if all segments have been uploaded
-    uploaded_segments = db.query(TaskSegment).filter(TaskSegment.task_id == task_id).count()
-    if uploaded_segments < task.total_segments:
+    uploaded_segments = len(snapshot["segments"])
+    total_segments = snapshot["total_segments"]
+    if uploaded_segments < total_segments:
         logging.warning("Result requested for incomplete upload task %s: %d/%d segments uploaded", 
-                       task_id, uploaded_segments, task.total_segments)
+                       task_id, uploaded_segments, total_segments)
         return JSONResponse(
-            content={"ok": -1, "err_no": 26004, "failed": f"Incomplete upload: {uploaded_segments}/{task.total_segments} segments uploaded. Upload all segments before requesting result.", "data": None},
+            content={"ok": -1, "err_no": 26004, "failed": f"Incomplete upload: {uploaded_segments}/{total_segments} segments uploaded. Upload all segments before requesting result.", "data": None},
             status_code=400,
         )
     
-    if task.status != 9:
-        logging.warning("Result requested for incomplete task %s: current status %s", task_id, task.status)
+    if snapshot["task_status"] != 9:
+        logging.warning("Result requested for incomplete task %s: current status %s", task_id, snapshot["task_status"])
         return JSONResponse(
             content={"ok": -1, "err_no": 26000, "failed": "Task not completed", "data": None},
             status_code=400,
         )
     
+    punctuated = punctuated.lower() == "true"
+    if punctuated and snapshot["punctuation_status"] != 9:
+        logging.warning("Punctuated result requested for task %s: punctuation status %s",
+                        task_id, snapshot["punctuation_status"])
+        return JSONResponse(
+            content={"ok": -1, "err_no": 26006, "failed": "Punctuation not completed", "data": None},
+            status_code=400,
+        )
+
+    speakers = [s.strip() for s in speaker.split(",") if s.strip()] if speaker else []
+    query = result_store.page_query(task_id, after=cursor, limit=limit + 1 if limit else None,
+                                    bg=bg, ed=ed, speakers=speakers)
+    lines = (await db.scalars(query)).all()
+    if not lines and not await db.scalar(select(ResultLine.id).where(ResultLine.task_id == task_id).limit(1)):
+        # Completed before results were stored per line
+        if await db.run_sync(result_store.backfill, task_id):
+            lines = (await db.scalars(query)).all()
+
+    next_cursor = None
+    if limit and len(lines) > limit:
+        lines = lines[:limit]
+        next_cursor = lines[-1].line_no
+
     # Convert result to JSON string as required by spec
-    result_data = task.result
-    if isinstance(result_data, list):
-        result_json_string = json.dumps(result_data, ensure_ascii=False)
-    else:
-        result_json_string = result_data
-    
-    logging.info("Result returned for task %s", task_id)
+    result_json_string = json.dumps([result_store.to_api_line(line, punctuated) for line in lines], ensure_ascii=False)
+
+    logging.info("Result returned for task %s: %d lines", task_id, len(lines))
     return JSONResponse(
-        content={"ok": 0, "err_no": 0, "failed": None, "data": result_json_string},
+        content={"ok": 0, "err_no": 0, "failed": None, "data": result_json_string, "next_cursor": next_cursor},
         status_code=200,
     )
 
@@ -0,0 +1,219 @@
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class SpeakerTurns:
+    """Diarization output as parallel arrays; speakers index into labels.
+
+    embeddings, when the diarizer returns them, holds one speaker embedding
+    per label (rows aligned with labels).
+    """
+    starts: np.ndarray
+    ends: np.ndarray
+    speakers: np.ndarray
+    labels: Tuple[str, ...]
+    embeddings: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_tuples(cls, turns: Iterable[Tuple[float, float, str]], labels: Optional[Sequence[str]] = None,
+                    embeddings: Optional[np.ndarray] = None) -> "SpeakerTurns":
+        turns = list(turns)
+        labels = tuple(labels) if labels is not None else tuple(sorted({speaker for _, _, speaker in turns}))
+        codes = {label: i for i, label in enumerate(labels)}
+        return cls(
+            starts=np.array([start for start, _, _ in turns], dtype=np.float64),
+            ends=np.array([end for _, end, _ in turns], dtype=np.float64),
+            speakers=np.array([codes[speaker] for _, _, speaker in turns], dtype=np.int32),
+            labels=labels,
+            embeddings=embeddings,
+        )
+
+    @classmethod
+    def from_annotation(cls, annotation, embeddings: Optional[np.ndarray] = None) -> "SpeakerTurns":
+        """From a pyannote Annotation, with embeddings ordered like annotation.labels()."""
+        return cls.from_tuples(
+            ((segment.start, segment.end, speaker)
+             for segment, _, speaker in annotation.itertracks(yield_label=True)),
+            labels=annotation.labels(),
+            embeddings=embeddings,
+        )
+
+    def durations(self) -> np.ndarray:
+        """Total turn length per label, in seconds."""
+        return np.bincount(self.speakers, weights=self.ends - self.starts, minlength=len(self.labels))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self) -> Iterator[Tuple[float, float, str]]:
+        for start, end, speaker in zip(self.starts, self.ends, self.speakers):
+            yield float(start), float(end), self.labels[speaker]
+
+
+def merge_intervals(starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Union of intervals as sorted, disjoint (starts, ends)."""
+    if len(starts) == 0:
+        return starts, ends
+    order = np.argsort(starts, kind="stable")
+    starts, ends = starts[order], ends[order]
+    reach = np.maximum.accumulate(ends)
+    # A new run begins where an interval starts after everything before it ended
+    new_run = np.concatenate(([True], starts[1:] > reach[:-1]))
+    run_ids = np.cumsum(new_run) - 1
+    merged_ends = np.zeros(run_ids[-1] + 1)
+    np.maximum.at(merged_ends, run_ids, reach)
+    return starts[new_run], merged_ends
+
+
+class SpeakerIndex:
+    """Per-speaker turn boundaries with cumulative speaking time.
+
+    Speaking time of speaker k up to time t is a monotone function C_k(t):
+    the sum over turns started by t of (t - start), minus the same over turns
+    ended by t, each read from a prefix sum after one searchsorted. The
+    overlap of any query [a, b] with speaker k is C_k(b) - C_k(a). A speaker's
+    own overlapping turns count once each, as the per-turn intersection sum in
+    whisperx.assign_word_speakers does. Assigning Q queries costs
+    O(K * Q log T) instead of its O(Q * T) scan.
+
+    The prefix sums carry float noise, so queries whose best speakers are
+    within EPSILON of each other, or that overlap a turn by less than
+    EPSILON, are settled by _reference_pick, which repeats the whisperx
+    computation for that query alone.
+    """
+
+    # Overlap differences below this (seconds) may be float noise from the prefix sums
+    EPSILON = 1e-6
+
+    def __init__(self, turns: SpeakerTurns):
+        self.labels = turns.labels
+        self._turns = turns
+        self._by_name = np.argsort(np.array(turns.labels, dtype=str), kind="stable") if turns.labels else None
+        self._bounds = []
+        self._intervals = []
+        for code in range(len(turns.labels)):
+            mask = turns.speakers == code
+            starts, ends = np.sort(turns.starts[mask]), np.sort(turns.ends[mask])
+            self._bounds.append((starts, np.concatenate(([0.0], np.cumsum(starts))),
+                                 ends, np.concatenate(([0.0], np.cumsum(ends)))))
+            # Merged intervals, for the distance to the nearest turn
+            self._intervals.append(merge_intervals(turns.starts[mask], turns.ends[mask]))
+        # Union of all turns with a length, to tell exactly whether a query overlaps any
+        spoken = turns.ends > turns.starts
+        self._union = merge_intervals(turns.starts[spoken], turns.ends[spoken])
+
+    @staticmethod
+    def _coverage(starts, start_sums, ends, end_sums, t):
+        started = np.searchsorted(starts, t, side="right")
+        ended = np.searchsorted(ends, t, side="right")
+        return (started * t - start_sums[started]) - (ended * t - end_sums[ended])
+
+    @staticmethod
+    def _gap(starts, ends, q_starts, q_ends):
+        """Distance from each query to the nearest interval (0 if overlapping)."""
+        before = np.searchsorted(starts, q_ends, side="right") - 1
+        prev_end = np.where(before >= 0, ends[np.maximum(before, 0)], -np.inf)
+        after = np.searchsorted(starts, q_starts, side="left")
+        next_start = np.where(after < len(starts), starts[np.minimum(after, len(starts) - 1)], np.inf)
+        return np.maximum(0.0, np.minimum(q_starts - prev_end, next_start - q_ends))
+
+    def _overlaps_any(self, q_starts, q_ends) -> np.ndarray:
+        """Whether each query has a positive intersection with some turn, without rounding."""
+        starts, ends = self._union
+        if len(starts) == 0:
+            return np.zeros(len(q_starts), dtype=bool)
+        last = np.searchsorted(starts, q_ends, side="left") - 1
+        return (q_ends > q_starts) & (last >= 0) & (ends[np.maximum(last, 0)] > q_starts)
+
+    def _reference_pick(self, q_start: float, q_end: float) -> int:
+        """The speaker whisperx picks for one query, ties and float rounding included.
+
+        whisperx sums the positive per-turn intersections with
+        groupby("speaker")["intersection"].sum(), which adds in turn order
+        with Kahan compensation and sorts speakers by name, then takes the
+        first of sort_values(ascending=False). That sort reverses the values,
+        argsorts them with numpy's (unstable) quicksort and reverses again,
+        so which tied speaker wins depends on that argsort; it is repeated here.
+        """
+        turns = self._turns
+        intersection = np.minimum(turns.ends, q_end) - np.maximum(turns.starts, q_start)
+        sums, compensation = {}, {}
+        for row in np.flatnonzero(intersection > 0):
+            code = int(turns.speakers[row])
+            total, c = sums.get(code, 0.0), compensation.get(code, 0.0)
+            y = float(intersection[row]) - c
+            t = total + y
+            compensation[code] = (t - total) - y
+            sums[code] = t
+        if not sums:
+            return -1
+        codes = [int(code) for code in self._by_name if int(code) in sums]
+        values = np.array([sums[code] for code in codes])
+        position = np.arange(len(values))[::-1][values[::-1].argsort(kind="quicksort")][::-1][0]
+        return codes[position]
+
+    def overlap(self, q_starts: np.ndarray, q_ends: np.ndarray) -> np.ndarray:
+        """(speakers, queries) matrix of overlap seconds."""
+        result = np.zeros((len(self.labels), len(q_starts)))
+        for code, bounds in enumerate(self._bounds):
+            if len(bounds[0]):
+                result[code] = self._coverage(*bounds, q_ends) - self._coverage(*bounds, q_starts)
+        return result
+
+    def assign(self, q_starts: np.ndarray, q_ends: np.ndarray, fill_nearest: bool = False) -> np.ndarray:
+        """Speaker code with the most overlap per query; -1 where nobody overlaps.
+
+        Matches whisperx.assign_word_speakers, including which speaker wins a
+        tie. With fill_nearest, queries without overlap get the nearest speaker.
+        """
+        q_starts = np.asarray(q_starts, dtype=np.float64)
+        q_ends = np.asarray(q_ends, dtype=np.float64)
+        if len(self.labels) == 0 or len(q_starts) == 0:
+            return np.full(len(q_starts), -1, dtype=np.int32)
+        overlap = self.overlap(q_starts, q_ends)
+        codes = np.argmax(overlap, axis=0).astype(np.int32)
+        best = overlap[codes, np.arange(len(codes))]
+        spoken = self._overlaps_any(q_starts, q_ends)
+        close = (overlap >= best - self.EPSILON).sum(axis=0) > 1
+        unclear = spoken & (close | (best <= self.EPSILON))
+        for query in np.flatnonzero(unclear):
+            codes[query] = self._reference_pick(q_starts[query], q_ends[query])
+        silent = ~spoken
+        if fill_nearest and silent.any():
+            gaps = np.stack([
+                self._gap(starts, ends, q_starts[silent], q_ends[silent]) if len(starts)
+                else np.full(silent.sum(), np.inf)
+                for starts, ends in self._intervals
+            ])
+            codes[silent] = np.argmin(gaps, axis=0)
+        else:
+            codes[silent] = -1
+        return codes
+
+
+def assign_word_speakers(turns: SpeakerTurns, transcript_result: dict, fill_nearest: bool = False) -> dict:
+    """Drop-in replacement for whisperx.assign_word_speakers.
+
+    Every segment and timed word is assigned in one vectorized pass. Items
+    without an overlapping turn keep no speaker, as in whisperx.
+    """
+    items = []
+    for segment in transcript_result["segments"]:
+        items.append(segment)
+        items.extend(word for word in segment.get("words", ()) if "start" in word)
+    if not items:
+        return transcript_result
+
+    index = SpeakerIndex(turns)
+    codes = index.assign(
+        np.fromiter((item["start"] for item in items), dtype=np.float64, count=len(items)),
+        np.fromiter((item["end"] for item in items), dtype=np.float64, count=len(items)),
+        fill_nearest=fill_nearest,
+    )
+    for item, code in zip(items, codes):
+        if code >= 0:
+            item["speaker"] = index.labels[code]
+    return transcript_result
@@ -0,0 +1,113 @@
+import logging
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import delete
+
+from database import Session
+from models import SpeakerEmbedding
+from speaker_assignment import SpeakerTurns
+
+load_dotenv()
+
+# Chunk speakers merge while the euclidean distance between their normalized
+# centroids is below this, the same criterion (and default) as the pyannote
+# clustering step in DiarizationPipeline
+SPEAKER_CLUSTER_THRESHOLD = float(os.getenv("SPEAKER_CLUSTER_THRESHOLD", "0.5954"))
+
+
+def speaker_name(index: int) -> str:
+    return f"SPEAKER_{index:02d}"
+
+
+def clear(db: Session, task_id: str):
+    db.execute(delete(SpeakerEmbedding).where(SpeakerEmbedding.task_id == task_id))
+
+
+def save(db: Session, task_id: str, chunk: int, turns: Optional[SpeakerTurns]) -> int:
+    """Store the speaker embeddings of one chunk's diarization; committed by the caller.
+
+    Speakers without a usable embedding (pyannote pads speakers it could not
+    embed with zeros) are skipped. Returns the number stored.
+    """
+    db.execute(delete(SpeakerEmbedding).where(SpeakerEmbedding.task_id == task_id,
+                                              SpeakerEmbedding.chunk == chunk))
+    if turns is None or turns.embeddings is None:
+        return 0
+    rows = []
+    for label, embedding, duration in zip(turns.labels, np.asarray(turns.embeddings), turns.durations()):
+        if not np.all(np.isfinite(embedding)) or not np.any(embedding):
+            continue
+        rows.append(SpeakerEmbedding(task_id=task_id, chunk=chunk, speaker=label, duration=float(duration),
+                                     embedding=np.asarray(embedding, dtype=np.float32).tobytes()))
+    db.add_all(rows)
+    return len(rows)
+
+
+def cluster(embeddings: np.ndarray, weights: np.ndarray, groups: np.ndarray,
+            threshold: float = SPEAKER_CLUSTER_THRESHOLD, num_clusters: Optional[int] = None) -> np.ndarray:
+    """Agglomerative centroid clustering of chunk speakers; returns a cluster id per row.
+
+    Rows sharing a group (the same chunk) were already told apart by the
+    diarizer and are never merged. Clusters are duration-weighted means of
+    normalized embeddings. Merging stops at `threshold`, or with num_clusters
+    given, exactly when that many clusters remain (if the constraints allow).
+    """
+    n = len(embeddings)
+    vectors = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    sums = vectors * weights[:, None]
+    centroids = vectors.copy()
+    similarity = centroids @ centroids.T
+    blocked = groups[:, None] == groups[None, :]
+    members = np.arange(n)
+    active = n
+
+    while active > 1:
+        if num_clusters is not None and active <= num_clusters:
+            break
+        candidates = np.where(blocked, -np.inf, similarity)
+        i, j = np.unravel_index(np.argmax(candidates), candidates.shape)
+        best = candidates[i, j]
+        if best == -np.inf:
+            break
+        distance = np.sqrt(max(0.0, 2.0 - 2.0 * best))
+        if num_clusters is None and distance >= threshold:
+            break
+
+        # Merge j into i
+        sums[i] += sums[j]
+        centroids[i] = sums[i] / np.linalg.norm(sums[i])
+        members[members == j] = i
+        blocked[i] |= blocked[j]
+        blocked[:, i] = blocked[i]
+        blocked[j, :] = blocked[:, j] = True
+        similarity[i] = similarity[:, i] = centroids @ centroids[i]
+        active -= 1
+    return members
+
+
+def global_speakers(db: Session, task_id: str, num_speakers: Optional[int] = None,
+                    threshold: float = SPEAKER_CLUSTER_THRESHOLD) -> Dict[Tuple[int, str], str]:
+    """Map each (chunk, chunk-local label) of a task to a task-wide speaker label.
+
+    Runs only on the stored embeddings, so no audio is decoded or embedded.
+    Global labels are numbered by first appearance.
+    """
+    rows = (db.query(SpeakerEmbedding).filter(SpeakerEmbedding.task_id == task_id)
+            .order_by(SpeakerEmbedding.chunk, SpeakerEmbedding.speaker).all())
+    if not rows:
+        return {}
+    embeddings = np.stack([np.frombuffer(row.embedding, dtype=np.float32) for row in rows]).astype(np.float64)
+    weights = np.array([max(row.duration, 1e-3) for row in rows])
+    groups = np.array([row.chunk for row in rows])
+    members = cluster(embeddings, weights, groups, threshold, num_speakers)
+
+    names = {}
+    mapping = {}
+    for row, member in zip(rows, members):
+        names.setdefault(member, speaker_name(len(names)))
+        mapping[(row.chunk, row.speaker)] = names[member]
+    logging.info("Clustered %d chunk speakers of task %s into %d speakers", len(rows), task_id, len(names))
+    return mapping
@@ -0,0 +1,189 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from chunking import FRAME_SECONDS, SAMPLE_RATE, frame_energy_db
+
+load_dotenv()
+
+# Frames louder than this (dBFS) count as speech
+STREAM_VAD_THRESHOLD_DB = float(os.getenv("STREAM_VAD_THRESHOLD_DB", "-40"))
+# Silence that ends an utterance and triggers its final hypothesis
+STREAM_ENDPOINT_SECONDS = float(os.getenv("STREAM_ENDPOINT_SECONDS", "0.6"))
+# New speech between two partial hypotheses of the same utterance
+STREAM_PARTIAL_INTERVAL_SECONDS = float(os.getenv("STREAM_PARTIAL_INTERVAL_SECONDS", "1.0"))
+# Utterances are cut here, which bounds the audio (and time) of any one decode
+STREAM_MAX_UTTERANCE_SECONDS = float(os.getenv("STREAM_MAX_UTTERANCE_SECONDS", "15"))
+# Audio kept before the first speech frame so word onsets are not clipped
+STREAM_PREROLL_SECONDS = 0.2
+
+# One model instance is shared by every stream in the process
+_model_lock = threading.Lock()
+
+
+def pcm16_to_float(data: bytes) -> np.ndarray:
+    """Little-endian signed 16-bit mono PCM to float32 in [-1, 1)."""
+    return np.frombuffer(data[:len(data) // 2 * 2], dtype="<i2").astype(np.float32) / 32768.0
+
+
+def ms(samples: int, sample_rate: int = SAMPLE_RATE) -> str:
+    return str(int(round(samples * 1000 / sample_rate)))
+
+
+class StreamingTranscriber:
+    """VAD-gated incremental decoding of one audio stream.
+
+    push() only runs the energy VAD, so it is cheap enough for the event loop.
+    step() and flush() decode and may block: finished utterances give `final`
+    events, and the utterance in progress gives a `partial` once enough new
+    speech arrived. Each decode sees at most STREAM_MAX_UTTERANCE_SECONDS of
+    audio, and audio pushed while a decode runs is coalesced into the next
+    step instead of queueing one decode per frame, so latency stays bounded
+    when decoding is slower than real time.
+
+    The model only needs ASRModel's
+    transcribe(audio, num_speakers, language=..., diarize=False) returning
+    segments with start, end and text.
+    """
+
+    def __init__(self, model, language: str = "zh", sample_rate: int = SAMPLE_RATE,
+                 threshold_db: float = STREAM_VAD_THRESHOLD_DB,
+                 endpoint_seconds: float = STREAM_ENDPOINT_SECONDS,
+                 partial_interval_seconds: float = STREAM_PARTIAL_INTERVAL_SECONDS,
+                 max_utterance_seconds: float = STREAM_MAX_UTTERANCE_SECONDS):
+        self.model = model
+        self.language = language
+        self.sample_rate = sample_rate
+        self.threshold_db = threshold_db
+        self.frame = int(FRAME_SECONDS * sample_rate)
+        self.endpoint = int(endpoint_seconds * sample_rate)
+        self.partial_interval = int(partial_interval_seconds * sample_rate)
+        self.max_utterance = int(max_utterance_seconds * sample_rate)
+
+        self.received = 0  # samples pushed so far, including the unframed remainder
+        self._remainder = np.zeros(0, dtype=np.float32)
+        self._preroll = deque(maxlen=max(1, int(STREAM_PREROLL_SECONDS / FRAME_SECONDS)))
+        self._utterance: List[np.ndarray] = []
+        self._utterance_start = 0
+        self._utterance_len = 0
+        self._silence_run = 0
+        self._last_partial_len = 0
+        self._ready = []  # (start sample, audio) of utterances awaiting their final decode
+        self._framed = 0  # samples consumed by the VAD
+        self.finals = 0
+
+    @property
+    def in_speech(self) -> bool:
+        return bool(self._utterance)
+
+    def push(self, samples: np.ndarray):
+        """Feed float32 samples at self.sample_rate."""
+        self.received += len(samples)
+        audio = np.concatenate((self._remainder, samples)) if len(self._remainder) else samples
+        n_frames = len(audio) // self.frame
+        self._remainder = audio[n_frames * self.frame:]
+        if not n_frames:
+            return
+        frames = audio[:n_frames * self.frame].reshape(n_frames, self.frame)
+        for frame, level in zip(frames, frame_energy_db(frames.ravel(), self.frame)):
+            self._push_frame(frame, level > self.threshold_db)
+
+    def _push_frame(self, frame: np.ndarray, speech: bool):
+        position = self._framed
+        self._framed += len(frame)
+        if not self._utterance:
+            if not speech:
+                self._preroll.append(frame)
+                return
+            self._utterance = list(self._preroll)
+            self._utterance_len = sum(len(f) for f in self._preroll)
+            self._utterance_start = position - self._utterance_len
+            self._preroll.clear()
+            self._silence_run = 0
+            self._last_partial_len = 0
+
+        self._utterance.append(frame)
+        self._utterance_len += len(frame)
+        self._silence_run = 0 if speech else self._silence_run + len(frame)
+        if self._silence_run >= self.endpoint:
+            # Keep a little of the trailing pause, like the pre-roll
+            keep = self._utterance_len - self._silence_run + self._preroll.maxlen * self.frame
+            self._end_utterance(min(keep, self._utterance_len))
+        elif self._utterance_len >= self.max_utterance:
+            self._end_utterance(self._utterance_len)
+
+    def _end_utterance(self, length: int):
+        audio = np.concatenate(self._utterance)[:length]
+        self._ready.append((self._utterance_start, audio))
+        self._utterance = []
+        self._utterance_len = 0
+        self._silence_run = 0
+
+    def _decode(self, audio: np.ndarray) -> List[dict]:
+        with _model_lock:
+            segments = self.model.transcribe(audio, None, language=self.language, diarize=False)
+        return [s for s in segments or [] if s.get("text", "").strip()]
+
+    def _event(self, kind: str, start: int, audio: np.ndarray) -> Optional[dict]:
+        started = time.perf_counter()
+        segments = self._decode(audio)
+        decode_ms = int((time.perf_counter() - started) * 1000)
+        lines = [
+            {
+                "bg": ms(start + int(float(s["start"]) * self.sample_rate), self.sample_rate),
+                "ed": ms(start + int(float(s["end"]) * self.sample_rate), self.sample_rate),
+                "onebest": s["text"].strip(),
+            }
+            for s in segments
+        ]
+        if kind == "partial" and not lines:
+            return None
+        separator = "" if self.language == "zh" else " "
+        return {
+            "type": kind,
+            "bg": ms(start, self.sample_rate),
+            "ed": ms(start + len(audio), self.sample_rate),
+            "onebest": separator.join(line["onebest"] for line in lines),
+            "lines": lines,
+            "decode_ms": decode_ms,
+        }
+
+    def step(self) -> List[dict]:
+        """Decode whatever is due: finals of ended utterances, or else one partial.
+
+        A partial is skipped in a step that decoded finals, so the next step
+        sees the audio that arrived meanwhile rather than falling behind.
+        """
+        events = []
+        while self._ready:
+            start, audio = self._ready.pop(0)
+            events.append(self._event("final", start, audio))
+            self.finals += 1
+        if events:
+            return events
+        if self.in_speech and self._utterance_len - self._last_partial_len >= self.partial_interval:
+            self._last_partial_len = self._utterance_len
+            event = self._event("partial", self._utterance_start, np.concatenate(self._utterance))
+            if event:
+                events.append(event)
+        return events
+
+    def flush(self) -> List[dict]:
+        """End of stream: finalize the utterance in progress."""
+        if len(self._remainder) and self.in_speech:
+            # Less than a frame left over; it belongs to the utterance in progress
+            self._utterance.append(self._remainder)
+            self._utterance_len += len(self._remainder)
+        self._remainder = np.zeros(0, dtype=np.float32)
+        if self.in_speech:
+            self._end_utterance(self._utterance_len)
+        events = self.step()
+        logging.info("Stream finished: %.1fs of audio, %d final hypotheses",
+                     self.received / self.sample_rate, self.finals)
+        return events
@@ -1,36 +1,180 @@
 import logging
 import os
-from asr import ASRModel
-import torch
+import numpy as np
+from asr import load_default_model
+import inference_server
+from audio_utils import decode_segments, load_waveform
+import chunking
+from celery import chord, group
 from database import SessionLocal
 from celery_app import celery
 from models import Task, TaskSegment
+from sqlalchemy import exists
+from pipeline import plan_pipeline, resolve_language
+import result_cache
+import result_store
+import speaker_embeddings
+import progress_events
+from tasks.punctuate import punctuate_result
 _model_instance=None
 def get_asr_model():
+    """This process's ASR model: a proxy to the shared inference server when
+    INFERENCE_SERVER_ADDRESS is set, otherwise a local copy."""
     global _model_instance
     if _model_instance is None:
-        model_dir = os.path.abspath(
-            os.path.join(os.path.dirname(__file__), '..', 'weights', 'whisper-large-v2-lora-zh-ct2')
-        )
-        weights = os.path.abspath(
-            os.path.join(os.path.dirname(__file__), '..', 'weights', 'epoch=19.ckpt')
-        )
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        print("Loading ASR model on device:", device)
-        _model_instance = ASRModel(model_path=model_dir, finetuned_ckpt_path= weights,device=device)
+        if inference_server.INFERENCE_SERVER_ADDRESS:
+            logging.info("Using inference server at %s", inference_server.INFERENCE_SERVER_ADDRESS)
+            _model_instance = inference_server.RemoteASRModel()
+        else:
+            _model_instance = load_default_model()
     return _model_instance
 # Optional: preload model on worker start
 from celery.signals import worker_process_init
 @worker_process_init.connect
 def init_worker(**kwargs):
+    if os.getenv("WORKER_ROLE", "all") not in ("asr", "all"):
+        return
     logging.info("Preloading ASR model in Celery worker...")
     get_asr_model()
     logging.info("Load finish...")
 
 
+def speaker_label(raw_speaker, has_separate):
+    """Map a diarization label like SPEAKER_01 to the API speaker value (1-based)."""
+    if not has_separate:
+        return "0"
+    try:
+        speaker_num = int(str(raw_speaker).split("_")[-1])
+    except (ValueError, TypeError):
+        return "1"
+    return str(speaker_num + 1) if speaker_num >= 0 else "1"
+
+
+def format_lines(transcription, has_separate, offset_seconds=0.0):
+    """Convert ASR segments (seconds) to result lines (milliseconds).
+
+    The offset is added before rounding, so chunk times stay sample-accurate.
+    """
+    lines = []
+    for line in transcription or []:
+        if "text" not in line:
+            continue
+        lines.append({
+            "bg": str(int(round((float(line["start"]) + offset_seconds) * 1000))),
+            "ed": str(int(round((float(line["end"]) + offset_seconds) * 1000))),
+            "onebest": line["text"].strip(),
+            "speaker": speaker_label(line.get("speaker"), has_separate),
+        })
+    return lines
+
+
+def validate_timestamps(all_segments):
+    """Log overlaps and inverted ranges in the merged result."""
+    prev_end = -1
+    timestamp_issues = []
+
+    for i, segment_result in enumerate(all_segments):
+        try:
+            current_bg = int(segment_result['bg'])
+            current_ed = int(segment_result['ed'])
+
+            # Check if current start >= previous end
+            if current_bg < prev_end:
+                issue = f"Overlap at index {i}: bg={current_bg} < prev_end={prev_end}"
+                timestamp_issues.append(issue)
+                logging.warning("⚠️ " + issue)
+
+            # Check if bg <= ed
+            if current_bg > current_ed:
+                issue = f"Invalid at index {i}: bg={current_bg} > ed={current_ed}"
+                timestamp_issues.append(issue)
+                logging.warning("⚠️ " + issue)
+
+            prev_end = current_ed
+
+        except (ValueError, TypeError) as e:
+            issue = f"Invalid format at index {i}: {e}"
+            timestamp_issues.append(issue)
+            logging.error("❌ " + issue)
+
+    if timestamp_issues:
+        logging.warning("⚠️ Found %d timestamp issues in merged result", len(timestamp_issues))
+    else:
+        logging.info("✅ Timestamp validation passed for %d segments", len(all_segments))
+    return timestamp_issues
+
+
+def fail_task(db, task, error_msg):
+    logging.error(error_msg)
+    task.error = error_msg
+    task.status = -1
+    db.commit()
+    progress_events.publish_task_status(task.id, -1)
+
+
+def complete_task(db, task, all_segments):
+    """Store the raw result and hand punctuation off to its own queue."""
+    if all_segments:
+        validate_timestamps(all_segments)
+
+    task.result = all_segments
+    result_store.write_lines(db, task.id, all_segments)
+    task.status = 9  # Completed
+    punctuate = plan_pipeline(task).punctuate
+    task.punctuation_status = 0 if punctuate else None
+
+    # Update all segments to completed status
+    task_segments = db.query(TaskSegment).filter(TaskSegment.task_id == task.id).all()
+    newly_completed = [segment.segment_id for segment in task_segments if segment.status != 9]
+    for segment in task_segments:
+        segment.status = 9  # Completed
+
+    db.commit()
+    for segment_id in newly_completed:
+        progress_events.publish_segment_status(task.id, segment_id, 9)
+    # Punctuation first, so stream consumers don't see a finished task without it
+    progress_events.publish_punctuation_status(task.id, task.punctuation_status)
+    progress_events.publish_task_status(task.id, 9)
+    logging.info("🎉 Task %s completed successfully with %d transcription segments", task.id, len(all_segments))
+
+    if task.audio_hash:
+        result_cache.store(db, result_cache.key_for_task(task), all_segments)
+
+    if punctuate:
+        punctuate_result.delay(task.id)
+
+
+def load_task_audio(source_paths):
+    """Decode a task's uploaded audio into one 16 kHz waveform."""
+    if len(source_paths) == 1:
+        return load_waveform(source_paths[0])
+    return decode_segments(source_paths)
+
+
+def save_chunks(task_id, audio, chunks):
+    """Write each chunk's samples for the chunk workers; returns their paths."""
+    os.makedirs("uploads/chunks", exist_ok=True)
+    paths = []
+    for index, (start, end) in enumerate(chunks):
+        path = f"uploads/chunks/{task_id}_{index}.npy"
+        np.save(path, audio[start:end])
+        paths.append(path)
+    return paths
+
+
 @celery.task(name="atasks.process_audio")
 def process_audio(task_id: str):
+    """Decode a task's audio, split it at pauses and fan the chunks out.
+
+    The uploaded segments are decoded once as a single stream, then cut at
+    VAD-detected silences into chunks sized for throughput (see chunking).
+    Each chunk is transcribed by its own sub-job so idle workers pick them up
+    in parallel; merge_chunks stitches the results back together. Chunk
+    offsets are sample positions in the decoded audio, so they do not depend
+    on how the client split its upload.
+    """
     db = SessionLocal()
+    task = None
     try:
         task = db.query(Task).filter(Task.id == task_id).first()
         if not task:
@@ -39,229 +183,201 @@ def process_audio(task_id: str):
 
         logging.info("Processing task %s", task_id)
         task.status = 2  # Processing
-        
-        # Update all segments to processing status
-        task_segments = db.query(TaskSegment).filter(TaskSegment.task_id == task_id).all()
+
+        # Get all segments for this task, ordered by segment_id
+        task_segments = db.query(TaskSegment).filter(TaskSegment.task_id == task_id).order_by(TaskSegment.segment_id).all()
         for segment in task_segments:
             segment.status = 2  # Processing
-        
+
         db.commit()
+        progress_events.publish_task_status(task_id, 2)
+        for segment in task_segments:
+            progress_events.publish_segment_status(task_id, segment.segment_id, 2)
 
-        # Use shared model instance
-        model = get_asr_model()
-        if task.language=="default":
-            language= "zh"
-        language= task.language
-        
-        # Get all segments for this task, ordered by segment_id
-        task_segments = db.query(TaskSegment).filter(TaskSegment.task_id == task_id).order_by(TaskSegment.segment_id).all()
-        
-        # Validate segment completeness and order
         if task_segments:
-            expected_segments = task.total_segments
-            actual_segments = len(task_segments)
-            
-            # Check if we have the right number of segments
-            if actual_segments != expected_segments:
-                error_msg = f"Segment count mismatch: expected {expected_segments}, got {actual_segments}"
-                logging.error(error_msg)
-                task.error = error_msg
-                task.status = -1
-                db.commit()
+            # Validate segment completeness and order
+            if len(task_segments) != task.total_segments:
+                fail_task(db, task, f"Segment count mismatch: expected {task.total_segments}, got {len(task_segments)}")
                 return
-            
-            # Check if segments are in correct order (1, 2, 3, ...)
+
             for i, segment in enumerate(task_segments):
-                expected_id = i + 1
-                if segment.segment_id != expected_id:
-                    error_msg = f"Segment order error: expected segment_id {expected_id}, got {segment.segment_id}"
-                    logging.error(error_msg)
-                    task.error = error_msg
-                    task.status = -1
-                    db.commit()
+                if segment.segment_id != i + 1:
+                    fail_task(db, task, f"Segment order error: expected segment_id {i + 1}, got {segment.segment_id}")
                     return
-            
-            logging.info("✅ Segment validation passed: %d segments in correct order", actual_segments)
-        
-        all_segments = []
-        total_duration_offset = 0
-        
-        if task_segments:
-            # Process multiple segments
-            logging.info("🚀 Processing %d segments for task %s", len(task_segments), task_id)
-            
-            for segment in task_segments:
-                logging.info("🎵 Transcribing segment %d: %s", segment.segment_id, segment.file_path)
-                segment_transcription = model.transcribe(
-                    segment.file_path,
-                    int(task.speaker_number),
-                    language="zh",
-                    timestamp=True,
-                    punctuation=True
-                )
-                
-                logging.info("📝 Segment %d returned %d lines", segment.segment_id, len(segment_transcription) if segment_transcription else 0)
-                
-                # Process this segment's results
-                has_separate = task.has_separate if hasattr(task, 'has_separate') else False
-                segment_result_count = 0
-                
-                for line in segment_transcription:
-                    if 'speaker' in line and 'text' in line:
-                        # Handle speaker numbering according to spec
-                        if not has_separate:
-                            speaker_val = "0"
-                        else:
-                            try:
-                                speaker_num = int(line["speaker"].split("_")[-1])
-                                if speaker_num < 1:
-                                    speaker_val = "1"
-                                else:
-                                    speaker_val = str(speaker_num)
-                            except (ValueError, TypeError):
-                                speaker_val = "1"
-                        
-                        # Adjust timestamps by adding offset from previous segments
-                        original_start = int(line['start'])
-                        original_end = int(line['end'])
-                        adjusted_start = original_start + total_duration_offset
-                        adjusted_end = original_end + total_duration_offset
-                        
-                        logging.debug("⏱️ Segment %d: Original [%d-%d] -> Adjusted [%d-%d] (offset: %d)", 
-                                    segment.segment_id, original_start, original_end, 
-                                    adjusted_start, adjusted_end, total_duration_offset)
-                        
-                        all_segments.append({
-                            "bg": str(adjusted_start),
-                            "ed": str(adjusted_end),
-                            "onebest": line['text'].strip(),
-                            "speaker": line["speaker"] 
-                        })
-                        segment_result_count += 1
-                
-                logging.info("✅ Segment %d processed: %d results added", segment.segment_id, segment_result_count)
-                # Update segment status to completed and commit to DB
-                segment.status = 9
-                db.commit()  # Commit sau mỗi segment để track progress
-                
-                # Calculate duration of this segment for timestamp adjustment  
-                segment_duration = 0
-                if segment_transcription:
-                    # Tìm timestamp lớn nhất trong segment này
-                    max_end_time = 0
-                    for line in segment_transcription:
-                        if 'end' in line:
-                            try:
-                                end_time = int(line['end'])
-                                if end_time > max_end_time:
-                                    max_end_time = end_time
-                            except (ValueError, TypeError):
-                                logging.warning("⚠️ Invalid end time in segment %d: %s", segment.segment_id, line.get('end'))
-                                pass
-                    
-                    segment_duration = max_end_time
-                    # Cập nhật offset cho segment tiếp theo
-                    total_duration_offset += segment_duration
-                    logging.info("📊 Segment %d processed. Duration: %d ms, Total offset: %d ms", 
-                               segment.segment_id, segment_duration, total_duration_offset)
-                else:
-                    logging.warning("⚠️ No transcription data for segment %d", segment.segment_id)
-                    # If no transcription, estimate duration from segment_len
-                    try:
-                        estimated_duration = int(float(segment.segment_len) * 1000)  # Convert to ms
-                        total_duration_offset += estimated_duration
-                        logging.info("📊 Segment %d: No transcription, using estimated duration %d ms", 
-                                   segment.segment_id, estimated_duration)
-                    except (ValueError, TypeError):
-                        logging.error("❌ Cannot estimate duration for segment %d", segment.segment_id)
-                    
-                logging.info("Completed processing segment %d", segment.segment_id)
+            logging.info("✅ Segment validation passed: %d segments in correct order", len(task_segments))
+            source_paths = [segment.file_path for segment in task_segments]
         else:
             # Fallback: process single file (backward compatibility)
             logging.info("No segments found, processing single file: %s", task.file_path)
-            transcription = model.transcribe(
-                task.file_path,
-                int(task.speaker_number),
-                language="zh",
-                timestamp=True,
-                punctuation=True
-            )
-            
-            # Format result for single file
-            has_separate = task.has_separate if hasattr(task, 'has_separate') else False
-            
-            for line in transcription:
-                if 'speaker' in line and 'text' in line:
-                    if not has_separate:
-                        speaker_val = "0"
-                    else:
-                        try:
-                            speaker_num = int(line['speaker'])
-                            if speaker_num < 1:
-                                speaker_val = "1"
-                            else:
-                                speaker_val = str(speaker_num)
-                        except (ValueError, TypeError):
-                            speaker_val = "1"
-                    
-                    all_segments.append({
-                        "bg": str(line['start']),
-                        "ed": str(line['end']),
-                        "onebest": line['text'].strip(),
-                        "speaker": speaker_val
-                    })
-
-        # Validate merged timestamps are in ascending order
-        if all_segments:
-            prev_end = -1
-            timestamp_issues = []
-            
-            for i, segment_result in enumerate(all_segments):
-                try:
-                    current_bg = int(segment_result['bg'])
-                    current_ed = int(segment_result['ed'])
-                    
-                    # Check if current start >= previous end
-                    if current_bg < prev_end:
-                        issue = f"Overlap at index {i}: bg={current_bg} < prev_end={prev_end}"
-                        timestamp_issues.append(issue)
-                        logging.warning("⚠️ " + issue)
-                    
-                    # Check if bg <= ed
-                    if current_bg > current_ed:
-                        issue = f"Invalid at index {i}: bg={current_bg} > ed={current_ed}"
-                        timestamp_issues.append(issue)
-                        logging.warning("⚠️ " + issue)
-                    
-                    prev_end = current_ed
-                    
-                except (ValueError, TypeError) as e:
-                    issue = f"Invalid format at index {i}: {e}"
-                    timestamp_issues.append(issue)
-                    logging.error("❌ " + issue)
-            
-            if timestamp_issues:
-                logging.warning("⚠️ Found %d timestamp issues in merged result", len(timestamp_issues))
-            else:
-                logging.info("✅ Timestamp validation passed for %d segments", len(all_segments))
-
-        task.result = all_segments
-        task.status = 9  # Completed
-        
-        # Update all segments to completed status
-        task_segments = db.query(TaskSegment).filter(TaskSegment.task_id == task_id).all()
-        for segment in task_segments:
-            segment.status = 9  # Completed
-        
+            source_paths = [task.file_path]
+
+        audio = load_task_audio(source_paths)
+        chunks = chunking.plan_chunks(audio)
+        speaker_embeddings.clear(db, task_id)
         db.commit()
-        logging.info("🎉 Task %s completed successfully with %d transcription segments", task_id, len(all_segments))
+        chunk_paths = save_chunks(task_id, audio, chunks)
+        del audio
+
+        # Each chunk learns which segments it holds audio of, and which chunk
+        # files those segments wait for, to report a segment once all are done
+        chunk_segments = [[] for _ in chunks]
+        if task_segments:
+            segment_sizes = [os.path.getsize(path) for path in source_paths]
+            for segment, indices in zip(task_segments, chunking.chunks_by_segment(segment_sizes, chunks)):
+                for index in indices:
+                    chunk_segments[index].append([segment.segment_id, [chunk_paths[i] for i in indices]])
+
+        logging.info("🚀 Dispatching %d chunks for task %s", len(chunks), task_id)
+        chord(
+            group(
+                transcribe_chunk.s(task_id, index, path, start, chunk_segments[index])
+                for index, (path, (start, _)) in enumerate(zip(chunk_paths, chunks))
+            )
+        )(merge_chunks.s(task_id))
 
     except Exception as e:
         logging.exception("❌ Error processing task %s", task_id)
         if task:
-            task.error = str(e)
-            task.status = -1  # Failed
+            fail_task(db, task, str(e))
+    finally:
+        db.close()
+
+
+@celery.task(name="atasks.transcribe_chunk")
+def transcribe_chunk(task_id: str, index: int, chunk_path: str, start_sample: int, segments=None):
+    """Transcribe one chunk of decoded audio.
+
+    Returns the chunk's lines with times already shifted by its start sample,
+    plus each line's chunk-local diarization label; the chunk's speaker
+    embeddings go to the embedding store so merge_chunks can match speakers
+    across chunks.
+
+    `segments` lists [segment_id, chunk paths] for the uploaded segments
+    this chunk holds audio of. A segment is marked completed by whichever
+    of its chunks finishes last, seen as all of its chunk files being gone.
+    So the chunk file is removed only once the chunk succeeded, or once its
+    failure is recorded on the task (complete_segments skips failed tasks).
+    """
+    db = SessionLocal()
+    task = None
+    try:
+        task = db.query(Task).filter(Task.id == task_id).first()
+        if not task:
+            logging.error("Task %s not found", task_id)
+            remove_chunk(chunk_path)
+            return None
+        audio = np.load(chunk_path)
+        offset_seconds = start_sample / chunking.SAMPLE_RATE
+
+        logging.info("🎵 Transcribing chunk %d of task %s at %.2fs (%.2fs)",
+                     index, task_id, offset_seconds, len(audio) / chunking.SAMPLE_RATE)
+        plan = plan_pipeline(task)
+        result = get_asr_model().transcribe(
+            audio,
+            plan.num_speakers,
+            language=resolve_language(task),
+            timestamp=True,
+            punctuation=True,
+            diarize=plan.diarize,
+            return_details=True,
+        )
+        transcription = result.segments
+        lines = format_lines(transcription, task.has_separate, offset_seconds)
+        speakers = [line.get("speaker") for line in transcription or [] if "text" in line]
+        if plan.diarize:
+            speaker_embeddings.save(db, task_id, index, result.speaker_turns)
             db.commit()
+        os.remove(chunk_path)
+        complete_segments(db, task_id, segments or [])
+        logging.info("✅ Chunk %d of task %s processed: %d results", index, task_id, len(lines))
+        return {"chunk": index, "lines": lines, "speakers": speakers}
+
+    except Exception as e:
+        logging.exception("❌ Error transcribing chunk %d of task %s", index, task_id)
+        if task:
+            fail_task(db, task, f"Chunk {index}: {e}")
+            remove_chunk(chunk_path)
+        raise
     finally:
         db.close()
 
+
+def remove_chunk(chunk_path):
+    try:
+        os.remove(chunk_path)
+    except FileNotFoundError:
+        pass
+
+
+def complete_segments(db, task_id, segments):
+    """Mark segments completed whose chunks have all been transcribed."""
+    task_failed = exists().where(Task.id == task_id, Task.status == -1)
+    for segment_id, chunk_paths in segments:
+        if any(os.path.exists(path) for path in chunk_paths):
+            continue
+        # Conditional, so two chunks finishing together report it only once,
+        # and a chunk whose sibling failed does not report it at all
+        updated = db.query(TaskSegment).filter(
+            TaskSegment.task_id == task_id,
+            TaskSegment.segment_id == segment_id,
+            TaskSegment.status != 9,
+            ~task_failed,
+        ).update({TaskSegment.status: 9}, synchronize_session=False)
+        db.commit()
+        if updated:
+            progress_events.publish_segment_status(task_id, segment_id, 9)
+
+
+def relabel_speakers(chunk_results, mapping, has_separate):
+    """Rewrite line speakers from chunk-local labels to the global ones in mapping.
+
+    Chunk speakers missing from mapping (no usable embedding) get a global
+    label of their own rather than sharing one by accident.
+    """
+    mapping = dict(mapping)
+    next_index = len(set(mapping.values()))
+    for result in chunk_results:
+        for line, raw_speaker in zip(result["lines"], result.get("speakers", ())):
+            if raw_speaker is None:
+                continue
+            key = (result["chunk"], raw_speaker)
+            if key not in mapping:
+                mapping[key] = speaker_embeddings.speaker_name(next_index)
+                next_index += 1
+            line["speaker"] = speaker_label(mapping[key], has_separate)
+
+
+@celery.task(name="atasks.merge_chunks")
+def merge_chunks(chunk_results, task_id: str):
+    """Chord callback: concatenate chunk lines in order.
+
+    Each chunk is diarized on its own, so with several chunks the speakers
+    are first matched up by clustering the stored chunk embeddings.
+    """
+    db = SessionLocal()
+    task = None
+    try:
+        task = db.query(Task).filter(Task.id == task_id).first()
+        if not task:
+            logging.error("Task %s not found", task_id)
+            return
+
+        chunk_results = sorted(chunk_results, key=lambda r: r["chunk"])
+        plan = plan_pipeline(task)
+        if plan.diarize and len(chunk_results) > 1:
+            mapping = speaker_embeddings.global_speakers(db, task_id, plan.num_speakers)
+            relabel_speakers(chunk_results, mapping, task.has_separate)
+
+        all_segments = []
+        for result in chunk_results:
+            all_segments.extend(result["lines"])
+        logging.info("📊 Merged %d chunks into %d lines for task %s", len(chunk_results), len(all_segments), task_id)
+
+        complete_task(db, task, all_segments)
+
+    except Exception as e:
+        logging.exception("❌ Error merging task %s", task_id)
+        if task:
+            fail_task(db, task, str(e))
+    finally:
+        db.close()
@@ -0,0 +1,63 @@
+import logging
+import os
+
+from celery.signals import worker_process_init
+
+from celery_app import celery
+from database import SessionLocal
+from models import Task
+from pipeline import resolve_language
+from postprocessing.punctuation import add_punctuation_batch, warm_up_punctuation
+import result_cache
+import result_store
+import progress_events
+
+
+@worker_process_init.connect
+def init_worker(**kwargs):
+    if os.getenv("WORKER_ROLE", "all") in ("postprocess", "all"):
+        warm_up_punctuation()
+
+
+@celery.task(name="atasks.punctuate_result")
+def punctuate_result(task_id: str):
+    """Punctuate a completed task's raw transcript.
+
+    Runs on the CPU post-processing queue after the raw result is already
+    served, and writes Task.punctuated_result when done.
+    """
+    db = SessionLocal()
+    task = None
+    try:
+        task = db.query(Task).filter(Task.id == task_id).first()
+        if not task or task.result is None:
+            logging.error("Punctuation skipped: task %s has no result", task_id)
+            return
+
+        task.punctuation_status = 2  # Processing
+        db.commit()
+        progress_events.publish_punctuation_status(task_id, 2)
+
+        lines = task.result
+        language = resolve_language(task)
+        texts = add_punctuation_batch([line["onebest"] for line in lines], language)
+        punctuated = [{**line, "onebest": text} for line, text in zip(lines, texts)]
+
+        task.punctuated_result = punctuated
+        result_store.write_punctuated(db, task_id, punctuated)
+        task.punctuation_status = 9  # Completed
+        db.commit()
+        progress_events.publish_punctuation_status(task_id, 9)
+        logging.info("✍️ Punctuated %d lines for task %s", len(punctuated), task_id)
+
+        if task.audio_hash:
+            result_cache.store_punctuated(db, result_cache.key_for_task(task), punctuated)
+
+    except Exception:
+        logging.exception("❌ Error punctuating task %s", task_id)
+        if task:
+            task.punctuation_status = -1  # Failed
+            db.commit()
+            progress_events.publish_punctuation_status(task_id, -1)
+    finally:
+        db.close()
@@ -0,0 +1,146 @@
+import fcntl
+import hashlib
+import os
+import uuid
+from typing import Tuple
+
+from dotenv import load_dotenv
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+load_dotenv()
+
+# Size of each read/write when copying an uploaded segment to disk
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+# Hard cap on the bytes accepted for a single upload request
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the per-request byte cap."""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Upload exceeds the limit of {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+class UploadOffsetMismatch(Exception):
+    """Raised when a resumed upload does not start where the stored bytes end."""
+
+    def __init__(self, received: int):
+        super().__init__(f"Upload must resume at offset {received}")
+        self.received = received
+
+
+class UploadInProgress(Exception):
+    """Raised when another request is already appending to the same part file."""
+
+
+async def save_upload(
+    content: UploadFile,
+    dest_path: str,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+    max_bytes: int = UPLOAD_MAX_BYTES,
+) -> Tuple[int, str]:
+    """Stream an upload to dest_path chunk by chunk.
+
+    Disk writes run in the threadpool so the event loop is never blocked, and
+    only one chunk is held in memory at a time. The file is written to a
+    unique ``.part`` path and renamed once complete, so concurrent retries of
+    the same segment cannot interleave their bytes.
+
+    Returns (bytes_written, sha256 hexdigest).
+    """
+    os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+    part_path = f"{dest_path}.{uuid.uuid4().hex}.part"
+    digest = hashlib.sha256()
+    written = 0
+
+    f = await run_in_threadpool(open, part_path, "wb")
+    try:
+        while True:
+            chunk = await content.read(chunk_size)
+            if not chunk:
+                break
+            written += len(chunk)
+            if written > max_bytes:
+                raise UploadTooLarge(max_bytes)
+            digest.update(chunk)
+            await run_in_threadpool(f.write, chunk)
+        await run_in_threadpool(f.close)
+        await run_in_threadpool(os.replace, part_path, dest_path)
+    except BaseException:
+        f.close()
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+
+    return written, digest.hexdigest()
+
+
+def received_bytes(part_path: str) -> int:
+    try:
+        return os.path.getsize(part_path)
+    except FileNotFoundError:
+        return 0
+
+
+async def append_upload(
+    content: UploadFile,
+    part_path: str,
+    offset: int,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+    max_bytes: int = UPLOAD_MAX_BYTES,
+) -> int:
+    """Append an upload to a resumable part file, starting at offset.
+
+    Bytes written before a dropped connection stay on disk, so the client can
+    resume from received_bytes(). The part file is locked while appending.
+
+    Returns the part file size afterwards.
+    """
+    os.makedirs(os.path.dirname(part_path) or ".", exist_ok=True)
+    f = await run_in_threadpool(open, part_path, "ab")
+    try:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadInProgress(f"{part_path} is being written by another request")
+        received = os.fstat(f.fileno()).st_size
+        if offset != received:
+            raise UploadOffsetMismatch(received)
+        while True:
+            chunk = await content.read(chunk_size)
+            if not chunk:
+                break
+            if received + len(chunk) > max_bytes:
+                raise UploadTooLarge(max_bytes)
+            await run_in_threadpool(f.write, chunk)
+            received += len(chunk)
+    finally:
+        await run_in_threadpool(f.close)
+    return received
+
+
+def _sha256_file(path: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def finalize_upload(part_path: str, dest_path: str) -> Tuple[int, str]:
+    """Move a completed part file to dest_path and hash it there.
+
+    The move comes first, so when two requests finish the same part file only
+    one gets it; the other raises UploadInProgress.
+
+    Returns (size, sha256 hexdigest).
+    """
+    try:
+        await run_in_threadpool(os.replace, part_path, dest_path)
+    except FileNotFoundError:
+        raise UploadInProgress(f"{part_path} was completed by another request")
+    checksum = await run_in_threadpool(_sha256_file, dest_path)
+    return received_bytes(dest_path), checksum
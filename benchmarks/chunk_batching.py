@@ -0,0 +1,117 @@
+"""
+Per-file vs. cross-task batching of ASR VAD chunks.
+
+Short files yield only a few 30 s VAD chunks, so batching per file leaves
+most of each decoder batch empty. This drives ChunkBatcher with a stub VAD
+(30 s chunks) and a stub decoder whose batch costs --fixed-ms plus --item-ms
+per chunk, and compares it with the old per-file pipeline.transcribe, both
+fed by --clients concurrent callers sharing one decoder.
+
+    python benchmarks/chunk_batching.py --tasks 128 --clients 8 --batch-size 16
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "app"))
+
+from asr_batcher import CHUNK_SECONDS, SAMPLE_RATE, ChunkBatcher  # noqa: E402
+
+
+class StubDecoder:
+    def __init__(self, fixed_ms, item_ms):
+        self.fixed = fixed_ms / 1000
+        self.item = item_ms / 1000
+        self.lock = threading.Lock()  # one GPU
+        self.batches = []
+
+    def __call__(self, chunks):
+        with self.lock:
+            time.sleep(self.fixed + self.item * len(chunks))
+            self.batches.append(len(chunks))
+        return [f"{len(chunk) / SAMPLE_RATE:.1f}s" for chunk in chunks]
+
+
+def stub_segments(audio):
+    seconds = len(audio) / SAMPLE_RATE
+    starts = np.arange(0, seconds, CHUNK_SECONDS)
+    return [{"start": float(s), "end": float(min(s + CHUNK_SECONDS, seconds))} for s in starts]
+
+
+class StubBatcher(ChunkBatcher):
+    def __init__(self, decoder, **kwargs):
+        super().__init__(pipeline=None, **kwargs)
+        self.decoder = decoder
+
+    def segment(self, audio):
+        return stub_segments(audio)
+
+    def decode(self, chunks, language):
+        return self.decoder(chunks)
+
+
+def per_file(decoder, batch_size):
+    """The old path: each transcribe() batches only its own chunks."""
+    def transcribe(audio):
+        chunks = [audio[int(c["start"] * SAMPLE_RATE):int(c["end"] * SAMPLE_RATE)] for c in stub_segments(audio)]
+        for i in range(0, len(chunks), batch_size):
+            decoder(chunks[i:i + batch_size])
+    return transcribe
+
+
+def run(name, transcribe, files, clients, decoder, batch_size):
+    latencies = []
+
+    def one(audio):
+        started = time.perf_counter()
+        transcribe(audio)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        list(pool.map(one, files))
+    elapsed = time.perf_counter() - started
+    audio_seconds = sum(len(f) for f in files) / SAMPLE_RATE
+    fill = np.mean(decoder.batches) / batch_size
+    print(f"{name:11s}: {audio_seconds / elapsed:7.0f} audio s/s  {len(decoder.batches):4d} batches  "
+          f"fill {fill:5.1%}  task latency p50 {np.percentile(latencies, 50):.2f}s "
+          f"p95 {np.percentile(latencies, 95):.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=128)
+    parser.add_argument("--min-seconds", type=float, default=10)
+    parser.add_argument("--max-seconds", type=float, default=90)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=50)
+    parser.add_argument("--fixed-ms", type=float, default=80, help="decoder cost per batch")
+    parser.add_argument("--item-ms", type=float, default=10, help="decoder cost per chunk in a batch")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    files = [np.zeros(int(rng.uniform(args.min_seconds, args.max_seconds) * SAMPLE_RATE), dtype=np.float32)
+             for _ in range(args.tasks)]
+    n_chunks = sum(len(stub_segments(f)) for f in files)
+    print(f"workload   : {args.tasks} files, {n_chunks} chunks, {args.clients} concurrent callers")
+
+    decoder = StubDecoder(args.fixed_ms, args.item_ms)
+    run("per-file", per_file(decoder, args.batch_size), files, args.clients, decoder, args.batch_size)
+
+    decoder = StubDecoder(args.fixed_ms, args.item_ms)
+    batcher = StubBatcher(decoder, batch_size=args.batch_size, max_wait_ms=args.max_wait_ms)
+    run("cross-task", lambda audio: batcher.transcribe(audio, "zh"), files, args.clients, decoder, args.batch_size)
+    stats = batcher.stats()
+    print(f"batcher    : {stats['tasks_per_batch']:.1f} tasks/batch, {stats['full_batches']} full batches, "
+          f"mean chunk wait {stats['mean_chunk_wait_ms']:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
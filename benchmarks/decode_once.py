@@ -0,0 +1,75 @@
+"""
+Decode cost per file: separate decodes for ASR and diarization vs. one shared waveform.
+
+"twice" mirrors the old flow (whisperx.load_audio for ASR, then pyannote
+decoding and resampling the path again); "once" decodes with
+whisperx.load_audio and hands pyannote the in-memory waveform. Each mode runs
+in its own process and reports CPU time (including the ffmpeg child) and
+peak RSS.
+
+    python benchmarks/decode_once.py audio.wav
+"""
+import argparse
+import json
+import multiprocessing as mp
+import resource
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "app"))
+
+
+def _cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def _peak_rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def _run(mode, path, queue):
+    from pyannote.audio import Audio
+
+    from audio_utils import load_waveform, to_pyannote_input
+
+    pyannote_audio = Audio(sample_rate=16000, mono="downmix")
+    cpu0, wall0 = _cpu_seconds(), time.perf_counter()
+
+    audio = load_waveform(path)
+    if mode == "twice":
+        waveform, _ = pyannote_audio(path)
+    else:
+        waveform, _ = pyannote_audio(to_pyannote_input(audio))
+
+    queue.put({
+        "mode": mode,
+        "samples": int(waveform.shape[-1]),
+        "wall_s": round(time.perf_counter() - wall0, 3),
+        "cpu_s": round(_cpu_seconds() - cpu0, 3),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audio", nargs="?", default="audio.wav")
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+    for mode in ("twice", "once"):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run, args=(mode, args.audio, queue))
+        proc.start()
+        print(json.dumps(queue.get()))
+        proc.join()
+
+
+if __name__ == "__main__":
+    main()
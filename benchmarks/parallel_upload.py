@@ -0,0 +1,150 @@
+"""
+Upload throughput of upload_client.UploadClient against the previous
+frontend.upload_file_segments loop.
+
+Runs a local stand-in for /api/upload and /api/uploadStatus that keeps
+segments in memory and simulates a WAN link: every request waits --rtt-ms,
+each connection is capped at --link-mbps, and --fail-rate of requests fail
+with HTTP 503. The legacy path reads the whole file and posts segments one by
+one without retries. Peak memory is measured with tracemalloc and includes
+the in-process stand-in, which holds the uploaded bytes.
+
+    python benchmarks/parallel_upload.py --size-mb 64 --segments 8 --concurrency 4
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+import requests
+import uvicorn
+from fastapi import FastAPI, File, Form, UploadFile
+from fastapi.responses import JSONResponse
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from upload_client import UploadClient, UploadError  # noqa: E402
+
+
+def stand_in_app(rtt: float, link_bytes_per_s: float, fail_rate: float, total_segments: int):
+    app = FastAPI()
+    parts = {}  # segment_id -> bytearray
+    complete = set()
+
+    async def link_delay(size):
+        await asyncio.sleep(rtt + size / link_bytes_per_s)
+
+    @app.post("/api/upload")
+    async def upload(segment_id: int = Form(...), segment_len: str = Form(...), offset: int = Form(None),
+                     content: UploadFile = File(...), task_id: str = Form(...), checksum: str = Form(None)):
+        body = await content.read()
+        await link_delay(len(body))
+        if random.random() < fail_rate:
+            return JSONResponse({"ok": -1, "err_no": 0, "failed": "injected failure", "data": None}, status_code=503)
+        if segment_id in complete:
+            return {"ok": 0, "err_no": 0, "failed": None, "data": "already uploaded"}
+        if offset is None:
+            parts[segment_id] = bytearray(body)
+            complete.add(segment_id)
+        else:
+            part = parts.setdefault(segment_id, bytearray())
+            if offset != len(part):
+                return JSONResponse({"ok": -1, "err_no": 26008, "failed": "offset", "data": {"received": len(part)}},
+                                    status_code=409)
+            part.extend(body)
+            if len(part) >= int(segment_len):
+                complete.add(segment_id)
+        return {"ok": 0, "err_no": 0, "failed": None, "data": "ok"}
+
+    @app.post("/api/uploadStatus")
+    async def upload_status(task_id: str = Form(...)):
+        await link_delay(0)
+        segments = {str(i): {"complete": i in complete, "received": len(parts.get(i, b""))}
+                    for i in range(1, total_segments + 1)}
+        return {"ok": 0, "err_no": 0, "failed": None, "data": {"segments": segments}}
+
+    def reset():
+        parts.clear()
+        complete.clear()
+
+    app.state.reset = reset
+    return app
+
+
+def legacy_upload(base_url, task_id, path, total_segments):
+    """The previous frontend loop: whole file in memory, sequential, no retries."""
+    with open(path, "rb") as f:
+        file_content = f.read()
+    segment_size = len(file_content) // total_segments
+    for segment_id in range(1, total_segments + 1):
+        start = (segment_id - 1) * segment_size
+        end = len(file_content) if segment_id == total_segments else start + segment_size
+        response = requests.post(f"{base_url}/api/upload",
+                                 data={"task_id": task_id, "segment_id": segment_id, "segment_len": str(end - start)},
+                                 files={"content": (f"a_segment_{segment_id}", file_content[start:end])})
+        if response.status_code != 200:
+            raise UploadError(f"segment {segment_id}: HTTP {response.status_code}")
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    error = None
+    try:
+        fn()
+    except UploadError as e:
+        error = e
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, error
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=64)
+    parser.add_argument("--segments", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--chunk-mb", type=float, default=8)
+    parser.add_argument("--rtt-ms", type=float, default=40)
+    parser.add_argument("--link-mbps", type=float, default=200, help="per-connection bandwidth cap")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    size = int(args.size_mb * 1024 * 1024)
+    app = stand_in_app(args.rtt_ms / 1000, args.link_mbps * 1e6 / 8, args.fail_rate, args.segments)
+    server = uvicorn.Server(uvicorn.Config(app, port=args.port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
+        f.write(os.urandom(size))
+    try:
+        elapsed, peak, error = measure(lambda: legacy_upload(base_url, "bench", f.name, args.segments))
+        status = f"failed: {error}" if error else f"{size / 2**20 / elapsed:7.1f} MiB/s"
+        print(f"legacy sequential : {elapsed:6.2f}s {status}, peak {peak / 2**20:7.1f} MiB")
+
+        app.state.reset()
+        client = UploadClient(base_url, concurrency=args.concurrency, chunk_size=int(args.chunk_mb * 2**20),
+                              backoff=0.05)
+        result = {}
+        elapsed, peak, error = measure(lambda: result.update(stats=client.upload_file("bench", f.name, args.segments)))
+        status = f"failed: {error}" if error else str(result["stats"])
+        print(f"UploadClient x{args.concurrency:<3d}: {elapsed:6.2f}s {status}, peak {peak / 2**20:7.1f} MiB")
+        client.close()
+    finally:
+        os.remove(f.name)
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
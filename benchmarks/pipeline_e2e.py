@@ -0,0 +1,318 @@
+"""
+End-to-end pipeline benchmark: ASRModel.transcribe and the process_audio task.
+
+Runs every input through two scenarios, each in a fresh process so peak RSS
+is its own:
+
+  transcribe     ASRModel.transcribe on the file (decode, ASR, diarization,
+                 speaker assignment)
+  process_audio  the Celery task chain run eagerly against a temporary
+                 SQLite database (decode, chunking, per-chunk transcription,
+                 merge, result storage)
+
+With --models stub (the default) the Whisper decoder, VAD and diarization
+are replaced by stubs that sleep --asr-rtf / --diarization-rtf seconds per
+audio second and return synthetic text and speaker turns, so the suite runs
+offline on CPU and measures everything around the models. --models real
+loads the weights through load_default_model.
+
+Reports real-time factor, per-stage seconds (db is SQL statement time and
+overlaps the other stages) and peak RSS, and writes them as JSON. Pass an
+earlier file as --baseline to print the change in RTF.
+
+    python benchmarks/pipeline_e2e.py --long-minutes 10,60
+    python benchmarks/pipeline_e2e.py --models real --inputs audio.wav --baseline benchmarks/results/e2e-old.json
+"""
+import argparse
+import json
+import logging
+import multiprocessing as mp
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+
+REPO = Path(__file__).resolve().parent.parent
+SAMPLE_RATE = 16000
+SCENARIOS = ("transcribe", "process_audio")
+
+
+def peak_rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def write_synthetic(path, minutes, seed=0):
+    """Speech-like bursts separated by pauses, as 16 kHz 16-bit mono WAV."""
+    rng = np.random.default_rng(seed)
+    total = int(minutes * 60 * SAMPLE_RATE)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        written = 0
+        while written < total:
+            speech = int(rng.uniform(2, 12) * SAMPLE_RATE)
+            pause = int(rng.uniform(0.2, 1.5) * SAMPLE_RATE)
+            block = np.concatenate((rng.normal(0, 0.1, speech), rng.normal(0, 0.001, pause)))[:total - written]
+            f.writeframes((np.clip(block, -1, 1) * 32767).astype("<i2").tobytes())
+            written += len(block)
+
+
+def stub_model(asr_rtf, diarization_rtf, batch_size=16):
+    """ASRModel with stub Whisper/VAD/diarization but the real transcribe() flow."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    from asr import ASRModel
+    from asr_batcher import ChunkBatcher
+    from speaker_assignment import SpeakerTurns
+
+    class StubBatcher(ChunkBatcher):
+        def segment(self, audio):
+            seconds = len(audio) / SAMPLE_RATE
+            return [{"start": float(s), "end": float(min(s + 30, seconds))} for s in np.arange(0, seconds, 30)]
+
+        def decode(self, chunks, language):
+            time.sleep(asr_rtf * sum(len(c) for c in chunks) / SAMPLE_RATE)
+            return [f"stub {len(c) / SAMPLE_RATE:.1f}s" for c in chunks]
+
+    class StubDiarizer:
+        voices = np.random.default_rng(0).normal(size=(8, 192))
+
+        def run(self, audio, num_speakers=None, return_embeddings=False):
+            seconds = audio["waveform"].shape[-1] / audio["sample_rate"]
+            time.sleep(diarization_rtf * seconds)
+            speakers = num_speakers or 2
+            starts = np.arange(0, seconds, 8.0)
+            turns = [(s, min(s + 7.5, seconds), f"SPEAKER_{i % speakers:02d}") for i, s in enumerate(starts)]
+            labels = [f"SPEAKER_{i:02d}" for i in range(min(speakers, len(turns)))]
+            embeddings = self.voices[:len(labels)] if return_embeddings else None
+            return SpeakerTurns.from_tuples(turns, labels=labels, embeddings=embeddings)
+
+    class StubASRModel(ASRModel):
+        def __init__(self):  # no weights to load
+            self.model = None
+            self.batch_size = batch_size
+            self.batcher = StubBatcher(None, batch_size=batch_size)
+            self.diarizer = StubDiarizer()
+            self.concurrent_stages = True
+            self._stage_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="diarization")
+
+    return StubASRModel()
+
+
+class StageTimer:
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def wrap(self, owner, name, stage):
+        fn = getattr(owner, name)
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - started)
+        setattr(owner, name, timed)
+
+    def wrap_model(self, model):
+        transcribe = model.transcribe
+
+        def timed(*args, return_duration=False, return_details=False, **kwargs):
+            result = transcribe(*args, return_details=True, **kwargs)
+            for stage in ("decode", "asr", "diarization", "assign"):
+                self.add(stage, result.timings.get(stage, 0.0))
+            if return_details:
+                return result
+            if return_duration:
+                return result.segments, result.duration
+            return result.segments
+        model.transcribe = timed
+
+
+def run_scenario(config, queue):
+    workdir = tempfile.mkdtemp(prefix="e2e-")
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{workdir}/bench.db",
+        "BROKER_URL": "memory://",
+        "BACKEND_URL": "cache+memory://",
+        "PUNCTUATION_ENABLED": "true" if config["punctuation"] else "false",
+    })
+    os.environ.pop("INFERENCE_SERVER_ADDRESS", None)
+    os.environ.pop("PROGRESS_CACHE_URL", None)
+    os.environ.pop("PROGRESS_PUBSUB_URL", None)
+    os.chdir(workdir)
+    if not config["verbose"]:
+        logging.disable(logging.INFO)
+    sys.path.append(str(REPO / "app"))
+
+    timer = StageTimer()
+    started = time.perf_counter()
+    if config["models"] == "stub":
+        model = stub_model(config["asr_rtf"], config["diarization_rtf"])
+    else:
+        from asr import load_default_model
+        model = load_default_model()
+    load_seconds = time.perf_counter() - started
+    timer.wrap_model(model)
+
+    result = {"input": config["name"], "scenario": config["scenario"]}
+    if config["scenario"] == "transcribe":
+        started = time.perf_counter()
+        segments, duration = model.transcribe(config["path"], config["speakers"], return_duration=True)
+        wall = time.perf_counter() - started
+        result["lines"] = len(segments)
+    else:
+        import uuid
+
+        from celery.signals import task_postrun, task_prerun
+        from sqlalchemy import event
+
+        import chunking
+        import tasks.process_audio as pa
+        from celery_app import celery
+        from database import Base, SessionLocal, engine
+        from models import ResultLine, Task, TaskSegment
+
+        Base.metadata.create_all(bind=engine)
+        celery.conf.task_always_eager = True
+        pa._model_instance = model
+        timer.wrap(pa, "load_task_audio", "decode")
+        timer.wrap(chunking, "plan_chunks", "chunking")
+        timer.wrap(pa, "save_chunks", "save_chunks")
+
+        task_started = {}
+        task_prerun.connect(lambda task_id=None, task=None, **kw: task_started.__setitem__(task_id, time.perf_counter()),
+                            weak=False)
+        task_postrun.connect(lambda task_id=None, task=None, **kw: task.name == "atasks.merge_chunks" and timer.add(
+            "merge", time.perf_counter() - task_started.pop(task_id, time.perf_counter())), weak=False)
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after(conn, cursor, statement, parameters, context, executemany):
+            timer.add("db", time.perf_counter() - conn.info["query_start"].pop())
+
+        task_id = uuid.uuid4().hex
+        db = SessionLocal()
+        db.add(Task(id=task_id, status=1, total_segments=1, speaker_number=str(config["speakers"]),
+                    has_separate=True, language="zh", file_name=config["name"]))
+        db.add(TaskSegment(task_id=task_id, segment_id=1, file_path=config["path"], status=0))
+        db.commit()
+
+        started = time.perf_counter()
+        pa.process_audio(task_id)
+        wall = time.perf_counter() - started
+        db.expire_all()
+        task = db.get(Task, task_id)
+        if task.status != 9:
+            raise RuntimeError(f"process_audio ended with status {task.status}: {task.error}")
+        result["lines"] = db.query(ResultLine).filter(ResultLine.task_id == task_id).count()
+        db.close()
+
+    with wave.open(config["path"]) as f:
+        audio_seconds = f.getnframes() / f.getframerate()
+    result.update({
+        "audio_seconds": round(audio_seconds, 2),
+        "wall": round(wall, 3),
+        "rtf": round(wall / audio_seconds, 4),
+        "model_load": round(load_seconds, 3),
+        "stages": {stage: round(seconds, 3) for stage, seconds in sorted(timer.stages.items())},
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    })
+    queue.put(result)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", choices=["stub", "real"], default="stub")
+    parser.add_argument("--inputs", default=str(REPO / "audio.wav"), help="comma-separated audio files")
+    parser.add_argument("--long-minutes", default="10,60", help="synthetic inputs to add, in minutes")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--speakers", type=int, default=2)
+    parser.add_argument("--asr-rtf", type=float, default=0.02, help="stub decoder seconds per audio second")
+    parser.add_argument("--diarization-rtf", type=float, default=0.01, help="stub diarization seconds per audio second")
+    parser.add_argument("--punctuation", action="store_true", help="also run punctuation (needs its models)")
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline's INFO logs")
+    parser.add_argument("--output", default=None, help="JSON file (default: benchmarks/results/e2e-<time>.json)")
+    parser.add_argument("--baseline", default=None, help="earlier JSON output to compare RTF against")
+    args = parser.parse_args()
+
+    inputs = [(Path(p).name, str(Path(p).resolve())) for p in args.inputs.split(",") if p]
+    synthetic_dir = tempfile.mkdtemp(prefix="e2e-audio-")
+    for minutes in [float(m) for m in args.long_minutes.split(",") if m]:
+        path = os.path.join(synthetic_dir, f"synthetic_{minutes:g}min.wav")
+        write_synthetic(path, minutes)
+        inputs.append((os.path.basename(path), path))
+
+    ctx = mp.get_context("spawn")
+    results = []
+    for name, path in inputs:
+        for scenario in args.scenarios.split(","):
+            config = {"name": name, "path": path, "scenario": scenario, "models": args.models,
+                      "speakers": args.speakers, "asr_rtf": args.asr_rtf,
+                      "diarization_rtf": args.diarization_rtf, "punctuation": args.punctuation,
+                      "verbose": args.verbose}
+            queue = ctx.Queue()
+            process = ctx.Process(target=run_scenario, args=(config, queue))
+            process.start()
+            process.join()
+            if process.exitcode != 0:
+                print(f"{name:28s} {scenario:14s} failed (exit code {process.exitcode})")
+                continue
+            result = queue.get()
+            results.append(result)
+            stages = "  ".join(f"{k} {v:.2f}" for k, v in result["stages"].items())
+            print(f"{name:28s} {scenario:14s} {result['audio_seconds']:8.1f}s audio  RTF {result['rtf']:.4f}  "
+                  f"peak RSS {result['peak_rss_mb']:.0f} MB  [{stages}]", flush=True)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": git_commit(),
+        "host": platform.node(),
+        "cpu_count": os.cpu_count(),
+        "models": args.models,
+        "stub": {"asr_rtf": args.asr_rtf, "diarization_rtf": args.diarization_rtf} if args.models == "stub" else None,
+        "results": results,
+    }
+    output = args.output or str(REPO / "benchmarks" / "results" / f"e2e-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {(r["input"], r["scenario"]): r for r in json.load(f)["results"]}
+        for result in results:
+            before = baseline.get((result["input"], result["scenario"]))
+            if before:
+                change = result["rtf"] / before["rtf"] - 1 if before["rtf"] else float("nan")
+                print(f"{result['input']:28s} {result['scenario']:14s} RTF {before['rtf']:.4f} -> "
+                      f"{result['rtf']:.4f} ({change:+.1%})")
+
+
+if __name__ == "__main__":
+    main()
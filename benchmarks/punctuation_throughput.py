@@ -0,0 +1,83 @@
+"""
+Chinese punctuation throughput in characters per second.
+
+Compares the previous per-line path (zhpr DocumentDataset + DataLoader with
+batch_size=5, autograd enabled) against ChinesePunctuation.restore_batch on
+synthetic transcript lines. Downloads the zh-wiki-punctuation-restore model
+on first run.
+
+    python benchmarks/punctuation_throughput.py --lines 500 --batch-size 32
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "app"))
+
+SAMPLE = (
+    "今天我们讨论一下下个季度的计划首先是产品的发布时间然后是市场推广的预算"
+    "大家有什么意见可以直接提出来我们会在会后整理成文件发给各位"
+)
+
+
+def synthetic_lines(count, min_len, max_len, seed=0):
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(count):
+        length = rng.randint(min_len, max_len)
+        start = rng.randrange(len(SAMPLE))
+        lines.append((SAMPLE * (length // len(SAMPLE) + 2))[start:start + length])
+    return lines
+
+
+def legacy_restore(punc, text, window_size=256, step=200):
+    """The pre-batching ChinesePunctuation.restore."""
+    from torch.utils.data import DataLoader
+    from zhpr.predict import DocumentDataset, decode_pred, merge_stride
+
+    dataset = DocumentDataset(text.replace(" ", "<s>").lower(), window_size=window_size, step=step)
+    model_pred_out = []
+    for batch in DataLoader(dataset=dataset, shuffle=False, batch_size=5):
+        output = punc.model(input_ids=batch)
+        for pred_ids, input_ids in zip(output["logits"].argmax(-1), batch):
+            tokens = punc.tokenizer.convert_ids_to_tokens(input_ids)
+            input_ids = input_ids.tolist()
+            pad_start = input_ids.index(punc.tokenizer.pad_token_id) if punc.tokenizer.pad_token_id in input_ids else len(input_ids)
+            labels = [punc.model.config.id2label[t.item()] for t in pred_ids]
+            model_pred_out.append(list(zip(tokens[:pad_start], labels[:pad_start])))
+    return "".join(decode_pred(merge_stride(model_pred_out, step))).replace("[UNK]", "").replace("<s>", " ")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=500)
+    parser.add_argument("--min-len", type=int, default=8)
+    parser.add_argument("--max-len", type=int, default=120)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    from postprocessing.punctuation import ChinesePunctuation
+
+    punc = ChinesePunctuation()
+    lines = synthetic_lines(args.lines, args.min_len, args.max_len)
+    total_chars = sum(len(line) for line in lines)
+    punc.restore_batch(lines[:8], batch_size=args.batch_size)  # warm-up
+
+    if not args.skip_legacy:
+        start = time.perf_counter()
+        for line in lines:
+            legacy_restore(punc, line)
+        elapsed = time.perf_counter() - start
+        print(f"legacy per-line : {total_chars / elapsed:10.0f} chars/s ({elapsed:.2f}s)")
+
+    start = time.perf_counter()
+    punc.restore_batch(lines, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - start
+    print(f"restore_batch   : {total_chars / elapsed:10.0f} chars/s ({elapsed:.2f}s, batch_size={args.batch_size})")
+
+
+if __name__ == "__main__":
+    main()
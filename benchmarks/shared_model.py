@@ -0,0 +1,133 @@
+"""
+Throughput of ASR workers with a shared inference server vs. per-process models.
+
+A stub model stands in for ASRModel: it holds --model-mb of memory and sends
+each file's 30 s chunk through a ChunkBatcher whose decoder batch costs a
+fixed overhead plus a per-chunk time, holding a lock shared by all processes
+to mimic one GPU. Each file also needs --prep-ms of CPU work in the worker
+(decoding, chunking, database).
+
+  solo    one worker with its own model (the old --pool=solo entrypoint)
+  copies  --workers processes, each loading its own model
+  server  --workers processes sending requests to one InferenceServer
+
+    python benchmarks/shared_model.py --workers 8 --files 64
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "app"))
+
+from asr_batcher import SAMPLE_RATE, ChunkBatcher  # noqa: E402
+from inference_server import InferenceServer, RemoteASRModel  # noqa: E402
+from pipeline import TranscriptionResult  # noqa: E402
+
+
+class StubBatcher(ChunkBatcher):
+    def __init__(self, fixed_ms, item_ms, gpu_lock, **kwargs):
+        super().__init__(pipeline=None, **kwargs)
+        self.fixed = fixed_ms / 1000
+        self.item = item_ms / 1000
+        self.gpu_lock = gpu_lock
+
+    def segment(self, audio):
+        return [{"start": 0.0, "end": len(audio) / SAMPLE_RATE}]
+
+    def decode(self, chunks, language):
+        with self.gpu_lock:
+            time.sleep(self.fixed + self.item * len(chunks))
+        return ["stub"] * len(chunks)
+
+
+class StubModel:
+    def __init__(self, model_mb, fixed_ms, item_ms, gpu_lock, batch_size, max_wait_ms):
+        self.weights = np.ones(model_mb * 1024 * 1024 // 8)  # touched, so it is resident
+        self.batcher = StubBatcher(fixed_ms, item_ms, gpu_lock, batch_size=batch_size, max_wait_ms=max_wait_ms)
+
+    def transcribe(self, audio, num_speakers, language="zh", return_details=False, **kwargs):
+        segments = [dict(s, speaker="SPEAKER_00") for s in self.batcher.transcribe(audio, language)["segments"]]
+        result = TranscriptionResult(segments, len(audio) / SAMPLE_RATE)
+        return result if return_details else result.segments
+
+
+def prep(ms):
+    """Busy CPU work standing in for decoding and chunking."""
+    deadline = time.process_time() + ms / 1000
+    x = np.random.default_rng(0).standard_normal(4096)
+    while time.process_time() < deadline:
+        np.fft.rfft(x)
+    return np.zeros(SAMPLE_RATE * 30, dtype=np.float32)
+
+
+def worker(make_model, files, prep_ms, done):
+    model = make_model()
+    for _ in range(files):
+        model.transcribe(prep(prep_ms), None, language="zh", diarize=False)
+        done.put(1)
+
+
+def run(mode, args):
+    ctx = mp.get_context("fork")
+    gpu_lock = ctx.Lock()
+    done = ctx.Queue()
+    server = None
+    workers = 1 if mode == "solo" else args.workers
+
+    if mode == "server":
+        address = os.path.join(tempfile.mkdtemp(), "inference.sock")
+        server = InferenceServer(lambda: StubModel(args.model_mb, args.fixed_ms, args.item_ms, gpu_lock,
+                                                   args.batch_size, args.max_wait_ms), address=address)
+        ready = threading.Event()
+        threading.Thread(target=server.serve_forever, args=(ready,), daemon=True).start()
+        ready.wait()
+        server.loaded.wait()
+        make_model = lambda: RemoteASRModel(address)
+        copies = 1
+    else:
+        make_model = lambda: StubModel(args.model_mb, args.fixed_ms, args.item_ms, gpu_lock,
+                                       args.batch_size, args.max_wait_ms)
+        copies = workers
+
+    per_worker = [args.files // workers + (i < args.files % workers) for i in range(workers)]
+    started = time.perf_counter()
+    processes = [ctx.Process(target=worker, args=(make_model, n, args.prep_ms, done)) for n in per_worker if n]
+    for p in processes:
+        p.start()
+    for _ in range(args.files):
+        done.get()
+    elapsed = time.perf_counter() - started
+    for p in processes:
+        p.join()
+
+    batch = f", {server.model.batcher.stats()['mean_batch']:.1f} chunks/batch" if server else ""
+    print(f"{mode:7s}: {workers:2d} workers  {args.files / elapsed:6.2f} files/s  "
+          f"model memory {copies * args.model_mb} MB ({copies} cop{'y' if copies == 1 else 'ies'}){batch}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--files", type=int, default=64)
+    parser.add_argument("--prep-ms", type=float, default=200)
+    parser.add_argument("--fixed-ms", type=float, default=60, help="per-batch model overhead")
+    parser.add_argument("--item-ms", type=float, default=15, help="model time per chunk in a batch")
+    parser.add_argument("--model-mb", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=50)
+    parser.add_argument("--modes", default="solo,copies,server")
+    args = parser.parse_args()
+
+    for mode in args.modes.split(","):
+        run(mode, args)
+
+
+if __name__ == "__main__":
+    main()
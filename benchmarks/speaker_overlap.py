@@ -0,0 +1,135 @@
+"""
+Speaker assignment: whisperx DataFrame scan vs. sorted interval index.
+
+Builds a synthetic meeting (alternating speakers with some crosstalk, words
+every ~0.4s grouped into segments) and assigns speakers to every segment and
+word both ways. The legacy scan is O(words x turns), so by default it runs on
+a sample of segments and its time is extrapolated; --full-legacy runs it all.
+
+    python benchmarks/speaker_overlap.py --hours 3 --speakers 6
+"""
+import argparse
+import copy
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "app"))
+
+from speaker_assignment import SpeakerTurns, assign_word_speakers  # noqa: E402
+
+
+class FakeSegment:
+    def __init__(self, start, end):
+        self.start, self.end = start, end
+
+
+def legacy_dataframe(tracks):
+    """The previous DiarizationPipeline.run output."""
+    diarize_df = pd.DataFrame(tracks, columns=['segment', 'label', 'speaker'])
+    diarize_df['start'] = diarize_df['segment'].apply(lambda x: float(x.start))
+    diarize_df['end'] = diarize_df['segment'].apply(lambda x: float(x.end))
+    return diarize_df
+
+
+def legacy_assign(diarize_df, transcript_result):
+    """whisperx.assign_word_speakers (fill_nearest=False)."""
+    for seg in transcript_result["segments"]:
+        for item in [seg] + [w for w in seg.get("words", []) if "start" in w]:
+            diarize_df['intersection'] = np.minimum(diarize_df['end'], item['end']) - np.maximum(diarize_df['start'], item['start'])
+            diarize_df['union'] = np.maximum(diarize_df['end'], item['end']) - np.minimum(diarize_df['start'], item['start'])
+            dia_tmp = diarize_df[diarize_df['intersection'] > 0]
+            if len(dia_tmp) > 0:
+                item["speaker"] = dia_tmp.groupby("speaker")["intersection"].sum().sort_values(ascending=False).index[0]
+    return transcript_result
+
+
+def synthetic_meeting(hours, speakers, seed=0):
+    rng = random.Random(seed)
+    duration = hours * 3600
+    tracks = []
+    t = 0.0
+    while t < duration:
+        speaker = f"SPEAKER_{rng.randrange(speakers):02d}"
+        length = rng.expovariate(1 / 8) + 0.5
+        tracks.append((FakeSegment(t, t + length), "_", speaker))
+        if rng.random() < 0.15:
+            # crosstalk from someone else near the end of the turn
+            other = f"SPEAKER_{rng.randrange(speakers):02d}"
+            cross = t + length * rng.uniform(0.5, 0.9)
+            tracks.append((FakeSegment(cross, cross + rng.uniform(0.3, 2.0)), "_", other))
+        t += length + rng.expovariate(1 / 0.6)
+
+    segments = []
+    t = 0.0
+    while t < duration:
+        words = []
+        for _ in range(rng.randint(5, 25)):
+            length = rng.uniform(0.15, 0.5)
+            words.append({"word": "w", "start": round(t, 3), "end": round(t + length, 3)})
+            t += length + rng.uniform(0.0, 0.2)
+        segments.append({"start": words[0]["start"], "end": words[-1]["end"], "words": words})
+        t += rng.expovariate(1 / 1.0)
+    return tracks, {"segments": segments}
+
+
+def labels(result):
+    out = []
+    for seg in result["segments"]:
+        out.append(seg.get("speaker"))
+        out.extend(word.get("speaker") for word in seg["words"])
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, default=3.0)
+    parser.add_argument("--speakers", type=int, default=6)
+    parser.add_argument("--legacy-segments", type=int, default=300,
+                        help="segments timed with the legacy scan before extrapolating")
+    parser.add_argument("--full-legacy", action="store_true")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tracks, transcript = synthetic_meeting(args.hours, args.speakers)
+    n_words = sum(len(seg["words"]) for seg in transcript["segments"])
+    n_items = n_words + len(transcript["segments"])
+    print(f"meeting       : {args.hours:g}h, {len(tracks)} turns, {len(transcript['segments'])} segments, {n_words} words")
+
+    start = time.perf_counter()
+    diarize_df = legacy_dataframe(tracks)
+    legacy_build = time.perf_counter() - start
+    start = time.perf_counter()
+    turns = SpeakerTurns.from_tuples((s.start, s.end, speaker) for s, _, speaker in tracks)
+    new_build = time.perf_counter() - start
+    print(f"build turns   : legacy {legacy_build * 1000:.1f}ms  new {new_build * 1000:.1f}ms")
+
+    new_best = float("inf")
+    for _ in range(args.repeat):
+        result = copy.deepcopy(transcript)
+        start = time.perf_counter()
+        assign_word_speakers(turns, result)
+        new_best = min(new_best, time.perf_counter() - start)
+    new_labels = labels(result)
+
+    sample = transcript if args.full_legacy else {"segments": transcript["segments"][:args.legacy_segments]}
+    sample = copy.deepcopy(sample)
+    sample_items = len(sample["segments"]) + sum(len(seg["words"]) for seg in sample["segments"])
+    start = time.perf_counter()
+    legacy_assign(diarize_df, sample)
+    legacy_time = (time.perf_counter() - start) * n_items / sample_items
+    legacy_labels = labels(sample)
+
+    agree = sum(a == b for a, b in zip(legacy_labels, new_labels)) / len(legacy_labels)
+    note = "" if args.full_legacy else f", extrapolated from {sample_items} items"
+    print(f"assign        : legacy {legacy_time:.2f}s{note}  new {new_best * 1000:.1f}ms  "
+          f"({legacy_time / new_best:.0f}x)")
+    print(f"agreement     : {agree:.4%} of {len(legacy_labels)} compared segments/words")
+
+
+if __name__ == "__main__":
+    main()
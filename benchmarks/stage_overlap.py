@@ -0,0 +1,41 @@
+"""
+Sequential vs. concurrent ASR + diarization inside ASRModel.transcribe.
+
+Loads the worker's model (weights/ must be present) and prints the
+per-stage timings ASRModel.transcribe returns for both modes.
+
+    CUDA_VISIBLE_DEVICES= python benchmarks/stage_overlap.py audio.wav --repeat 3
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "app"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audio", nargs="?", default="audio.wav")
+    parser.add_argument("--speakers", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    from audio_utils import load_waveform
+    from tasks.process_audio import get_asr_model
+
+    model = get_asr_model()
+    audio = load_waveform(args.audio)
+    model.transcribe(audio, args.speakers)  # warm-up
+
+    for concurrent in (False, True):
+        walls = []
+        for _ in range(args.repeat):
+            timings = model.transcribe(audio, args.speakers, concurrent=concurrent, return_details=True).timings
+            walls.append(timings["total"])
+            print(json.dumps({"concurrent": concurrent, **{k: round(v, 3) for k, v in timings.items()}}))
+        print(f"concurrent={concurrent}: best total {min(walls):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+English sticky-word repair: previous implementation vs. single-pass + cache.
+
+    python benchmarks/sticky_word.py --lines 2000 --repeat 3
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+import wordninja
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "app"))
+
+from postprocessing.tokenizer import (  # noqa: E402
+    repair_en_sticky_word,
+    repair_en_sticky_words,
+    split_sticky_word,
+)
+
+WORDS = ["meeting", "budget", "thisis", "quarterreport", "ok", "a", "the", "deadline",
+         "machinelearning", "GPU", "cloudserver", "we", "next", "week"]
+ZH = "我们下周讨论这个问题然后确认"
+
+
+def legacy_repair(sent):
+    """The previous repair_en_sticky_word (split per match, str.replace per record)."""
+    records = []
+    for match in re.finditer("[a-zA-Z]+", sent):
+        records.append((match.group(), " ".join(wordninja.split(match.group()))))
+    new_sent = sent
+    for record in records:
+        new_sent = new_sent.replace(*record)
+    return new_sent
+
+
+def synthetic_transcript(lines, words_per_line, seed=0):
+    rng = random.Random(seed)
+    out = []
+    for _ in range(lines):
+        parts = []
+        for _ in range(words_per_line):
+            parts.append(rng.choice(WORDS))
+            parts.append(ZH[:rng.randint(1, len(ZH))])
+        out.append("".join(parts))
+    return out
+
+
+def bench(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=2000)
+    parser.add_argument("--words-per-line", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    lines = synthetic_transcript(args.lines, args.words_per_line)
+    whole = "".join(lines)
+    chars = len(whole)
+
+    legacy_lines = bench(lambda: [legacy_repair(line) for line in lines], args.repeat)
+    split_sticky_word.cache_clear()
+    new_lines = bench(lambda: repair_en_sticky_words(lines), args.repeat)
+    print(f"per line      : legacy {legacy_lines:.3f}s  new {new_lines:.3f}s  ({legacy_lines / new_lines:.1f}x)")
+
+    legacy_whole = bench(lambda: legacy_repair(whole), 1)
+    new_whole = bench(lambda: repair_en_sticky_word(whole), args.repeat)
+    print(f"one sentence  : legacy {legacy_whole:.3f}s  new {new_whole:.3f}s  ({legacy_whole / new_whole:.1f}x, {chars} chars)")
+    print(f"cache         : {split_sticky_word.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Latency of /api/stream with a stub model (CPU only, no model download).
+
+Plays synthetic speech/pause audio into the WebSocket in real time (or
+--speed times faster) while a stub ASRModel sleeps --rtf seconds per second
+of audio it decodes. Reports the delay from the end of each utterance's
+speech to its final hypothesis (which includes the endpoint pause), the gap
+between partials and per-decode time.
+
+    python benchmarks/streaming_latency.py --seconds 30 --rtf 0.2
+    python benchmarks/streaming_latency.py --rtf 1.5   # slower than real time
+"""
+import argparse
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "app"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import streaming  # noqa: E402
+from main import app  # noqa: E402
+from routers import get_stream_model  # noqa: E402
+
+SAMPLE_RATE = streaming.SAMPLE_RATE
+FRAME_MS = 20
+
+
+class StubModel:
+    def __init__(self, rtf, overhead=0.02):
+        self.rtf = rtf
+        self.overhead = overhead
+
+    def transcribe(self, audio, num_speakers, language="zh", diarize=True, **kwargs):
+        seconds = len(audio) / SAMPLE_RATE
+        time.sleep(self.overhead + seconds * self.rtf)
+        return [{"start": 0.0, "end": seconds, "text": f"<{seconds:.1f}s>"}]
+
+
+def synthetic_audio(seconds, seed=0):
+    rng = np.random.default_rng(seed)
+    parts = []
+    speech_ends = []
+    total = 0
+    while total < seconds * SAMPLE_RATE:
+        pause = int(rng.uniform(0.8, 2.0) * SAMPLE_RATE)
+        speech = int(rng.uniform(1.0, 6.0) * SAMPLE_RATE)
+        parts.append(rng.normal(0, 0.0005, pause))
+        parts.append(rng.normal(0, 0.1, speech))
+        total += pause + speech
+        speech_ends.append(total)
+    parts.append(rng.normal(0, 0.0005, SAMPLE_RATE))
+    audio = np.concatenate(parts)
+    return (np.clip(audio, -1, 1) * 32767).astype("<i2"), speech_ends
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--rtf", type=float, default=0.2, help="stub decode seconds per audio second")
+    parser.add_argument("--speed", type=float, default=1.0, help="playback speed relative to real time")
+    args = parser.parse_args()
+
+    pcm, speech_ends = synthetic_audio(args.seconds)
+    frame = SAMPLE_RATE * FRAME_MS // 1000
+    app.dependency_overrides[get_stream_model] = lambda: StubModel(args.rtf)
+    sent_at = {}
+    events = []
+
+    with TestClient(app) as client, client.websocket_connect("/api/stream") as ws:
+        def send():
+            start = time.perf_counter()
+            for offset in range(0, len(pcm), frame):
+                due = start + offset / SAMPLE_RATE / args.speed
+                time.sleep(max(0.0, due - time.perf_counter()))
+                ws.send_bytes(pcm[offset:offset + frame].tobytes())
+                sent_at[offset + frame] = time.perf_counter()
+            ws.send_json({"event": "end"})
+
+        sender = threading.Thread(target=send)
+        sender.start()
+        while True:
+            event = ws.receive_json()
+            events.append((time.perf_counter(), event))
+            if event["type"] in ("end", "error"):
+                break
+        sender.join()
+
+    sent_samples = np.array(sorted(sent_at))
+    sent_times = np.array([sent_at[s] for s in sent_samples])
+    speech_ends = np.array(speech_ends)
+
+    final_delays, partial_times, decodes = [], [], []
+    for received, event in events:
+        if event["type"] not in ("partial", "final"):
+            continue
+        decodes.append(event["decode_ms"])
+        if event["type"] == "partial":
+            partial_times.append(received)
+            continue
+        # Speech end of the utterance: the last synthetic speech end inside it
+        ed = int(event["ed"]) * SAMPLE_RATE // 1000
+        inside = speech_ends[speech_ends <= ed]
+        if not len(inside):
+            continue
+        idx = min(np.searchsorted(sent_samples, inside[-1]), len(sent_samples) - 1)
+        final_delays.append((received - sent_times[idx]) * 1000)
+
+    finals = sum(event["type"] == "final" for _, event in events)
+    print(f"audio         : {len(pcm) / SAMPLE_RATE:.1f}s at {args.speed:g}x, stub rtf {args.rtf:g}")
+    print(f"hypotheses    : {finals} final, {len(partial_times)} partial")
+    print(f"speech end -> final: p50 {percentile(final_delays, 50):.0f}ms  p95 {percentile(final_delays, 95):.0f}ms  "
+          f"max {max(final_delays, default=float('nan')):.0f}ms "
+          f"(endpoint {streaming.STREAM_ENDPOINT_SECONDS * 1000:.0f}ms)")
+    gaps = [(b - a) * 1000 for a, b in zip(partial_times, partial_times[1:])]
+    print(f"partial gap   : median {statistics.median(gaps) if gaps else float('nan'):.0f}ms")
+    print(f"decode        : p50 {percentile(decodes, 50):.0f}ms  max {max(decodes, default=0)}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Peak RSS of the API process while /api/upload receives one segment,
+streaming vs. buffered.
+
+Each size starts a fresh uvicorn process serving the real router, so the peak
+resident set size (VmHWM) is not polluted by earlier runs. The segment is
+sent as a streamed multipart request through the whole HTTP stack (uvicorn,
+Starlette's multipart parser, the handler). --mode buffered posts to a copy
+of the previous handler, which read the whole segment into memory before
+writing it. With streaming the peak should stay flat as the segment grows;
+buffered grows with the segment.
+
+Starlette spools the multipart file to a temporary file (in memory only up
+to 1 MiB) before the handler runs, so the request is on disk twice while it
+is copied to uploads/, and UPLOAD_MAX_BYTES is enforced during that copy.
+
+    python benchmarks/upload_rss.py --sizes 10M,100M,500M,2G
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+
+_UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+BLOCK_SIZE = 1024 * 1024
+
+
+def parse_size(text):
+    text = text.strip().upper()
+    if text[-1] in _UNITS:
+        return int(float(text[:-1]) * _UNITS[text[-1]])
+    return int(text)
+
+
+def peak_rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def serve(port, workdir):
+    """API process: the real router plus the old buffered handler under /legacy/upload."""
+    os.chdir(workdir)
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+    sys.path.append(str(APP_DIR))
+
+    # The API only enqueues process_audio and never calls the model here; stand
+    # in for the task module so routers imports without whisperx and the weights.
+    import types
+
+    stub = types.ModuleType("tasks.process_audio")
+    stub.process_audio = types.SimpleNamespace(delay=lambda task_id: None)
+    stub.get_asr_model = lambda: None
+    sys.modules["tasks.process_audio"] = stub
+
+    import uvicorn
+    from fastapi import FastAPI, File, Form, UploadFile
+
+    import migrations
+    from routers import router
+
+    migrations.upgrade()
+    app = FastAPI()
+    app.include_router(router)
+
+    @app.post("/legacy/upload")
+    async def legacy_upload(task_id: str = Form(...), segment_id: int = Form(...),
+                            segment_len: str = Form(...), content: UploadFile = File(...)):
+        # The previous /api/upload behaviour: read everything, then write.
+        data = await content.read()
+        os.makedirs("uploads", exist_ok=True)
+        with open(f"uploads/{task_id}_segment_{segment_id}_{content.filename}", "wb") as f:
+            f.write(data)
+        return {"ok": 0, "err_no": 0, "failed": None, "data": len(data)}
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def multipart_body(fields, size, boundary):
+    """Yield a multipart/form-data body whose `content` file part is `size` random bytes."""
+    head = b"".join(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        for name, value in fields.items()
+    )
+    head += (f'--{boundary}\r\nContent-Disposition: form-data; name="content"; filename="synthetic.wav"\r\n'
+             f"Content-Type: application/octet-stream\r\n\r\n").encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+    block = os.urandom(BLOCK_SIZE)
+
+    def body():
+        yield head
+        remaining = size
+        while remaining > 0:
+            n = min(remaining, BLOCK_SIZE)
+            yield block[:n]
+            remaining -= n
+        yield tail
+
+    return body(), len(head) + size + len(tail)
+
+
+def wait_until_up(client, proc, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not proc.is_alive():
+            raise RuntimeError("API process exited during startup")
+        try:
+            client.get("/docs")
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError("API did not start")
+
+
+def run_one(size, mode, port):
+    with tempfile.TemporaryDirectory() as workdir:
+        proc = mp.get_context("spawn").Process(target=serve, args=(port, workdir), daemon=True)
+        proc.start()
+        try:
+            with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+                wait_until_up(client, proc)
+                task_id = client.post("/api/prepare", data={
+                    "file_len": str(size), "file_name": "synthetic.wav", "total_segments": "1",
+                }).json()["data"]
+                idle_mb = peak_rss_mb(proc.pid)
+
+                boundary = uuid.uuid4().hex
+                body, length = multipart_body({"task_id": task_id, "segment_id": 1, "segment_len": size},
+                                              size, boundary)
+                path = "/api/upload" if mode == "stream" else "/legacy/upload"
+                start = time.perf_counter()
+                response = client.post(path, content=body, headers={
+                    "Content-Type": f"multipart/form-data; boundary={boundary}",
+                    "Content-Length": str(length),
+                })
+                elapsed = time.perf_counter() - start
+                peak_mb = peak_rss_mb(proc.pid)
+        finally:
+            proc.terminate()
+            proc.join()
+    return {
+        "mode": mode,
+        "size_mb": round(size / 1024 ** 2, 1),
+        "status": response.status_code,
+        "ok": response.json().get("ok"),
+        "seconds": round(elapsed, 3),
+        "mb_per_s": round(size / 1024 ** 2 / elapsed, 1) if elapsed else None,
+        "idle_rss_mb": round(idle_mb, 1),
+        "peak_rss_mb": round(peak_mb, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10M,100M,500M,1G,2G")
+    parser.add_argument("--mode", choices=["stream", "buffered"], default="stream")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    results = []
+    for size in map(parse_size, args.sizes.split(",")):
+        result = run_one(size, args.mode, args.port)
+        print(json.dumps(result))
+        results.append(result)
+
+    rss = [r["peak_rss_mb"] for r in results]
+    print(f"peak RSS spread across sizes: {max(rss) - min(rss):.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
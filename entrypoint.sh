@@ -2,8 +2,16 @@
 
 set -e
 
+# One process holds the models; ASR workers send it their chunks over a local socket
+export INFERENCE_SERVER_ADDRESS="${INFERENCE_SERVER_ADDRESS:-/tmp/asr-inference.sock}"
+echo "🟢 Starting inference server on $INFERENCE_SERVER_ADDRESS..."
+python app/inference_server.py &
+
 echo "🟢 Starting Celery worker..."
-celery -A app.celery_app.celery worker --loglevel=info --concurrency=1  --pool=solo &
+WORKER_ROLE=asr celery -A app.celery_app.celery worker -Q celery -n asr@%h --loglevel=info --concurrency="${ASR_WORKER_CONCURRENCY:-$(nproc)}" &
+
+echo "🟢 Starting Celery post-processing worker..."
+WORKER_ROLE=postprocess celery -A app.celery_app.celery worker -Q "${PUNCTUATION_QUEUE:-postprocess}" -n postprocess@%h --loglevel=info --concurrency="${POSTPROCESS_CONCURRENCY:-2}" &
 
 sleep 5
 
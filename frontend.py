@@ -1,10 +1,17 @@
 import streamlit as st
 import requests
 import time
-import io
+import json
+import os
+import shutil
+import tempfile
+
+from upload_client import UploadClient, UploadError
 
 # Base URL of your FastAPI backend
 BASE_URL = "http://140.115.59.61:8003"
+UPLOAD_CONCURRENCY = 4
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
 
 def handle_request(url, method="POST", data=None, files=None):
     """Helper function to handle requests and check for errors"""
@@ -52,59 +59,27 @@ def start_processing(uploaded_file, file_len, total_segments, speaker_number, ha
         return None
 
 def upload_file_segments(task_id, uploaded_file, total_segments):
-    """Function to upload the file as segments"""
-    file_content = uploaded_file.read()
-    file_size = len(file_content)
-    segment_size = file_size // total_segments
-    
+    """Upload the file as segments in parallel, spooling it to disk first"""
     st.info(f"Uploading {total_segments} segments...")
     upload_progress = st.progress(0)
-    
-    for segment_id in range(1, total_segments + 1):
-        start_pos = (segment_id - 1) * segment_size
-        if segment_id == total_segments:
-            # Last segment gets remaining bytes
-            end_pos = file_size
-        else:
-            end_pos = start_pos + segment_size
-            
-        segment_data = file_content[start_pos:end_pos]
-        segment_len = str(len(segment_data))
-        
-        # Create a file-like object for the segment
-        segment_file = io.BytesIO(segment_data)
-        segment_filename = f"{uploaded_file.name}_segment_{segment_id}"
-        
-        # Debug information
-        st.write(f"Uploading segment {segment_id}: size={segment_len} bytes")
-        
-        files = {"content": (segment_filename, segment_file, uploaded_file.type)}
-        upload_data = {
-            "task_id": task_id,
-            "segment_id": segment_id,  # Send as int, not string
-            "segment_len": segment_len
-        }
-        
-        # Debug the request data
-        st.write(f"Upload data: {upload_data}")
-        
-        res = handle_request(f"{BASE_URL}/api/upload", data=upload_data, files=files)
-        if res and res.status_code == 200:
-            response_data = res.json()
-            st.write(f"Response: {response_data}")
-            if response_data.get("ok") == 0:
-                upload_progress.progress(segment_id / total_segments)
-                st.success(f"✅ Uploaded segment {segment_id}/{total_segments}")
-            else:
-                st.error(f"❌ API returned error for segment {segment_id}: {response_data}")
-                return False
-        else:
-            st.error(f"❌ Failed to upload segment {segment_id}")
-            if res:
-                st.error(f"Status: {res.status_code}, Response: {res.text}")
-            return False
-    
-    st.success(f"All {total_segments} segments uploaded successfully!")
+
+    suffix = os.path.splitext(uploaded_file.name)[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as spool:
+        shutil.copyfileobj(uploaded_file, spool, UPLOAD_CHUNK_SIZE)
+    try:
+        with UploadClient(BASE_URL, concurrency=UPLOAD_CONCURRENCY, chunk_size=UPLOAD_CHUNK_SIZE) as client:
+            stats = client.upload_file(
+                task_id, spool.name, total_segments, filename=uploaded_file.name,
+                progress=lambda done, total: upload_progress.progress(done / total if total else 1.0),
+            )
+    except UploadError as e:
+        st.error(f"❌ Upload failed: {e}")
+        return False
+    finally:
+        os.remove(spool.name)
+
+    upload_progress.progress(1.0)
+    st.success(f"All {total_segments} segments uploaded successfully! {stats}")
     return True
 
 def check_progress_detailed(task_id, progress_placeholder, segments_placeholder):
@@ -117,7 +92,11 @@ def check_progress_detailed(task_id, progress_placeholder, segments_placeholder)
     data = res.json().get("data")
     if not data:
         return None
-        
+
+    return render_progress(data, progress_placeholder, segments_placeholder)
+
+def render_progress(data, progress_placeholder, segments_placeholder):
+    """Render a getProgress-shaped dict and return the task status"""
     task_status = data.get("task_status", 0)
     task_desc = data.get("desc", "Unknown")
     segments = data.get("segments", {})
@@ -133,10 +112,49 @@ def check_progress_detailed(task_id, progress_placeholder, segments_placeholder)
             status = seg_data.get("status", 0)
             desc = seg_data.get("desc", "Unknown")
             segment_info += f"- Segment {seg_id}: Status {status} - {desc}\n"
+        punctuation = data.get("punctuation")
+        if punctuation:
+            segment_info += f"\n**Punctuation:** Status {punctuation['status']} - {punctuation['desc']}\n"
         segments_placeholder.markdown(segment_info)
     
     return task_status
 
+def apply_progress_event(data, event_type, event):
+    """Fold one progress stream event into the getProgress-shaped dict"""
+    if event_type == "snapshot":
+        return event
+    if event_type == "task":
+        data["task_status"] = event["status"]
+        data["desc"] = event["desc"]
+    elif event_type == "segment":
+        data["segments"][str(event["segment_id"])] = {"status": event["status"], "desc": event["desc"]}
+    elif event_type == "punctuation":
+        data["punctuation"] = event["punctuation"]
+    return data
+
+def stream_progress(task_id, progress_placeholder, segments_placeholder, main_progress_bar):
+    """Follow progress over the server-sent event stream instead of polling.
+
+    Returns the last task status, or None if the stream is unavailable.
+    """
+    data = None
+    try:
+        with requests.get(f"{BASE_URL}/api/progress/stream", params={"task_id": task_id},
+                          stream=True, timeout=(10, 60)) as response:
+            response.raise_for_status()
+            event_type = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event:"):
+                    event_type = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data = apply_progress_event(data, event_type, json.loads(line[len("data:"):]))
+                    status = render_progress(data, progress_placeholder, segments_placeholder)
+                    main_progress_bar.progress(max(0, int((status / 9) * 100)))
+    except requests.exceptions.RequestException as e:
+        st.error(f"Progress stream failed, polling instead: {e}")
+        return None
+    return data.get("task_status") if data else None
+
 def get_result(task_id):
     """Function to get the final result"""
     res = handle_request(f"{BASE_URL}/api/getResult", data={"task_id": task_id})
@@ -213,9 +231,11 @@ if st.button("Start Processing"):
         segments_placeholder = st.empty()
         main_progress_bar = st.progress(0)
 
-        # Poll progress with detailed segment info
-        status = 0
-        while status < 9:
+        # Follow progress over the event stream; poll only if it is unavailable
+        status = stream_progress(task_id, progress_placeholder, segments_placeholder, main_progress_bar)
+        if status is None:
+            status = 0
+        while 0 <= status < 9:
             time.sleep(3)  # Check every 3 seconds
             status = check_progress_detailed(task_id, progress_placeholder, segments_placeholder)
             if status is None:
@@ -0,0 +1,63 @@
+import numpy as np
+
+import chunking
+
+SR = 1000  # a small rate keeps the arrays small; frames are 30 samples
+
+
+def speech(seconds, seed=0):
+    return np.random.default_rng(seed).normal(0, 0.2, int(seconds * SR)).astype(np.float32)
+
+
+def pause(seconds):
+    return np.zeros(int(seconds * SR), dtype=np.float32)
+
+
+def test_find_silences_keeps_only_long_enough_pauses():
+    audio = np.concatenate((speech(3.0), pause(0.6), speech(2.0), pause(0.12), speech(2.0)))
+
+    silences = chunking.find_silences(audio, SR, min_silence=0.3)
+
+    assert len(silences) == 1
+    start, end = silences[0]
+    assert 3000 <= start <= 3030 and 3570 <= end <= 3600  # whole frames inside the pause
+
+
+def test_find_silences_on_audio_shorter_than_a_frame():
+    assert chunking.find_silences(speech(0.01), SR) == []
+
+
+def test_short_audio_is_one_chunk():
+    audio = speech(5)
+    assert chunking.plan_chunks(audio, SR, target=2, min_len=1, max_len=5) == [(0, len(audio))]
+
+
+def test_chunks_cut_in_the_pause_nearest_the_target():
+    # Pauses at 4 s, 9 s and 13 s; with a 10 s target the first cut is the 9 s one
+    audio = np.concatenate((speech(4, 1), pause(0.5), speech(4.5, 2), pause(0.5), speech(3.5, 3),
+                            pause(0.5), speech(8, 4)))
+
+    chunks = chunking.plan_chunks(audio, SR, target=10, min_len=3, max_len=12)
+
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(audio)
+    assert all(a[1] == b[0] for a, b in zip(chunks, chunks[1:]))
+    first_cut = chunks[0][1]
+    assert 9000 <= first_cut <= 9500
+    assert np.all(audio[first_cut - 100:first_cut + 100] == 0)
+
+
+def test_chunks_without_pauses_are_cut_at_max_len():
+    audio = speech(25)
+
+    chunks = chunking.plan_chunks(audio, SR, target=5, min_len=2, max_len=10)
+
+    assert chunks == [(0, 10000), (10000, 20000), (20000, 25000)]
+
+
+def test_chunks_by_segment_maps_byte_ranges_to_chunks():
+    chunks = [(0, 100), (100, 250), (250, 300)]
+
+    # Segments of 40%, 40% and 20% of the bytes cover samples 0-120, 120-240, 240-300
+    assert chunking.chunks_by_segment([40, 40, 20], chunks) == [[0, 1], [1], [1, 2]]
+    # An empty segment belongs to the chunk at its position
+    assert chunking.chunks_by_segment([50, 0, 50], chunks) == [[0, 1], [1], [1, 2]]
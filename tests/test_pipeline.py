@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+
+import pytest
+
+from pipeline import PipelinePlan, parse_speaker_number, plan_pipeline, resolve_language
+
+
+def task(speaker_number="2", has_separate=True, language="default"):
+    return SimpleNamespace(id="t1", speaker_number=speaker_number, has_separate=has_separate, language=language)
+
+
+@pytest.mark.parametrize("speaker_number, has_separate, diarize, num_speakers", [
+    ("2", True, True, 2),
+    ("1", True, False, 1),  # one speaker needs no diarization
+    ("3", False, False, 3),  # labels are not returned, so not computed
+    ("auto", True, True, None),
+    ("0", True, True, None),
+    (None, True, True, None),
+])
+def test_plan_pipeline_diarizes_only_when_labels_are_needed(speaker_number, has_separate, diarize, num_speakers):
+    plan = plan_pipeline(task(speaker_number, has_separate))
+
+    assert plan.diarize is diarize
+    assert plan.num_speakers == num_speakers
+
+
+def test_stages_follow_the_plan():
+    assert PipelinePlan(diarize=True, num_speakers=2, punctuate=True).stages == (
+        "decode", "asr", "diarization", "assign", "punctuation")
+    assert PipelinePlan(diarize=False, num_speakers=None, punctuate=False).stages == ("decode", "asr")
+
+
+def test_language_and_speaker_number_parsing():
+    assert resolve_language(task(language="default")) == "zh"
+    assert resolve_language(task(language=None)) == "zh"
+    assert resolve_language(task(language="en")) == "en"
+    assert parse_speaker_number("4") == 4
+    assert parse_speaker_number("-1") is None
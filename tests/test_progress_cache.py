@@ -0,0 +1,50 @@
+import asyncio
+
+import progress_cache
+
+
+class FailingPipeline:
+    def hset(self, *args, **kwargs):
+        pass
+
+    def expire(self, *args):
+        pass
+
+    def execute(self):
+        raise ConnectionError("redis went away")
+
+
+class FakeRedis:
+    def __init__(self):
+        self.deleted = []
+
+    def pipeline(self, transaction=True):
+        return FailingPipeline()
+
+    def delete(self, key):
+        self.deleted.append(key)
+
+
+def test_failed_write_drops_the_snapshot(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr(progress_cache, "PROGRESS_CACHE_URL", "redis://test")
+    monkeypatch.setattr(progress_cache, "_redis", lambda: redis)
+
+    progress_cache.record_task("t1", 9)
+
+    assert redis.deleted == [progress_cache.snapshot_key("t1")]
+
+
+def test_local_snapshots_round_trip_and_invalidate(monkeypatch):
+    monkeypatch.setattr(progress_cache, "PROGRESS_CACHE_URL", None)
+    monkeypatch.setattr(progress_cache, "PROGRESS_CACHE_LOCAL", True)
+    monkeypatch.setattr(progress_cache, "local_snapshots", progress_cache.InProcessSnapshots())
+
+    progress_cache.record_task("t1", 0, total_segments=2)
+    progress_cache.record_segment("t1", 2, 9)
+    assert asyncio.run(progress_cache.get("t1")) == {
+        "task_status": 0, "total_segments": 2, "punctuation_status": None, "segments": {2: 9},
+    }
+
+    progress_cache.invalidate("t1")
+    assert asyncio.run(progress_cache.get("t1")) is None
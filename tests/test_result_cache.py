@@ -0,0 +1,79 @@
+import hashlib
+
+import result_cache
+
+
+def write_segments(tmp_path, data, sizes):
+    paths, start = [], 0
+    for i, size in enumerate(sizes):
+        path = tmp_path / f"{len(sizes)}_{i}.bin"
+        path.write_bytes(data[start:start + size])
+        paths.append(str(path))
+        start += size
+    return paths
+
+
+def test_audio_hash_does_not_depend_on_how_the_upload_was_split(tmp_path):
+    data = bytes(range(256)) * 1000
+    three = write_segments(tmp_path, data, [100_000, 56_000, 100_000])
+    five = write_segments(tmp_path, data, [1, 60_000, 60_000, 135_998, 1])
+
+    assert result_cache.audio_hash(three, chunk_size=4096) == result_cache.audio_hash(five)
+    # A one-segment upload's checksum is already the recording's hash
+    assert result_cache.audio_hash(three) == hashlib.sha256(data).hexdigest()
+
+
+def test_audio_hash_depends_on_segment_order(tmp_path):
+    paths = write_segments(tmp_path, b"abcdef", [3, 3])
+
+    assert result_cache.audio_hash(paths) != result_cache.audio_hash(paths[::-1])
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        self.now += 1
+        return self.now
+
+
+def entry_result(size):
+    # One line whose JSON takes exactly `size` bytes
+    return ["x" * (size - 4)]
+
+
+def cached_keys(db):
+    return sorted(key for key, in db.query(result_cache.ResultCache.key))
+
+
+def test_store_evicts_least_recently_used(db, monkeypatch):
+    monkeypatch.setattr(result_cache, "time", Clock())
+    for key in "abc":
+        result_cache.store(db, key, entry_result(100), max_bytes=300)
+    assert result_cache.payload_size(entry_result(100)) == 100
+
+    # A lookup makes "a" the most recently used, so "b" goes first
+    assert result_cache.lookup(db, "a").hits == 1
+    result_cache.store(db, "d", entry_result(100), max_bytes=300)
+
+    assert cached_keys(db) == ["a", "c", "d"]
+    assert result_cache.lookup(db, "b") is None
+
+
+def test_store_skips_results_larger_than_the_cache(db):
+    result_cache.store(db, "small", entry_result(100), max_bytes=150)
+    result_cache.store(db, "big", entry_result(200), max_bytes=150)
+
+    assert cached_keys(db) == ["small"]
+
+
+def test_store_punctuated_recomputes_the_entry_size(db):
+    result_cache.store(db, "a", entry_result(100))
+    result_cache.store_punctuated(db, "a", entry_result(50))
+    result_cache.store_punctuated(db, "a", entry_result(60))
+    assert result_cache.lookup(db, "a").size_bytes == 160
+
+    # Replacing the result keeps the punctuated result in the size
+    result_cache.store(db, "a", entry_result(120))
+    assert result_cache.lookup(db, "a").size_bytes == 180
@@ -0,0 +1,59 @@
+import pytest
+
+import result_store
+from models import Task
+
+LINES = [
+    {"bg": "0", "ed": "1000", "onebest": "a", "speaker": "1"},
+    {"bg": "1000", "ed": "2500", "onebest": "b", "speaker": "2"},
+    {"bg": "2500", "ed": "4000", "onebest": "c", "speaker": "1"},
+    {"bg": "4000", "ed": "5000", "onebest": "d", "speaker": "3"},
+]
+
+
+@pytest.fixture
+def stored(db):
+    db.add(Task(id="t1", status=9, result=LINES))
+    result_store.write_lines(db, "t1", LINES)
+    db.commit()
+    return db
+
+
+def texts(db, **kwargs):
+    return [line.onebest for line in db.scalars(result_store.page_query("t1", **kwargs))]
+
+
+def test_page_query_pages_with_a_line_cursor(stored):
+    first = list(stored.scalars(result_store.page_query("t1", limit=2)))
+    assert [line.onebest for line in first] == ["a", "b"]
+    assert texts(stored, after=first[-1].line_no, limit=2) == ["c", "d"]
+    assert texts(stored, after=3) == []
+
+
+def test_page_query_filters_by_overlap_and_speaker(stored):
+    # Lines overlapping [1500, 2500): only b, since c starts at 2500
+    assert texts(stored, bg=1500, ed=2500) == ["b"]
+    assert texts(stored, bg=3999) == ["c", "d"]
+    assert texts(stored, speakers=["1", "3"]) == ["a", "c", "d"]
+    assert texts(stored, speakers=["1"], after=0) == ["c"]
+
+
+def test_write_lines_replaces_and_punctuated_text_follows_line_order(stored):
+    result_store.write_lines(stored, "t1", LINES[:2])
+    result_store.write_punctuated(stored, "t1", [{"onebest": "A."}, {"onebest": "B."}])
+    stored.commit()
+
+    lines = list(stored.scalars(result_store.page_query("t1")))
+    assert [result_store.to_api_line(line, punctuated=True) for line in lines] == [
+        {"bg": "0", "ed": "1000", "onebest": "A.", "speaker": "1"},
+        {"bg": "1000", "ed": "2500", "onebest": "B.", "speaker": "2"},
+    ]
+
+
+def test_backfill_splits_an_old_result(db):
+    db.add(Task(id="t2", status=9, result=LINES, punctuated_result=[{"onebest": x} for x in "ABCD"]))
+    db.commit()
+
+    assert result_store.backfill(db, "t2")
+    assert [line.punctuated for line in db.scalars(result_store.page_query("t2"))] == list("ABCD")
+    assert not result_store.backfill(db, "missing")
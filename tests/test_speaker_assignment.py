@@ -0,0 +1,115 @@
+import copy
+import random
+
+import numpy as np
+import pytest
+
+from speaker_assignment import SpeakerIndex, SpeakerTurns, assign_word_speakers, merge_intervals
+
+
+def whisperx_assign(turns, transcript_result):
+    """whisperx.assign_word_speakers (fill_nearest=False) on a diarization DataFrame."""
+    pd = pytest.importorskip("pandas")
+    diarize_df = pd.DataFrame(turns, columns=["start", "end", "speaker"])
+    for seg in transcript_result["segments"]:
+        for item in [seg] + [w for w in seg.get("words", []) if "start" in w]:
+            diarize_df["intersection"] = (np.minimum(diarize_df["end"], item["end"])
+                                          - np.maximum(diarize_df["start"], item["start"]))
+            dia_tmp = diarize_df[diarize_df["intersection"] > 0]
+            if len(dia_tmp) > 0:
+                item["speaker"] = dia_tmp.groupby("speaker")["intersection"].sum().sort_values(ascending=False).index[0]
+    return transcript_result
+
+
+def speakers(result):
+    out = []
+    for seg in result["segments"]:
+        out.append(seg.get("speaker"))
+        out.extend(word.get("speaker") for word in seg.get("words", ()))
+    return out
+
+
+def assert_matches_whisperx(turns, transcript):
+    expected = whisperx_assign(turns, copy.deepcopy(transcript))
+    actual = assign_word_speakers(SpeakerTurns.from_tuples(turns), copy.deepcopy(transcript))
+    assert speakers(actual) == speakers(expected)
+
+
+def test_four_way_tie_matches_whisperx():
+    # Overlaps with the word are 2.5, 2.5, 4.5 and 4.5 seconds
+    turns = [(0.0, 2.5, "SPEAKER_00"), (2.5, 5.0, "SPEAKER_01"), (5.0, 9.5, "SPEAKER_02"), (5.5, 10.0, "SPEAKER_03")]
+    assert_matches_whisperx(turns, {"segments": [{"start": 0.0, "end": 10.0}]})
+
+
+def test_ties_from_float_sums_match_whisperx():
+    # 0.1 + 0.2 and 0.3 differ after rounding; whisperx compares the rounded sums
+    turns = [(0.0, 0.1, "SPEAKER_01"), (0.1, 0.3, "SPEAKER_01"), (0.3, 0.6, "SPEAKER_00")]
+    assert_matches_whisperx(turns, {"segments": [{"start": 0.0, "end": 0.6}]})
+
+
+def test_touching_turns_and_zero_length_words_match_whisperx():
+    turns = [(1.0, 2.0, "SPEAKER_00"), (2.0, 3.0, "SPEAKER_01")]
+    words = [{"word": "a", "start": 2.0, "end": 2.0}, {"word": "b", "start": 0.0, "end": 1.0},
+             {"word": "c", "start": 1.5, "end": 2.5}, {"word": "d", "start": 3.0, "end": 4.0}]
+    assert_matches_whisperx(turns, {"segments": [{"start": 0.0, "end": 4.0, "words": words}]})
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_grid_aligned_meetings_match_whisperx(seed):
+    # Times on a coarse grid make exact ties between speakers common
+    rng = random.Random(seed)
+    grid = rng.choice([0.5, 0.25, 0.1, 1 / 3])
+    turns = []
+    for _ in range(rng.randint(3, 30)):
+        start = rng.randint(0, 80) * grid
+        turns.append((start, start + rng.randint(0, 20) * grid, f"SPEAKER_{rng.randrange(rng.randint(2, 6)):02d}"))
+    segments = []
+    for _ in range(rng.randint(1, 10)):
+        words = []
+        for _ in range(rng.randint(1, 8)):
+            start = rng.randint(0, 100) * grid
+            words.append({"word": "w", "start": start, "end": start + rng.randint(0, 12) * grid})
+        segments.append({"start": min(w["start"] for w in words), "end": max(w["end"] for w in words),
+                         "words": words})
+    assert_matches_whisperx(turns, {"segments": segments})
+
+
+def test_merge_intervals_joins_overlapping_and_touching_turns():
+    starts, ends = merge_intervals(np.array([5.0, 0.0, 1.0, 2.0, 8.0]), np.array([6.0, 1.0, 1.5, 4.0, 9.0]))
+
+    assert starts.tolist() == [0.0, 2.0, 5.0, 8.0]
+    assert ends.tolist() == [1.5, 4.0, 6.0, 9.0]
+
+
+def test_turns_round_trip_and_durations():
+    turns = SpeakerTurns.from_tuples([(0.0, 2.0, "B"), (2.0, 3.0, "A"), (4.0, 7.0, "B")])
+
+    assert turns.labels == ("A", "B")
+    assert list(turns) == [(0.0, 2.0, "B"), (2.0, 3.0, "A"), (4.0, 7.0, "B")]
+    assert turns.durations().tolist() == [1.0, 5.0]
+
+
+def test_overlap_counts_a_speakers_overlapping_turns_separately():
+    index = SpeakerIndex(SpeakerTurns.from_tuples([(0.0, 4.0, "A"), (1.0, 3.0, "A"), (2.0, 6.0, "B")]))
+
+    overlap = index.overlap(np.array([0.0, 5.0]), np.array([4.0, 8.0]))
+
+    assert np.allclose(overlap, [[6.0, 0.0], [2.0, 1.0]])
+
+
+def test_fill_nearest_gives_words_outside_turns_the_closest_speaker():
+    turns = SpeakerTurns.from_tuples([(0.0, 1.0, "A"), (5.0, 6.0, "B")])
+    words = [{"word": "x", "start": 1.5, "end": 2.0}, {"word": "y", "start": 4.0, "end": 4.5}]
+
+    plain = assign_word_speakers(turns, {"segments": [{"start": 1.5, "end": 4.5, "words": copy.deepcopy(words)}]})
+    filled = assign_word_speakers(turns, {"segments": [{"start": 1.5, "end": 4.5, "words": words}]},
+                                  fill_nearest=True)
+
+    assert speakers(plain) == [None, None, None]
+    assert speakers(filled)[1:] == ["A", "B"]
+
+
+def test_no_turns_assigns_nothing():
+    result = assign_word_speakers(SpeakerTurns.from_tuples([]), {"segments": [{"start": 0.0, "end": 1.0}]})
+
+    assert speakers(result) == [None]
@@ -0,0 +1,56 @@
+import numpy as np
+
+import speaker_embeddings
+from models import Task
+from speaker_assignment import SpeakerTurns
+
+RNG = np.random.default_rng(0)
+VOICES = {name: RNG.normal(size=64) for name in "ABC"}
+
+
+def voice(name, noise=0.05):
+    return VOICES[name] + RNG.normal(scale=noise, size=64)
+
+
+def test_cluster_matches_speakers_across_chunks():
+    # Chunk 0 has A then B, chunk 1 has B then A, chunk 2 only A
+    embeddings = np.stack([voice("A"), voice("B"), voice("B"), voice("A"), voice("A")])
+    members = speaker_embeddings.cluster(embeddings, np.ones(5), np.array([0, 0, 1, 1, 2]))
+
+    assert members[0] == members[3] == members[4]
+    assert members[1] == members[2]
+    assert members[0] != members[1]
+
+
+def test_cluster_never_merges_speakers_of_the_same_chunk():
+    same = voice("A")
+    members = speaker_embeddings.cluster(np.stack([same, same]), np.ones(2), np.array([0, 0]))
+
+    assert members[0] != members[1]
+
+
+def test_cluster_threshold_and_forced_count():
+    embeddings = np.stack([voice("A"), voice("B"), voice("C")])
+    groups = np.array([0, 1, 2])
+
+    assert len(set(speaker_embeddings.cluster(embeddings, np.ones(3), groups))) == 3
+    assert len(set(speaker_embeddings.cluster(embeddings, np.ones(3), groups, num_clusters=1))) == 1
+
+
+def test_global_speakers_from_stored_embeddings(db):
+    db.add(Task(id="t1", status=2))
+    chunk0 = SpeakerTurns.from_tuples([(0, 5, "SPEAKER_00"), (5, 9, "SPEAKER_01")],
+                                      embeddings=np.stack([voice("A"), voice("B")]))
+    # pyannote pads speakers it could not embed with zeros; those are not stored
+    chunk1 = SpeakerTurns.from_tuples([(0, 4, "SPEAKER_00"), (4, 9, "SPEAKER_01"), (9, 9.5, "SPEAKER_02")],
+                                      embeddings=np.stack([voice("B"), voice("A"), np.zeros(64)]))
+    assert speaker_embeddings.save(db, "t1", 0, chunk0) == 2
+    assert speaker_embeddings.save(db, "t1", 1, chunk1) == 2
+    db.commit()
+
+    mapping = speaker_embeddings.global_speakers(db, "t1")
+
+    assert mapping == {
+        (0, "SPEAKER_00"): "SPEAKER_00", (0, "SPEAKER_01"): "SPEAKER_01",
+        (1, "SPEAKER_00"): "SPEAKER_01", (1, "SPEAKER_01"): "SPEAKER_00",
+    }
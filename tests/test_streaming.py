@@ -0,0 +1,187 @@
+"""StreamingTranscriber and /api/stream with a stub model (CPU only, no weights)."""
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "app"))
+
+from streaming import SAMPLE_RATE, StreamingTranscriber, ms  # noqa: E402
+
+FRAME = 480  # 30 ms; the test signals are whole frames so VAD decisions are exact
+
+
+class StubModel:
+    """Returns one segment spanning the audio, with the sample count as text."""
+
+    def __init__(self):
+        self.calls = []
+
+    def transcribe(self, audio, num_speakers, language="zh", diarize=True, **kwargs):
+        self.calls.append(len(audio))
+        return [{"start": 0.0, "end": len(audio) / SAMPLE_RATE, "text": str(len(audio))}]
+
+
+def speech(frames):
+    t = np.arange(frames * FRAME) / SAMPLE_RATE
+    return (0.3 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+
+def silence(frames):
+    return np.zeros(frames * FRAME, dtype=np.float32)
+
+
+def to_pcm16(samples):
+    return (samples * 32767).astype("<i2").tobytes()
+
+
+def make_transcriber(model, **kwargs):
+    options = {"endpoint_seconds": 0.6, "partial_interval_seconds": 1.0, "max_utterance_seconds": 15}
+    options.update(kwargs)
+    return StreamingTranscriber(model, **options)
+
+
+def test_pause_ends_utterance_with_final():
+    model = StubModel()
+    transcriber = make_transcriber(model)
+    transcriber.push(silence(16))
+    transcriber.push(speech(32))
+    transcriber.push(silence(40))
+
+    events = transcriber.step()
+
+    # Utterance keeps 6 frames of pre-roll before and 6 frames of the pause after the speech
+    start = (16 - 6) * FRAME
+    length = (6 + 32 + 6) * FRAME
+    assert [e["type"] for e in events] == ["final"]
+    assert events[0]["bg"] == ms(start)
+    assert events[0]["ed"] == ms(start + length)
+    assert events[0]["onebest"] == str(length)
+    assert events[0]["lines"] == [{"bg": ms(start), "ed": ms(start + length), "onebest": str(length)}]
+    assert not transcriber.in_speech
+    assert transcriber.step() == []
+
+
+def test_partial_while_speaking_then_nothing_new():
+    model = StubModel()
+    transcriber = make_transcriber(model)
+    transcriber.push(speech(40))  # 1.2 s, past the partial interval
+
+    events = transcriber.step()
+
+    assert [e["type"] for e in events] == ["partial"]
+    assert events[0]["bg"] == "0"
+    assert transcriber.in_speech
+    assert transcriber.step() == []  # no new speech since the last partial
+    assert model.calls == [40 * FRAME]
+
+
+def test_silence_only_decodes_nothing():
+    model = StubModel()
+    transcriber = make_transcriber(model)
+    transcriber.push(silence(100))
+
+    assert transcriber.step() == []
+    assert transcriber.flush() == []
+    assert model.calls == []
+
+
+def test_long_utterance_is_cut_at_max_length():
+    model = StubModel()
+    transcriber = make_transcriber(model, max_utterance_seconds=64 * FRAME / SAMPLE_RATE,
+                                   partial_interval_seconds=100)
+    transcriber.push(speech(160))
+
+    finals = transcriber.step()
+
+    assert [e["type"] for e in finals] == ["final", "final"]
+    assert [(e["bg"], e["ed"]) for e in finals] == [(ms(0), ms(64 * FRAME)), (ms(64 * FRAME), ms(128 * FRAME))]
+    assert max(model.calls) <= transcriber.max_utterance
+
+    rest = transcriber.flush()
+    assert [(e["type"], e["bg"], e["ed"]) for e in rest] == [("final", ms(128 * FRAME), ms(160 * FRAME))]
+
+
+def test_flush_finalizes_utterance_including_partial_frame():
+    model = StubModel()
+    transcriber = make_transcriber(model)
+    transcriber.push(speech(20))
+    transcriber.push(speech(1)[:100])  # less than a frame
+
+    events = transcriber.flush()
+
+    assert [e["type"] for e in events] == ["final"]
+    assert events[0]["bg"] == "0"
+    assert events[0]["ed"] == ms(20 * FRAME + 100) == ms(transcriber.received)
+    assert not transcriber.in_speech
+
+
+def test_pcm_chunks_split_mid_frame_give_same_result():
+    audio = np.concatenate((silence(10), speech(30), silence(30)))
+    whole, split = StubModel(), StubModel()
+    a = make_transcriber(whole)
+    a.push(audio)
+    b = make_transcriber(split)
+    for i in range(0, len(audio), 333):
+        b.push(audio[i:i + 333])
+
+    def without_timing(events):
+        return [{k: v for k, v in e.items() if k != "decode_ms"} for e in events]
+
+    assert without_timing(a.step()) == without_timing(b.step())
+    assert whole.calls == split.calls
+
+
+@pytest.fixture
+def client():
+    pytest.importorskip("whisperx")  # routers imports the worker task module
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/test.db")
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    import routers
+
+    app = FastAPI()
+    app.include_router(routers.router)
+    model = StubModel()
+    app.dependency_overrides[routers.get_stream_model] = lambda: model
+    with TestClient(app) as test_client:
+        test_client.model = model
+        yield test_client
+
+
+def test_stream_endpoint_sends_finals_and_end(client):
+    audio = np.concatenate((silence(10), speech(30), silence(30), speech(20)))
+    pcm = to_pcm16(audio)
+
+    with client.websocket_connect("/api/stream") as ws:
+        for i in range(0, len(pcm), 3200):
+            ws.send_bytes(pcm[i:i + 3200])
+        ws.send_text(json.dumps({"event": "end"}))
+        events = []
+        while not events or events[-1]["type"] != "end":
+            events.append(ws.receive_json())
+
+    finals = [e for e in events if e["type"] == "final"]
+    assert len(finals) == 2
+    assert int(finals[0]["ed"]) <= int(finals[1]["bg"])
+    assert finals[1]["ed"] == events[-1]["ed"] == ms(len(audio))
+    assert all(e["type"] in ("partial", "final", "end") for e in events)
+    assert client.model.calls
+
+
+def test_stream_endpoint_rejects_other_sample_rates(client):
+    from starlette.websockets import WebSocketDisconnect
+
+    with client.websocket_connect("/api/stream?sample_rate=8000") as ws:
+        message = ws.receive_json()
+        assert message["type"] == "error"
+        assert message["err_no"] == 26011
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+    assert closed.value.code == 1003
+    assert client.model.calls == []
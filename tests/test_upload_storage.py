@@ -0,0 +1,80 @@
+import asyncio
+import fcntl
+import hashlib
+
+import pytest
+
+import upload_storage
+from upload_storage import UploadInProgress, UploadOffsetMismatch, UploadTooLarge
+
+
+class FakeUpload:
+    """The part of UploadFile the storage functions use."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 0
+
+    async def read(self, size: int = -1) -> bytes:
+        end = len(self.data) if size < 0 else self.pos + size
+        chunk = self.data[self.pos:end]
+        self.pos += len(chunk)
+        return chunk
+
+
+def append(part_path, data, offset, **kwargs):
+    return asyncio.run(upload_storage.append_upload(FakeUpload(data), str(part_path), offset, chunk_size=4, **kwargs))
+
+
+def test_append_upload_resumes_at_the_received_offset(tmp_path):
+    part = tmp_path / "seg.part"
+
+    assert append(part, b"hello ", 0) == 6
+    assert upload_storage.received_bytes(str(part)) == 6
+    with pytest.raises(UploadOffsetMismatch) as e:
+        append(part, b"world", 0)
+    assert e.value.received == 6
+    assert append(part, b"world", 6) == 11
+    assert part.read_bytes() == b"hello world"
+
+
+def test_append_upload_keeps_what_fits_under_the_limit(tmp_path):
+    part = tmp_path / "seg.part"
+
+    with pytest.raises(UploadTooLarge):
+        append(part, b"0123456789", 0, max_bytes=6)
+    # Whole chunks written before the limit stay, so the client can see where it stopped
+    assert upload_storage.received_bytes(str(part)) == 4
+
+
+def test_append_upload_refuses_a_part_file_being_written(tmp_path):
+    part = tmp_path / "seg.part"
+    part.write_bytes(b"abc")
+
+    with open(part, "ab") as holder:
+        fcntl.flock(holder, fcntl.LOCK_EX)
+        with pytest.raises(UploadInProgress):
+            append(part, b"def", 3)
+    assert append(part, b"def", 3) == 6
+
+
+def test_finalize_upload_moves_once(tmp_path):
+    part, dest = tmp_path / "seg.part", tmp_path / "seg.wav"
+    append(part, b"audio", 0)
+
+    assert asyncio.run(upload_storage.finalize_upload(str(part), str(dest))) == (
+        5, hashlib.sha256(b"audio").hexdigest())
+    assert dest.read_bytes() == b"audio" and not part.exists()
+    with pytest.raises(UploadInProgress):
+        asyncio.run(upload_storage.finalize_upload(str(part), str(dest)))
+
+
+def test_save_upload_removes_the_partial_file_when_too_large(tmp_path):
+    dest = tmp_path / "uploads" / "seg.wav"
+
+    assert asyncio.run(upload_storage.save_upload(FakeUpload(b"abcdef"), str(dest), chunk_size=4)) == (
+        6, hashlib.sha256(b"abcdef").hexdigest())
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(upload_storage.save_upload(FakeUpload(b"0123456789"), str(dest), chunk_size=4, max_bytes=6))
+    assert [p.name for p in dest.parent.iterdir()] == ["seg.wav"]
+    assert dest.read_bytes() == b"abcdef"
@@ -0,0 +1,239 @@
+"""
+Parallel, resumable segment upload client for /api/upload.
+
+Segments are read from disk in chunks and sent concurrently over one pooled
+requests.Session using the resumable protocol (`offset` + `checksum`), so
+memory stays at one chunk per worker and a failed request resumes where the
+server's bytes end instead of starting over.
+
+    client = UploadClient("http://localhost:8000", concurrency=4)
+    stats = client.upload_file(task_id, "meeting.wav", total_segments=8)
+    print(stats)
+"""
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+CHUNK_SIZE = 8 * 1024 * 1024
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+ERR_OFFSET_MISMATCH = 26008
+ERR_UPLOAD_IN_PROGRESS = 26009
+
+
+class UploadError(Exception):
+    """A segment could not be uploaded (rejected by the server or out of retries)."""
+
+
+@dataclass
+class UploadStats:
+    bytes_total: int = 0
+    bytes_sent: int = 0
+    requests: int = 0
+    retries: int = 0
+    seconds: float = 0.0
+    skipped_segments: List[int] = field(default_factory=list)
+
+    @property
+    def mb_per_s(self) -> float:
+        return self.bytes_sent / (1024 * 1024) / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return (f"{self.bytes_sent / (1024 * 1024):.1f} MiB in {self.seconds:.2f}s "
+                f"({self.mb_per_s:.1f} MiB/s, {self.requests} requests, {self.retries} retries)")
+
+
+def segment_ranges(file_size: int, total_segments: int) -> List[Tuple[int, int, int]]:
+    """(segment_id, start, length) for an even split; the last segment takes the remainder."""
+    segment_size = file_size // total_segments
+    ranges = []
+    for segment_id in range(1, total_segments + 1):
+        start = (segment_id - 1) * segment_size
+        end = file_size if segment_id == total_segments else start + segment_size
+        ranges.append((segment_id, start, end - start))
+    return ranges
+
+
+def read_range(path: str, start: int, length: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(length)
+
+
+def sha256_range(path: str, start: int, length: int, chunk_size: int = CHUNK_SIZE) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+class UploadClient:
+    def __init__(self, base_url: str, concurrency: int = 4, chunk_size: int = CHUNK_SIZE,
+                 max_retries: int = 5, backoff: float = 0.5, max_backoff: float = 30.0,
+                 timeout: Tuple[float, float] = (10, 300)):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def upload_status(self, task_id: str) -> Optional[dict]:
+        try:
+            response = self.session.post(f"{self.base_url}/api/uploadStatus", data={"task_id": task_id},
+                                         timeout=self.timeout)
+        except requests.RequestException:
+            logging.warning("Upload status unavailable for task %s", task_id, exc_info=True)
+            return None
+        if response.status_code != 200:
+            return None
+        return response.json().get("data")
+
+    def upload_file(self, task_id: str, path: str, total_segments: int,
+                    filename: Optional[str] = None,
+                    progress: Optional[Callable[[int, int], None]] = None) -> UploadStats:
+        """Upload path as total_segments segments of task_id.
+
+        Segments the server already holds are skipped and partial ones resume,
+        so calling this again after a failure continues the upload. progress,
+        if given, is called as progress(bytes_done, bytes_total) on the calling
+        thread.
+        """
+        filename = filename or os.path.basename(path)
+        ranges = segment_ranges(os.path.getsize(path), total_segments)
+        stats = UploadStats(bytes_total=sum(length for _, _, length in ranges))
+
+        status = self.upload_status(task_id) or {}
+        done = 0
+        pending = []
+        for segment_id, start, length in ranges:
+            segment_status = status.get("segments", {}).get(str(segment_id), {})
+            if segment_status.get("complete"):
+                stats.skipped_segments.append(segment_id)
+                done += length
+                continue
+            pending.append((segment_id, start, length, segment_status.get("received", 0)))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.concurrency) as executor:
+            futures = [
+                executor.submit(self.upload_segment, task_id, path, filename, segment_id, start, length,
+                                received, stats)
+                for segment_id, start, length, received in pending
+            ]
+            remaining = set(futures)
+            while remaining:
+                finished, remaining = wait(remaining, timeout=0.2, return_when=FIRST_EXCEPTION)
+                for future in finished:
+                    if future.exception() is not None:
+                        for other in remaining:
+                            other.cancel()
+                        stats.seconds = time.perf_counter() - started
+                        raise future.exception()
+                if progress:
+                    with self._lock:
+                        progress(done + stats.bytes_sent, stats.bytes_total)
+        stats.seconds = time.perf_counter() - started
+        return stats
+
+    def upload_segment(self, task_id: str, path: str, filename: str, segment_id: int,
+                       start: int, length: int, offset: int = 0, stats: Optional[UploadStats] = None):
+        """Upload bytes [start, start + length) of path as one segment, from offset on."""
+        stats = stats or UploadStats(bytes_total=length)
+        if offset > length:
+            raise UploadError(f"Segment {segment_id}: server holds {offset} bytes but the segment has {length}")
+        checksum = sha256_range(path, start, length, self.chunk_size)
+        attempt = 0
+        mismatches = 0
+        while True:
+            chunk = read_range(path, start + offset, min(self.chunk_size, length - offset))
+            data = {
+                "task_id": task_id,
+                "segment_id": segment_id,
+                "segment_len": str(length),
+                "offset": offset,
+                "checksum": checksum,
+            }
+            try:
+                response = self.session.post(
+                    f"{self.base_url}/api/upload", data=data,
+                    files={"content": (f"{filename}_segment_{segment_id}", chunk, "application/octet-stream")},
+                    timeout=self.timeout,
+                )
+                body = response.json() if response.headers.get("content-type", "").startswith("application/json") else {}
+            except requests.RequestException as e:
+                response, body, error = None, {}, e
+            else:
+                error = None
+            self._count(stats, requests=1)
+
+            if response is not None and response.status_code == 200 and body.get("ok") == 0:
+                offset += len(chunk)
+                self._count(stats, bytes_sent=len(chunk))
+                attempt = mismatches = 0
+                if offset >= length:
+                    return
+                continue
+
+            if response is not None and body.get("err_no") == ERR_OFFSET_MISMATCH:
+                # The server holds a different prefix (e.g. an earlier attempt
+                # partly landed); continue from there
+                received = body["data"]["received"]
+                if received > length:
+                    raise UploadError(f"Segment {segment_id}: server holds {received} bytes "
+                                      f"but the segment has {length}")
+                mismatches += 1
+                if mismatches > self.max_retries:
+                    raise UploadError(f"Segment {segment_id}: offset still rejected after "
+                                      f"{self.max_retries} resumes (server at {received})")
+                self._count(stats, bytes_sent=received - offset)
+                offset = received
+                continue
+
+            retryable = (error is not None or response.status_code in RETRYABLE_STATUS
+                         or body.get("err_no") == ERR_UPLOAD_IN_PROGRESS)
+            if not retryable:
+                raise UploadError(f"Segment {segment_id} rejected: HTTP {response.status_code} {body or response.text}")
+            attempt += 1
+            if attempt > self.max_retries:
+                raise UploadError(f"Segment {segment_id} failed after {self.max_retries} retries: {error or response.status_code}")
+            delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+            logging.warning("Segment %d upload failed (%s), retrying in %.1fs", segment_id,
+                            error or response.status_code, delay)
+            self._count(stats, retries=1)
+            time.sleep(delay)
+
+    def _count(self, stats: UploadStats, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                setattr(stats, name, getattr(stats, name) + value)